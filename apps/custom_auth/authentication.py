@@ -0,0 +1,213 @@
+"""
+Autenticación JWT basada en los claims del token.
+
+ClaimsJWTAuthentication evita la consulta de CustomUser que JWTAuthentication
+hace en cada solicitud: construye un ClaimsUser a partir del token y de un
+pequeño estado por usuario (rol, disciplina, is_active, is_staff, is_superuser).
+La fila completa solo se carga si la vista accede a otro atributo del usuario.
+
+El estado se guarda en la caché local de cada proceso, validada contra una
+versión por usuario en la caché compartida (ver athletes_tracking.versioned_cache)
+que apps.custom_auth.signals incrementa cuando el usuario cambia o se elimina.
+Durante CLAIMS_AUTH_STATE_TIMEOUT segundos el estado local se usa sin consultar
+nada; después solo se vuelve a leer la base de datos si la versión cambió. Una
+desactivación o un cambio de rol se aplican de inmediato en el proceso que los
+hizo y, en los demás, como máximo después de ese tiempo.
+
+Para activarla, reemplace JWTAuthentication en DEFAULT_AUTHENTICATION_CLASSES por
+'apps.custom_auth.authentication.ClaimsJWTAuthentication'.
+"""
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from athletes_tracking.versioned_cache import VersionedLocalCache
+from .models import CustomUser
+
+STATE_FIELDS = ('role', 'discipline', 'is_active', 'is_staff', 'is_superuser')
+
+# Segundos durante los que el estado local se usa sin comparar su versión
+DEFAULT_STATE_TIMEOUT = 5
+
+user_states = VersionedLocalCache('custom_auth:user_state', 'CLAIMS_AUTH_STATE_TIMEOUT', DEFAULT_STATE_TIMEOUT)
+
+
+def get_user_state(user_id):
+    """
+    Devuelve el estado de autorización del usuario desde la caché local o, si su
+    versión cambió, de la base de datos. Retorna None si el usuario no existe.
+    """
+    return user_states.get(
+        user_id, lambda: CustomUser.objects.filter(pk=user_id).values(*STATE_FIELDS).first()
+    )
+
+
+async def aget_user_state(user_id):
+    """Versión asíncrona de get_user_state."""
+    async def load():
+        return await CustomUser.objects.filter(pk=user_id).values(*STATE_FIELDS).afirst()
+    return await user_states.aget(user_id, load)
+
+
+def invalidate_user_state(user_id):
+    """Invalida el estado del usuario en todos los procesos al confirmarse la transacción actual."""
+    user_states.invalidate(user_id)
+
+
+class ClaimsUser(TokenUser):
+    """
+    Usuario liviano construido a partir del token y del estado en caché.
+
+    Ofrece las comprobaciones de rol de CustomUser (is_admin, is_coach, is_athlete);
+    username y email salen del token si incluye esos claims. Cualquier otro
+    atributo, los permisos y grupos, y los métodos que escriben o verifican la
+    contraseña se resuelven con la fila completa, cargada una sola vez.
+    """
+
+    def __init__(self, token, state):
+        super().__init__(token)
+        self.state = state
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @property
+    def role(self):
+        return self.state['role']
+
+    @property
+    def discipline(self):
+        return self.state['discipline']
+
+    @property
+    def is_active(self):
+        return self.state['is_active']
+
+    @property
+    def is_staff(self):
+        return self.state['is_staff']
+
+    @property
+    def is_superuser(self):
+        return self.state['is_superuser']
+
+    def _claim(self, name):
+        # Los tokens de la ruta token/ (TokenObtainPairView) no incluyen claims propios
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.full_user, name)
+
+    @cached_property
+    def username(self):
+        return self._claim('username')
+
+    @cached_property
+    def email(self):
+        return self._claim('email')
+
+    @property
+    def groups(self):
+        return self.full_user.groups
+
+    @property
+    def user_permissions(self):
+        return self.full_user.user_permissions
+
+    def is_athlete(self):
+        """Returns True if the user's role is 'athlete'."""
+        return self.role == 'athlete'
+
+    def is_coach(self):
+        """Returns True if the user's role is 'coach'."""
+        return self.role == 'coach'
+
+    def is_admin(self):
+        """Returns True if the user's role is 'admin'."""
+        return self.role == 'admin'
+
+    @cached_property
+    def full_user(self):
+        """La instancia completa de CustomUser, cargada bajo demanda."""
+        try:
+            return CustomUser.objects.get(pk=self.id)
+        except CustomUser.DoesNotExist:
+            # Eliminado después de guardarse el estado en la caché
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.full_user, attr)
+
+    def __eq__(self, other):
+        if isinstance(other, (TokenUser, CustomUser)):
+            return self.id == other.pk
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return self.username
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        return getattr(self.full_user, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+# TokenUser define estos métodos con resultados fijos (sin permisos) o lanzando
+# NotImplementedError; en ClaimsUser se comportan como en CustomUser
+for _name in (
+    'save', 'delete', 'set_password', 'check_password', 'get_username',
+    'get_user_permissions', 'get_group_permissions', 'get_all_permissions',
+    'has_perm', 'has_perms', 'has_module_perms',
+):
+    setattr(ClaimsUser, _name, _delegate(_name))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que no consulta la tabla de usuarios en cada solicitud.
+
+    aauthenticate es la versión asíncrona que usan las vistas de
+    apps.dashboard.async_views.
+    """
+
+    def _user_id(self, validated_token):
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('El token no contiene una identificación de usuario válida')
+
+    def _claims_user(self, validated_token, state):
+        if state is None:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed('El usuario está inactivo', code='user_inactive')
+        return ClaimsUser(validated_token, state)
+
+    def get_user(self, validated_token):
+        return self._claims_user(validated_token, get_user_state(self._user_id(validated_token)))
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        state = await aget_user_state(self._user_id(validated_token))
+        return self._claims_user(validated_token, state), validated_token
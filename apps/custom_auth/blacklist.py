@@ -0,0 +1,113 @@
+"""
+Filtro en memoria de tokens de refresco revocados.
+
+simplejwt consulta la tabla token_blacklist en cada token/refresh/ para comprobar
+si el token fue revocado. BlacklistFilter mantiene en el proceso el conjunto de
+JTIs revocados y no expirados: se carga desde la base de datos la primera vez y se
+actualiza al instante con los logouts del propio proceso.
+
+Cada revocación incrementa además una versión en la caché compartida (ver CACHES
+en settings). El filtro la compara en cada consulta y, si cambió, vuelve a leer
+las revocaciones recientes antes de responder, de modo que un logout en otro
+proceso se aplica de inmediato. Con Redis o memcached el caso común, un token no
+revocado, no requiere ninguna consulta a la base de datos.
+
+La sincronización lee las filas por fecha de revocación (blacklisted_at) desde la
+sincronización anterior menos SYNC_OVERLAP segundos, y no por id: una fila que se
+confirma después de otra con un id mayor no se pierde. Las revocaciones que no
+pasan por FilteredRefreshToken (el admin, SQL directo) no cambian la versión y se
+aplican en la siguiente sincronización periódica, cada SYNC_INTERVAL segundos.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+SYNC_INTERVAL = 30
+# Margen hacia atrás de cada sincronización: cubre transacciones que se confirman
+# tarde y diferencias de reloj entre procesos
+SYNC_OVERLAP = 60
+
+VERSION_KEY = 'custom_auth:blacklist:version'
+
+
+def _initial_version():
+    return time.time_ns()
+
+
+def bump_version():
+    """Avisa a los filtros de todos los procesos que hay una revocación nueva."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _initial_version(), None)
+
+
+class BlacklistFilter:
+    def __init__(self, sync_interval=SYNC_INTERVAL, overlap=SYNC_OVERLAP):
+        self.sync_interval = sync_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+        self._expires = {}
+        self._since = None
+        self._version = None
+        self._synced_at = 0.0
+
+    def _sync(self, version):
+        started = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        if self._since is not None:
+            rows = rows.filter(blacklisted_at__gte=self._since - self.overlap)
+        for jti, expires_at in rows.values_list('token__jti', 'token__expires_at'):
+            self._expires[jti] = expires_at.timestamp()
+
+        # Los tokens expirados ya no pasan la verificación: se descartan del filtro
+        now = time.time()
+        self._expires = {jti: exp for jti, exp in self._expires.items() if exp > now}
+        self._since = started
+        self._version = version
+        self._synced_at = time.monotonic()
+
+    def contains(self, jti):
+        # La versión se lee antes de sincronizar: una revocación confirmada durante
+        # la sincronización la vuelve a cambiar y la siguiente consulta la incluye
+        version = cache.get_or_set(VERSION_KEY, _initial_version, None)
+        with self._lock:
+            if version != self._version or time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync(version)
+            return jti in self._expires
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._expires[jti] = exp
+
+    def reset(self):
+        with self._lock:
+            self._expires = {}
+            self._since = None
+            self._version = None
+            self._synced_at = 0.0
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken que comprueba la revocación contra el filtro en memoria."""
+
+    def check_blacklist(self):
+        if blacklist_filter.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('El token fue revocado')
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        transaction.on_commit(bump_version)
+        return result
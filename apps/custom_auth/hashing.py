@@ -0,0 +1,12 @@
+"""
+Inicialización de los procesos del pool de cifrado de contraseñas (ver roster).
+
+Con el método 'spawn' cada proceso importa este módulo antes de configurar
+Django, así que no debe importar modelos ni nada que requiera el registro de
+aplicaciones.
+"""
+import django
+
+
+def init_worker():
+    django.setup()
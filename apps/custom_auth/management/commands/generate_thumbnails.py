@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.custom_auth.models import CustomUser
+from apps.custom_auth.thumbnails import generate_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera por adelantado las miniaturas que faltan de las fotos de perfil, por '
+        'ejemplo las subidas antes de que existieran las miniaturas (si no, se generan '
+        'en segundo plano la primera vez que se piden).'
+    )
+
+    def handle(self, *args, **options):
+        names = (
+            CustomUser.all_objects.exclude(profile_picture='')
+            .exclude(profile_picture__isnull=True)
+            .values_list('profile_picture', flat=True).distinct().iterator()
+        )
+        total = 0
+        for name in names:
+            generate_renditions(name)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} fotos de perfil procesadas'))
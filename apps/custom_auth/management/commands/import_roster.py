@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.custom_auth.roster import import_roster, parse_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa masivamente un roster de usuarios desde un archivo CSV o JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV con cabecera o lista JSON de usuarios.')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='Formato del archivo (por defecto se deduce de la extensión).')
+        parser.add_argument('--workers', type=int,
+                            help='Procesos para cifrar contraseñas (por defecto, uno por CPU).')
+        parser.add_argument('--tokens', action='store_true',
+                            help='Genera y muestra tokens JWT para los usuarios creados.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+        try:
+            with open(path, encoding='utf-8-sig') as handle:
+                text = handle.read()
+            rows = json.loads(text) if file_format == 'json' else parse_csv(text)
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            raise CommandError(f'No se pudo leer el roster: {e}')
+        if not isinstance(rows, list):
+            raise CommandError('El roster JSON debe ser una lista de usuarios')
+
+        created, errors = import_roster(rows, with_tokens=options['tokens'], workers=options['workers'])
+        for error in errors:
+            self.stderr.write(f"Fila {error['row']} ({error['username'] or '-'}): {'; '.join(error['errors'])}")
+        if options['tokens']:
+            for entry in created:
+                self.stdout.write(json.dumps(entry))
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} usuarios importados, {len(errors)} filas rechazadas'))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('custom_auth', '0008_remove_customuser_coach_customuser_coach'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'coach'], name='customuser_role_coach_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'id'], name='customuser_role_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['discipline', 'date_of_birth'], name='customuser_discipline_dob_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# Copia fija del SQL de apps.custom_auth.search en el momento de esta migración,
+# para que cambios posteriores en ese módulo no alteren la historia de migraciones
+FTS_TABLE = 'custom_auth_customuser_fts'
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "name, username, email, content='custom_auth_customuser', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+)
+
+INSERT = (
+    f'INSERT INTO {FTS_TABLE}(rowid, name, username, email) '
+    'VALUES (new.id, new.name, new.username, new.email);'
+)
+DELETE = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, username, email) "
+    "VALUES ('delete', old.id, old.name, old.username, old.email);"
+)
+
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': f'AFTER INSERT ON custom_auth_customuser BEGIN {INSERT} END',
+    f'{FTS_TABLE}_ad': f'AFTER DELETE ON custom_auth_customuser BEGIN {DELETE} END',
+    f'{FTS_TABLE}_au': (
+        f'AFTER UPDATE OF name, username, email ON custom_auth_customuser BEGIN {DELETE} {INSERT} END'
+    ),
+}
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for name, body in TRIGGERS.items():
+        schema_editor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_auth', '0010_customuser_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,7 +1,18 @@
+import logging
+
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.exceptions import ValidationError
 
+logger = logging.getLogger(__name__)
+
+
+class ActiveUserManager(UserManager):
+    """Default manager that hides users pending purge (see apps.lab.purge)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 # Create your models here.
 class CustomUser(AbstractUser):
@@ -28,6 +39,14 @@ class CustomUser(AbstractUser):
         coach (ForeignKey): A self-referential field to assign a coach to an athlete. Only users with
             the role 'coach' can be assigned as a coach. This field is optional and only applicable
             for users with the role 'athlete'.
+        deleted_at (DateTimeField): Set when the user is soft-deleted. The default manager
+            `objects` hides these users until the background purge removes them;
+            `all_objects` still returns them.
+        updated_at (DateTimeField): Last time the user was saved; part of the dashboard ETags.
+            Saves limited to last_login (update_fields) leave it unchanged.
+    Meta:
+        indexes: Composite indexes on (role, coach) for the roster lookups, (role, id)
+            for the cursor pagination and (discipline, date_of_birth) for the cohorts.
     """
     
     ROLE_CHOICES = (
@@ -71,6 +90,21 @@ class CustomUser(AbstractUser):
         related_name='athletes',
         limit_choices_to={'role': 'coach'}
     )
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # coachDashboard / testResults: atletas de un coach filtrados por rol
+            models.Index(fields=['role', 'coach'], name='customuser_role_coach_idx'),
+            # adminDashboard: paginación por cursor sobre (role, id)
+            models.Index(fields=['role', 'id'], name='customuser_role_id_idx'),
+            # Cohortes de percentiles: atletas por disciplina y edad
+            models.Index(fields=['discipline', 'date_of_birth'], name='customuser_discipline_dob_idx'),
+        ]
 
     def clean(self):
         """
@@ -93,6 +127,17 @@ class CustomUser(AbstractUser):
             if self.role == 'coach' and self.coach is not None:
                 raise ValidationError('Un coach no puede tener asignado otro coach')
 
+    def validate_unique(self, exclude=None):
+        """
+        Also checks the username against users pending purge, which the default
+        manager (used by Django's unique checks) hides.
+        """
+        super().validate_unique(exclude=exclude)
+        if exclude and 'username' in exclude:
+            return
+        if CustomUser.all_objects.filter(username=self.username).exclude(pk=self.pk).exists():
+            raise ValidationError({'username': [self.unique_error_message(CustomUser, ('username',))]})
+
     def save(self, *args, **kwargs):
         """
         Overrides the default save method to call the clean method before saving.
@@ -100,8 +145,7 @@ class CustomUser(AbstractUser):
         try:
             self.clean()
         except ValidationError as e:
-            # Log or handle the error appropriately
-            print(f"Validation error: {e}")
+            logger.warning("Validation error: %s", e)
             raise
         super().save(*args, **kwargs)
     
@@ -0,0 +1,121 @@
+"""
+Autorización de las vistas que exponen datos de un atleta.
+
+Un usuario puede ver a un atleta si es administrador (o superusuario), si es su
+entrenador o si es el propio atleta. Para los entrenadores la respuesta sale del
+conjunto de ids de sus atletas, obtenido con una sola consulta sobre el índice
+(role, coach) y guardado en la caché local del proceso, validada contra una
+versión por entrenador en la caché compartida (ver
+athletes_tracking.versioned_cache). El conjunto se invalida desde
+apps.custom_auth.signals cuando un atleta cambia de entrenador o de rol, o se
+elimina; en los demás procesos el cambio se aplica como máximo después de
+COACH_ATHLETES_TIMEOUT segundos. Mientras tanto, la comprobación no hace ninguna
+consulta.
+
+AthleteScope resuelve esa regla una vez por solicitud (athlete_scope la guarda en
+el request) y sirve tanto para validar un id como para restringir un queryset.
+CanViewAthlete la aplica como permiso de DRF a las vistas que reciben el id del
+atleta en la URL; can_view_coach resuelve las vistas del roster de un entrenador.
+"""
+from django.utils.functional import cached_property
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+
+from athletes_tracking.versioned_cache import VersionedLocalCache
+from .models import CustomUser
+
+DEFAULT_COACH_ATHLETES_TIMEOUT = 5
+
+coach_athletes = VersionedLocalCache(
+    'custom_auth:coach_athletes', 'COACH_ATHLETES_TIMEOUT', DEFAULT_COACH_ATHLETES_TIMEOUT
+)
+
+
+def _athletes_of(coach_id):
+    return CustomUser.objects.filter(role='athlete', coach_id=coach_id).values_list('id', flat=True)
+
+
+def coach_athlete_ids(coach_id):
+    """Devuelve el conjunto de ids de los atletas de un entrenador, desde la caché si está."""
+    return coach_athletes.get(coach_id, lambda: frozenset(_athletes_of(coach_id)))
+
+
+async def acoach_athlete_ids(coach_id):
+    """Versión asíncrona de coach_athlete_ids."""
+    async def load():
+        return frozenset([athlete_id async for athlete_id in _athletes_of(coach_id)])
+    return await coach_athletes.aget(coach_id, load)
+
+
+def invalidate_coach(coach_id):
+    """Invalida el conjunto de atletas del entrenador en todos los procesos."""
+    coach_athletes.invalidate(coach_id)
+
+
+class AthleteScope:
+    """
+    Atletas visibles para un usuario.
+
+    `athlete_ids` es None si el usuario ve a todos los atletas (administradores) o el
+    conjunto de ids visibles; se calcula una sola vez.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def sees_all(self):
+        return self.user.is_superuser or self.user.is_admin()
+
+    @cached_property
+    def athlete_ids(self):
+        if self.sees_all:
+            return None
+        if self.user.is_coach():
+            return coach_athlete_ids(self.user.id)
+        if self.user.is_athlete():
+            return frozenset([self.user.id])
+        return frozenset()
+
+    async def aathlete_ids(self):
+        """Versión asíncrona de `athlete_ids`; comparte el valor ya calculado."""
+        if 'athlete_ids' not in self.__dict__ and not self.sees_all and self.user.is_coach():
+            self.__dict__['athlete_ids'] = await acoach_athlete_ids(self.user.id)
+        return self.athlete_ids
+
+    def can_view(self, athlete_id):
+        return self.athlete_ids is None or athlete_id in self.athlete_ids
+
+    def can_view_coach(self, coach_id):
+        """Indica si el usuario puede ver el roster completo del entrenador `coach_id`."""
+        return self.sees_all or (self.user.is_coach() and self.user.id == coach_id)
+
+    def filter(self, queryset, field='id'):
+        """Restringe `queryset` a los atletas visibles a través de `field`."""
+        if self.athlete_ids is None:
+            return queryset
+        return queryset.filter(**{f'{field}__in': self.athlete_ids})
+
+
+def athlete_scope(request):
+    """El AthleteScope del usuario de la solicitud, creado una vez por solicitud."""
+    scope = getattr(request, '_athlete_scope', None)
+    if scope is None or scope.user is not request.user:
+        scope = request._athlete_scope = AthleteScope(request.user)
+    return scope
+
+
+class CanViewAthlete(BasePermission):
+    """
+    Permite el acceso si el usuario puede ver al atleta del parámetro de URL
+    `custom_user_id`. Debe ir después de IsAuthenticated.
+    """
+    message = 'No tiene permiso para ver este atleta'
+    lookup_url_kwarg = 'custom_user_id'
+
+    def has_permission(self, request, view):
+        athlete_id = view.kwargs.get(self.lookup_url_kwarg)
+        if athlete_id is None or athlete_scope(request).can_view(int(athlete_id)):
+            return True
+        # Mismo formato de error que el resto de las vistas
+        raise PermissionDenied({'status': 'error', 'message': self.message})
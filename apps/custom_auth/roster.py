@@ -0,0 +1,263 @@
+"""
+Importación masiva de usuarios (rosters de atletas).
+
+Las filas se validan en una sola pasada contra un mapa precargado de coaches y
+el conjunto de usernames existentes (incluidos los de usuarios pendientes de
+purga), y cada usuario con las reglas de sus campos en el modelo (longitud,
+opciones, formato del email); las contraseñas se cifran en paralelo en un
+pool de procesos (PBKDF2 es intensivo en CPU) y los usuarios se insertan con
+bulk_create por lotes. Los tokens JWT solo se generan si se piden.
+
+El pool se crea una sola vez por proceso y se reutiliza entre solicitudes. Sus
+procesos se inician con 'spawn', no con fork, para no copiar el estado del
+proceso web (conexiones, hilos). Si un registro concurrente toma un username
+entre la validación y la inserción, esa fila se reporta como error y se importan
+las demás.
+
+Columnas (CSV) o claves (JSON): username, password, email, name, role,
+discipline, date_of_birth (AAAA-MM-DD), phone_number y coach (id o username).
+"""
+import csv
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from athletes_tracking.params import is_integer, parse_day
+
+from .hashing import init_worker
+from .models import CustomUser
+from .permissions import invalidate_coach
+
+BATCH_SIZE = 500
+
+# Por debajo de este número de contraseñas no compensa usar el pool
+MIN_PARALLEL_PASSWORDS = 16
+
+# Reintentos de la inserción cuando otro registro toma alguno de los usernames
+MAX_INSERT_ATTEMPTS = 3
+
+_pool = None
+_pool_lock = threading.Lock()
+
+ROLES = {value for value, _ in CustomUser.ROLE_CHOICES}
+DISCIPLINES = {value for value, _ in CustomUser.DISCIPLINE_CHOICES}
+
+
+def parse_csv(text):
+    """Convierte un roster CSV con cabecera en una lista de diccionarios."""
+    reader = csv.DictReader(io.StringIO(text))
+    return [
+        {key.strip(): (value or '').strip() for key, value in record.items() if key}
+        for record in reader
+    ]
+
+
+def _new_pool(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_worker
+    )
+
+
+def _shared_pool(workers):
+    """Pool compartido por las solicitudes del proceso, creado en el primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(workers)
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Cifra las contraseñas en paralelo conservando el orden. Con `workers` (p. ej.
+    desde el comando import_roster) usa un pool propio de ese tamaño; si no, el
+    pool compartido del proceso.
+    """
+    size = workers or os.cpu_count() or 1
+    if size <= 1 or len(passwords) < MIN_PARALLEL_PASSWORDS:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (size * 4))
+    if workers:
+        with _new_pool(workers) as pool:
+            return list(pool.map(make_password, passwords, chunksize=chunksize))
+    pool = _shared_pool(size)
+    try:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+    except BrokenProcessPool:
+        # Un proceso del pool murió: se descarta para que la próxima solicitud cree otro
+        _discard_pool(pool)
+        return [make_password(password) for password in passwords]
+
+
+def _load_coaches(rows):
+    """Precarga en una consulta los coaches referenciados por id o username."""
+    keys = {str(row.get('coach') or '').strip() for row in rows}
+    keys.discard('')
+    ids = {int(k) for k in keys if is_integer(k)}
+    usernames = {k for k in keys if not is_integer(k)}
+    by_key = {}
+    if not keys:
+        return by_key
+    coaches = CustomUser.objects.filter(role='coach').only('id', 'username')
+    if ids and usernames:
+        coaches = coaches.filter(id__in=ids) | coaches.filter(username__in=usernames)
+    elif ids:
+        coaches = coaches.filter(id__in=ids)
+    else:
+        coaches = coaches.filter(username__in=usernames)
+    for coach in coaches:
+        by_key[str(coach.id)] = coach
+        by_key[coach.username] = coach
+    return by_key
+
+
+def validate_rows(rows):
+    """
+    Valida todas las filas. Retorna (valid, errors): valid es una lista de tuplas
+    (índice, CustomUser sin guardar, contraseña en claro) y errors una lista de
+    {'row': n, 'username': ..., 'errors': [...]} con índices desde 1.
+    """
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+    coaches = _load_coaches(rows)
+    usernames = {str(row.get('username') or '').strip() for row in rows}
+    existing = set(
+        CustomUser.all_objects.filter(username__in=usernames).values_list('username', flat=True)
+    )
+
+    valid, errors, seen = [], [], set()
+    for index, row in enumerate(rows, start=1):
+        row_errors = []
+        username = str(row.get('username') or '').strip()
+        if not username:
+            row_errors.append('El username es obligatorio')
+        elif username in existing:
+            row_errors.append('El username ya existe')
+        elif username in seen:
+            row_errors.append('Username duplicado en el roster')
+        seen.add(username)
+
+        password = str(row.get('password') or '')
+        if not password:
+            row_errors.append('La contraseña es obligatoria')
+
+        role = str(row.get('role') or 'athlete').strip()
+        if role not in ROLES:
+            row_errors.append(f'Rol no válido: {role}')
+
+        discipline = str(row.get('discipline') or '').strip()
+        if discipline not in DISCIPLINES:
+            row_errors.append(f'Disciplina no válida: {discipline or "(vacía)"}')
+
+        date_of_birth = None
+        raw_date = str(row.get('date_of_birth') or '').strip()
+        if raw_date:
+            date_of_birth = parse_day(raw_date)
+            if date_of_birth is None:
+                row_errors.append(f'Fecha de nacimiento inválida: {raw_date}')
+
+        coach_key = str(row.get('coach') or '').strip()
+        coach = coaches.get(coach_key) if coach_key else None
+        if coach_key and coach is None:
+            row_errors.append(f'Coach no encontrado: {coach_key}')
+        if role == 'athlete' and not coach_key:
+            row_errors.append('Un atleta debe tener un coach asignado')
+        if role != 'athlete' and coach_key:
+            row_errors.append('Solo los atletas pueden tener un coach asignado')
+
+        if row_errors:
+            errors.append({'row': index, 'username': username, 'errors': row_errors})
+            continue
+
+        user = CustomUser(
+            username=username,
+            email=str(row.get('email') or '').strip(),
+            name=str(row.get('name') or '').strip(),
+            role=role,
+            discipline=discipline,
+            date_of_birth=date_of_birth,
+            phone_number=str(row.get('phone_number') or '').strip(),
+            coach=coach,
+        )
+        try:
+            # El coach ya se resolvió contra el mapa precargado; validarlo de nuevo
+            # haría una consulta por fila
+            user.full_clean(exclude=['password', 'coach'], validate_unique=False)
+        except ValidationError as e:
+            errors.append({'row': index, 'username': username, 'errors': [
+                f'{field}: {message}' for field, messages in e.message_dict.items() for message in messages
+            ]})
+            continue
+        valid.append((index, user, password))
+    return valid, errors
+
+
+def import_roster(rows, with_tokens=False, workers=None):
+    """
+    Importa las filas válidas del roster y devuelve (created, errors).
+
+    created es una lista de {'row', 'id', 'username'} (más 'tokens' si se piden) y
+    errors el reporte de filas rechazadas; las filas válidas se importan aunque
+    otras tengan errores.
+    """
+    valid, errors = validate_rows(rows)
+    if not valid:
+        return [], errors
+
+    hashes = hash_passwords([password for _, _, password in valid], workers=workers)
+    for (_, user, _), hashed in zip(valid, hashes):
+        user.password = hashed
+
+    pending = [(index, user) for index, user, _ in valid]
+    for attempt in range(1, MAX_INSERT_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create([user for _, user in pending], batch_size=BATCH_SIZE)
+            break
+        except IntegrityError:
+            # Otro registro tomó alguno de los usernames después de la validación
+            taken = set(CustomUser.all_objects.filter(
+                username__in=[user.username for _, user in pending]
+            ).values_list('username', flat=True))
+            if not taken or attempt == MAX_INSERT_ATTEMPTS:
+                raise
+            errors.extend(
+                {'row': index, 'username': user.username, 'errors': ['El username ya existe']}
+                for index, user in pending if user.username in taken
+            )
+            pending = [(index, user) for index, user in pending if user.username not in taken]
+            for _, user in pending:
+                # bulk_create pudo asignar ids antes de que se revirtiera la transacción
+                user.pk = None
+            if not pending:
+                users = []
+                break
+    errors.sort(key=lambda error: error['row'])
+
+    # bulk_create no dispara post_save: los entrenadores con atletas nuevos se invalidan aquí
+    for coach_id in {user.coach_id for user in users} - {None}:
+        invalidate_coach(coach_id)
+
+    created = []
+    for (index, _), user in zip(pending, users):
+        entry = {'row': index, 'id': user.id, 'username': user.username}
+        if with_tokens:
+            refresh = RefreshToken.for_user(user)
+            entry['tokens'] = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        created.append(entry)
+    return created, errors
@@ -0,0 +1,173 @@
+"""
+Búsqueda de usuarios por nombre, username y email.
+
+En SQLite la búsqueda usa la tabla virtual FTS5 FTS_TABLE, de contenido externo
+sobre la tabla de CustomUser: solo guarda el índice invertido y lee las columnas
+de la tabla original. Los triggers de TRIGGERS la mantienen sincronizada en cada
+INSERT, UPDATE y DELETE, incluidos bulk_create, update() y el SQL directo, que no
+disparan señales. El tokenizador ignora mayúsculas y acentos, y los índices de
+prefijos (1 a 3 caracteres) resuelven las búsquedas incrementales sin recorrer el
+vocabulario completo. Los resultados se ordenan con bm25, ponderando más el
+nombre que el username y este más que el email.
+
+Calcular bm25 para cada coincidencia domina el tiempo de las búsquedas amplias
+(una sola letra puede coincidir con todos los usuarios). Por eso la búsqueda se
+hace en dos pasos acotados por relevancia: primero solo las coincidencias de
+palabras completas, un conjunto pequeño que contiene los mejores resultados, y
+solo si con ellas no se llega a `limit` se ordenan también las coincidencias por
+prefijo.
+
+install() crea la tabla y los triggers si faltan. La migración 0011 crea la misma
+tabla con su propia copia del SQL, y install() se ejecuta en cada post_migrate
+(ver apps.py), porque cuando una migración reconstruye
+la tabla de usuarios en SQLite los triggers se pierden con la tabla anterior. En
+otras bases de datos se usa una búsqueda con icontains.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import CustomUser
+
+FTS_TABLE = 'custom_auth_customuser_fts'
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MAX_TERMS = 8
+
+# Peso de name, username y email en bm25
+WEIGHTS = (10.0, 5.0, 1.0)
+
+RESULT_FIELDS = ('id', 'username', 'name', 'email', 'role', 'discipline', 'coach_id')
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def _table():
+    return CustomUser._meta.db_table
+
+
+def _create_table_sql():
+    return (
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        f"name, username, email, content='{_table()}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+    )
+
+
+def _triggers():
+    table = _table()
+    insert = (
+        f'INSERT INTO {FTS_TABLE}(rowid, name, username, email) '
+        f'VALUES (new.id, new.name, new.username, new.email);'
+    )
+    delete = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, username, email) "
+        f"VALUES ('delete', old.id, old.name, old.username, old.email);"
+    )
+    return {
+        f'{FTS_TABLE}_ai': f'AFTER INSERT ON {table} BEGIN {insert} END',
+        f'{FTS_TABLE}_ad': f'AFTER DELETE ON {table} BEGIN {delete} END',
+        f'{FTS_TABLE}_au': f'AFTER UPDATE OF name, username, email ON {table} BEGIN {delete} {insert} END',
+    }
+
+
+TRIGGERS = _triggers()
+
+
+def install(connection):
+    """
+    Crea la tabla FTS5 y sus triggers si no existen. Si faltaba alguno, el índice
+    puede estar desactualizado y se reconstruye desde la tabla de usuarios.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f'{FTS_TABLE}%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = ({FTS_TABLE} | set(TRIGGERS)) - existing
+        if not missing:
+            return
+        cursor.execute(_create_table_sql())
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def terms(text):
+    """Palabras de la búsqueda, como máximo MAX_TERMS."""
+    return _TERM.findall(text)[:MAX_TERMS]
+
+
+def match_expression(words, prefix=True):
+    """
+    Expresión MATCH de FTS5: cada palabra entre comillas (sin operadores ni sintaxis
+    de columnas), como prefijo si `prefix`, todas obligatorias.
+    """
+    template = '"{}"*' if prefix else '"{}"'
+    return ' '.join(template.format(word.replace('"', '""')) for word in words)
+
+
+def search_users(text, role=None, discipline=None, coach_id=None, limit=DEFAULT_LIMIT):
+    """
+    Devuelve como diccionarios de RESULT_FIELDS los `limit` usuarios (no eliminados)
+    que mejor coinciden con `text`, opcionalmente filtrados por rol, disciplina y
+    entrenador.
+    """
+    words = terms(text)
+    if not words:
+        return []
+    connection = connections[router.db_for_read(CustomUser)]
+    if connection.vendor != 'sqlite':
+        return _search_fallback(words, role, discipline, coach_id, limit)
+
+    filters, params = [], []
+    for column, value in (('role', role), ('discipline', discipline), ('coach_id', coach_id)):
+        if value is not None:
+            filters.append(f'AND u.{column} = %s')
+            params.append(value)
+    columns = ', '.join(f'u.{field}' for field in RESULT_FIELDS)
+
+    def ranked(match, exclude, count):
+        excluded = f'AND u.id NOT IN ({", ".join(["%s"] * len(exclude))}) ' if exclude else ''
+        sql = (
+            f'SELECT {columns} FROM {FTS_TABLE} JOIN {_table()} u ON u.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND u.deleted_at IS NULL {" ".join(filters)} {excluded}'
+            f'ORDER BY bm25({FTS_TABLE}, {", ".join(map(str, WEIGHTS))}) LIMIT %s'
+        )
+        cursor.execute(sql, [match, *params, *exclude, count])
+        return cursor.fetchall()
+
+    with connection.cursor() as cursor:
+        # Las palabras completas primero; los prefijos solo completan lo que falte
+        rows = ranked(match_expression(words, prefix=False), [], limit)
+        if len(rows) < limit:
+            rows += ranked(match_expression(words), [row[0] for row in rows], limit - len(rows))
+    return [dict(zip(RESULT_FIELDS, row)) for row in rows]
+
+
+def _search_fallback(words, role, discipline, coach_id, limit):
+    users = CustomUser.objects.all()
+    for word in words:
+        users = users.filter(Q(name__icontains=word) | Q(username__icontains=word) | Q(email__icontains=word))
+    filters = {'role': role, 'discipline': discipline, 'coach_id': coach_id}
+    users = users.filter(**{field: value for field, value in filters.items() if value is not None})
+    # Primero las coincidencias al inicio del nombre o del username
+    users = users.annotate(starts=Case(
+        When(Q(name__istartswith=words[0]) | Q(username__istartswith=words[0]), then=Value(0)),
+        default=Value(1), output_field=IntegerField(),
+    ))
+    return list(users.order_by('starts', 'name', 'id').values(*RESULT_FIELDS)[:limit])
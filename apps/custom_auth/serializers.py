@@ -1,20 +1,47 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from apps.custom_auth.models import CustomUser
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from apps.custom_auth.authentication import get_user_state
+from apps.custom_auth.blacklist import FilteredRefreshToken
+from apps.custom_auth.thumbnails import thumbnail_urls
+from athletes_tracking.serializers import TimedSerializerMixin
 
-class CustomUserSerializer(serializers.ModelSerializer):
+USERNAME_TAKEN = 'El username ya existe'
+
+
+def username_field():
+    """
+    Campo username único entre todos los usuarios. El validador que genera DRF usa el
+    manager por defecto, que oculta a los usuarios pendientes de purga, cuyo username
+    sigue ocupado en la base de datos.
+    """
+    return serializers.CharField(max_length=150, validators=[
+        UniqueValidator(queryset=CustomUser.all_objects.all(), message=USERNAME_TAKEN),
+    ])
+
+
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo CustomUser.
     Gestiona la serialización y deserialización de instancias de CustomUser.
     """
+    username = username_field()
     password = serializers.CharField(write_only=True)
+    profile_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'password', 'profile_picture', 
+        fields = ['id', 'username', 'email', 'password', 'profile_picture', 'profile_thumbnails',
                   'role', 'discipline', 'date_of_birth', 'phone_number',"coach"]
     
+    def get_profile_thumbnails(self, obj):
+        name = obj.profile_picture.name if obj.profile_picture else None
+        return thumbnail_urls(obj.id, name, self.context.get('request'))
+    
     def create(self, validated_data):
         """
         Crea y devuelve un nuevo usuario con contraseña cifrada.
@@ -80,12 +107,46 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Serializer de refresco que comprueba la revocación del token contra el filtro
+    en memoria y el estado del usuario contra la caché, sin consultar la base de
+    datos en el caso común.
+    """
+    token_class = FilteredRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            state = get_user_state(user_id)
+            if state is None or not state['is_active']:
+                raise AuthenticationFailed(
+                    self.error_messages['no_active_account'], 'no_active_account'
+                )
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
 # Reemplaza el UserRegisterSerializer en apps/custom_auth/serializers.py
 
-class UserRegisterSerializer(serializers.ModelSerializer):
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer para el registro de usuarios con generación de tokens JWT.
     """
+    username = username_field()
     password = serializers.CharField(write_only=True)
     coach = serializers.PrimaryKeyRelatedField(
         queryset=CustomUser.objects.filter(role='coach'),
@@ -0,0 +1,84 @@
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, thumbnails
+from .authentication import STATE_FIELDS, invalidate_user_state
+from .models import CustomUser
+from .permissions import invalidate_coach
+
+# Campos que determinan a qué entrenador pertenece un atleta
+ROSTER_FIELDS = {'role', 'coach'}
+# Campos cuyo valor anterior se guarda en pre_save
+TRACKED_FIELDS = ROSTER_FIELDS | {'profile_picture'}
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user_state(sender, instance, update_fields=None, **kwargs):
+    """Descarta el estado de autorización en caché cuando cambian el rol o la activación."""
+    if update_fields is not None and not set(STATE_FIELDS).intersection(update_fields):
+        return
+    invalidate_user_state(instance.pk)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_state(sender, instance, update_fields=None, **kwargs):
+    """Guarda la foto y el entrenador anteriores para detectar si cambiaron."""
+    instance._previous_profile_picture = instance._previous_coach_id = None
+    if instance.pk is None or (update_fields is not None and not TRACKED_FIELDS.intersection(update_fields)):
+        return
+    previous = CustomUser.objects.filter(pk=instance.pk).values_list('profile_picture', 'coach_id').first()
+    if previous is not None:
+        instance._previous_profile_picture, instance._previous_coach_id = previous
+
+
+@receiver(post_save, sender=CustomUser)
+def schedule_profile_thumbnails(sender, instance, created, update_fields=None, **kwargs):
+    """Genera en segundo plano las miniaturas de una foto nueva y elimina las de la anterior."""
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    current = instance.profile_picture.name if instance.profile_picture else None
+    previous = getattr(instance, '_previous_profile_picture', None) or None
+    if current == previous:
+        return
+    if current:
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.generate_renditions, current))
+    if previous:
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.delete_renditions, previous))
+
+
+@receiver(post_delete, sender=CustomUser)
+def delete_profile_thumbnails(sender, instance, **kwargs):
+    if instance.profile_picture:
+        name = instance.profile_picture.name
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.delete_renditions, name))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_coach_athletes(sender, instance, update_fields=None, **kwargs):
+    """Descarta los conjuntos de atletas en caché del entrenador actual y del anterior."""
+    if update_fields is not None and not ROSTER_FIELDS.intersection(update_fields):
+        return
+    for coach_id in {instance.coach_id, getattr(instance, '_previous_coach_id', None)} - {None}:
+        invalidate_coach(coach_id)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def touch_coached_athletes(sender, instance, **kwargs):
+    """
+    Al eliminar un entrenador, SET_NULL vacía el coach de sus atletas con un UPDATE
+    que no asigna updated_at; se asigna aquí para que cambien los ETags del dashboard.
+    """
+    CustomUser.all_objects.filter(coach_id=instance.pk).update(updated_at=timezone.now())
+
+
+def install_user_search(sender, using, **kwargs):
+    """
+    Conectado a post_migrate en apps.py: recrea la tabla de búsqueda y sus triggers
+    si una migración reconstruyó la tabla de usuarios.
+    """
+    if router.allow_migrate_model(using, CustomUser):
+        search.install(connections[using])
@@ -0,0 +1,371 @@
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.lab import purge
+from athletes_tracking import versioned_cache
+from . import authentication, blacklist, roster, search, thumbnails
+from .models import CustomUser
+
+
+class PendingPurgeUsernameTests(TestCase):
+    """El username de un usuario pendiente de purga sigue ocupado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            username='admin', role='admin', discipline='athletics', is_staff=True, is_superuser=True
+        )
+        cls.other = CustomUser.objects.create(username='other', role='admin', discipline='athletics')
+        cls.deleted = CustomUser.objects.create(username='deleted', role='admin', discipline='athletics')
+        purge.soft_delete_user(cls.deleted)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_register_rejects_username_pending_purge(self):
+        response = self.client.post(reverse('register_user'), {
+            'username': 'deleted', 'password': 'secret-123', 'role': 'admin', 'discipline': 'athletics',
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data['message'])
+
+    def test_update_rejects_username_pending_purge(self):
+        response = self.client.patch(
+            reverse('update_user', args=(self.other.id,)), {'username': 'deleted'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.username, 'other')
+
+    def test_usernames_keep_the_model_rules(self):
+        response = self.client.post(reverse('register_user'), {
+            'username': 'ana maría', 'password': 'secret-123', 'role': 'admin', 'discipline': 'athletics',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(CustomUser.objects.filter(username='ana maría').exists())
+
+    def test_model_validation_checks_users_pending_purge(self):
+        with self.assertRaises(Exception) as context:
+            CustomUser(username='deleted', role='admin', discipline='athletics').validate_unique()
+
+        self.assertIn('username', context.exception.message_dict)
+
+
+class UserSearchTests(TestCase):
+    """La tabla FTS5 se mantiene con triggers y la búsqueda no interpreta la sintaxis de FTS5."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = CustomUser.objects.create(
+            username='mgarcia', name='María García', email='maria@example.com', role='coach', discipline='athletics'
+        )
+        cls.athlete = CustomUser.objects.create(
+            username='jperez', name='José Pérez', email='jose@example.com', role='athlete',
+            discipline='athletics', coach=cls.coach,
+        )
+
+    def usernames(self, text, **filters):
+        return [user['username'] for user in search.search_users(text, **filters)]
+
+    def test_insert_and_update_triggers(self):
+        self.assertEqual(self.usernames('jose'), ['jperez'])
+        self.assertEqual(self.usernames('PEREZ'), ['jperez'])
+
+        CustomUser.objects.filter(id=self.athlete.id).update(name='José Fernández')
+        self.assertEqual(self.usernames('fernandez'), ['jperez'])
+        self.assertEqual(self.usernames('perez'), [])
+
+    def test_bulk_create_and_delete_triggers(self):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'runner{i}', name=f'Runner {i}', role='athlete', discipline='athletics',
+                       coach=self.coach)
+            for i in range(3)
+        ])
+        self.assertEqual(sorted(self.usernames('runner')), ['runner0', 'runner1', 'runner2'])
+
+        CustomUser.objects.filter(username='runner1').delete()
+        self.assertEqual(sorted(self.usernames('runner')), ['runner0', 'runner2'])
+
+    def test_full_words_rank_before_prefixes(self):
+        CustomUser.objects.create(
+            username='anaj', name='Ana Joselyn', role='athlete', discipline='athletics', coach=self.coach
+        )
+        self.assertEqual(self.usernames('jose'), ['jperez', 'anaj'])
+        self.assertEqual(self.usernames('jose', limit=1), ['jperez'])
+
+    def test_filters_and_pending_purge_users(self):
+        self.assertEqual(self.usernames('example', role='coach'), ['mgarcia'])
+        self.assertEqual(self.usernames('example', coach_id=self.coach.id), ['jperez'])
+
+        purge.soft_delete_user(self.athlete)
+        self.assertEqual(self.usernames('jose'), [])
+
+    def test_fts_syntax_is_treated_as_text(self):
+        for text in ('"', 'jose"', 'name:jose', 'jose OR maria', 'NEAR(jose maria)', '*', 'jo* -maria', '^jose'):
+            with self.subTest(text=text):
+                search.search_users(text)
+        self.assertEqual(self.usernames('jose OR maria'), [])
+        self.assertEqual(self.usernames('name:jose'), [])
+        self.assertEqual(self.usernames('jo*'), ['jperez'])
+
+    def test_search_view_rejects_non_ascii_digits(self):
+        admin = CustomUser.objects.create(
+            username='root', role='admin', discipline='athletics', is_staff=True, is_superuser=True
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        for params in ({'q': 'jose', 'limit': '²'}, {'q': 'jose', 'coach': '²'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(reverse('search_users'), params).status_code, 400)
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    """ClaimsJWTAuthentication resuelve rol y activación sin consultar la tabla de usuarios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = CustomUser.objects.create(
+            username='coach', email='coach@example.com', role='coach', discipline='athletics',
+            phone_number='555-0100',
+        )
+
+    def setUp(self):
+        versioned_cache.local_cache.clear()
+        self.backend = authentication.ClaimsJWTAuthentication()
+        self.token = AccessToken.for_user(self.coach)
+
+    def authenticate(self):
+        return self.backend.get_user(self.token)
+
+    def save(self, **fields):
+        for name, value in fields.items():
+            setattr(self.coach, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coach.save()
+
+    def test_role_checks_come_from_the_cached_state(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertTrue(user.is_coach())
+            self.assertFalse(user.is_admin())
+            self.assertFalse(user.is_athlete())
+            self.assertEqual(user.discipline, 'athletics')
+            self.assertEqual(user, self.coach)
+
+    def test_role_change_and_deactivation_apply_immediately(self):
+        self.authenticate()
+
+        self.save(role='admin')
+        self.assertTrue(self.authenticate().is_admin())
+
+        self.save(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(CLAIMS_AUTH_STATE_TIMEOUT=0)
+    def test_other_process_changes_apply_through_the_shared_version(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        # Otro proceso: actualiza la fila e incrementa la versión compartida, sin
+        # tocar la caché local de este
+        CustomUser.objects.filter(pk=self.coach.pk).update(is_active=False)
+        cache.incr(authentication.user_states.version_key(self.coach.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coach.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_full_user_is_loaded_once_and_only_when_needed(self):
+        user = self.authenticate()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user.id, self.coach.id)
+            self.assertTrue(user.is_active)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.phone_number, '555-0100')
+            self.assertEqual(user.username, 'coach')
+            self.assertEqual(user.email, 'coach@example.com')
+        self.assertFalse(user.check_password(''))
+
+
+class RosterImportTests(TestCase):
+    """La importación masiva valida cada fila con las reglas del modelo y reporta los conflictos por fila."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            username='admin', role='admin', discipline='athletics', is_staff=True, is_superuser=True
+        )
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        deleted = CustomUser.objects.create(username='deleted', role='admin', discipline='athletics')
+        purge.soft_delete_user(deleted)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def athlete(self, username, **fields):
+        return {'username': username, 'password': 'secret-123', 'discipline': 'athletics',
+                'coach': 'coach', **fields}
+
+    def test_valid_rows_are_imported_and_invalid_ones_reported(self):
+        rows = [
+            self.athlete('runner'),
+            self.athlete('jumper', coach=str(self.coach.id), date_of_birth='2004-05-17'),
+            self.athlete('long_name', name='x' * 300),
+            self.athlete('u' * 280),
+            self.athlete('bad_email', email='not-an-email'),
+            self.athlete('deleted'),
+            self.athlete('runner'),
+            self.athlete('no_coach', coach='nobody'),
+            self.athlete('bad_date', date_of_birth='2004-02-30'),
+        ]
+
+        created, errors = roster.import_roster(rows)
+
+        self.assertEqual([entry['username'] for entry in created], ['runner', 'jumper'])
+        self.assertEqual([error['row'] for error in errors], [3, 4, 5, 6, 7, 8, 9])
+        self.assertTrue(errors[0]['errors'][0].startswith('name:'))
+        self.assertTrue(errors[1]['errors'][0].startswith('username:'))
+        self.assertTrue(errors[2]['errors'][0].startswith('email:'))
+        self.assertEqual(errors[3]['errors'], ['El username ya existe'])
+        self.assertEqual(errors[4]['errors'], ['Username duplicado en el roster'])
+        self.assertEqual(
+            set(CustomUser.objects.filter(coach=self.coach).values_list('username', flat=True)),
+            {'runner', 'jumper'},
+        )
+
+    def test_csv_upload(self):
+        body = 'username,password,discipline,coach\nrunner,secret-123,athletics,coach\n'
+        response = self.client.post(reverse('import_users'), body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([entry['username'] for entry in response.data['created']], ['runner'])
+
+    def test_json_body_must_be_an_object(self):
+        response = self.client.post(reverse('import_users'), [self.athlete('runner')], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BlacklistFilterTests(TestCase):
+    """Las revocaciones de cualquier proceso se aplican de inmediato en el filtro en memoria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='user', role='admin', discipline='athletics')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Filtro de otro proceso: solo ve las revocaciones a través de la base de datos
+        self.other = blacklist.BlacklistFilter()
+
+    def refresh_token(self):
+        return blacklist.FilteredRefreshToken.for_user(self.user)
+
+    def test_logout_is_seen_by_other_processes_immediately(self):
+        token = self.refresh_token()
+        jti = token['jti']
+        self.assertFalse(self.other.contains(jti))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('logout-user'), {'refresh': str(token)})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(self.other.contains(jti))
+        self.assertTrue(blacklist.blacklist_filter.contains(jti))
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(token)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_unchanged_version_does_not_read_the_blacklist(self):
+        jti = self.refresh_token()['jti']
+        self.other.contains(jti)
+
+        # Solo la versión en la caché compartida (una consulta con DatabaseCache)
+        with self.assertNumQueries(1):
+            self.assertFalse(self.other.contains(jti))
+
+    def test_rows_committed_out_of_order_are_not_missed(self):
+        early, late = self.refresh_token(), self.refresh_token()
+        self.other.contains(early['jti'])
+
+        # Una revocación se confirma y se sincroniza; otra, iniciada antes, se confirma
+        # después con una fecha de revocación anterior a esa sincronización
+        late.blacklist()
+        blacklist.bump_version()
+        self.assertTrue(self.other.contains(late['jti']))
+        entry = BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=early['jti']))
+        BlacklistedToken.objects.filter(pk=entry.pk).update(blacklisted_at=timezone.now() - timedelta(seconds=10))
+        blacklist.bump_version()
+
+        self.assertTrue(self.other.contains(early['jti']))
+        self.assertTrue(self.other.contains(late['jti']))
+
+
+class ProfileThumbnailTests(TestCase):
+    """Una miniatura que falta se genera fuera de la solicitud y mientras tanto se redirige a la foto."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buffer, 'PNG')
+        name = default_storage.save('profile_pictures/photo.png', ContentFile(buffer.getvalue()))
+        self.user = CustomUser.objects.create(
+            username='user', role='admin', discipline='athletics', profile_picture=name
+        )
+        self.url = reverse('profile_thumbnail', args=(self.user.id, 'small', 'webp'))
+
+    def test_missing_thumbnail_is_generated_in_the_background(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.client.get(self.url)
+            self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], default_storage.url(self.user.profile_picture.name))
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        # Una sola generación encolada por foto mientras está pendiente
+        schedule.assert_called_once()
+        function, name = schedule.call_args.args
+        function(name)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (thumbnails.RENDITIONS['small'],) * 2)
+
+    def test_invalid_size_or_user_without_photo(self):
+        other = CustomUser.objects.create(username='other', role='admin', discipline='athletics')
+        for args in ((self.user.id, 'huge', 'webp'), (other.id, 'small', 'webp')):
+            with self.subTest(args=args):
+                self.assertEqual(self.client.get(reverse('profile_thumbnail', args=args)).status_code, 404)
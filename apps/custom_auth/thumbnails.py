@@ -0,0 +1,166 @@
+"""
+Miniaturas de las fotos de perfil.
+
+Cada foto subida se reduce con Pillow a los tamaños de RENDITIONS en WebP y JPEG
+(recortadas al centro en formato cuadrado) y se guardan en el mismo storage bajo
+THUMBNAIL_DIR. Las miniaturas se generan en un pool de hilos, nunca en el hilo
+de la solicitud: al subir la foto (después del commit) y, si falta alguna (p. ej.
+fotos anteriores a este proceso), en la primera solicitud que la pide. En ese
+caso la vista pública profileThumbnail encola la generación una sola vez por foto
+y redirige a la foto original hasta que la miniatura exista. El comando
+generate_thumbnails permite generarlas todas por adelantado.
+
+La ruta de cada miniatura se deriva del nombre del archivo original, así que una
+foto nueva produce miniaturas nuevas y las de la foto anterior se eliminan. Si la
+foto cambia mientras se generan sus miniaturas, estas se eliminan al terminar, y
+si dos procesos generan la misma miniatura se conserva solo la primera.
+"""
+import logging
+import posixpath
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+
+# Lado en píxeles de cada miniatura cuadrada
+RENDITIONS = {
+    'small': 64,
+    'medium': 160,
+    'large': 320,
+}
+
+# formato: (extensión, formato de Pillow, opciones de guardado, content type)
+FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}, 'image/webp'),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}, 'image/jpeg'),
+}
+
+MAX_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='thumbnails')
+
+# Fotos con una generación encolada desde profileThumbnail
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def rendition_path(name, size, fmt):
+    """Ruta en el storage de la miniatura `size`/`fmt` de la imagen `name`."""
+    stem = posixpath.splitext(name)[0]
+    return posixpath.join(THUMBNAIL_DIR, f'{stem}_{size}.{FORMATS[fmt][0]}')
+
+
+def generate_renditions(name, storage=default_storage):
+    """Genera las miniaturas que faltan de la imagen `name` abriéndola una sola vez."""
+    missing = [
+        (rendition_path(name, size, fmt), side, fmt)
+        for size, side in RENDITIONS.items() for fmt in FORMATS
+        if not storage.exists(rendition_path(name, size, fmt))
+    ]
+    if not missing:
+        return
+    try:
+        with storage.open(name, 'rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+        for path, side, fmt in missing:
+            _save(storage, path, image, side, fmt)
+    except (Image.DecompressionBombError, UnidentifiedImageError) as exc:
+        logger.warning('La foto %s no se puede convertir en miniaturas: %s', name, exc)
+    except Exception:
+        logger.exception('No se pudieron generar las miniaturas de %s', name)
+
+    if not CustomUser.all_objects.filter(profile_picture=name).exists():
+        # La foto se reemplazó o se eliminó durante la generación
+        delete_renditions(name, storage)
+
+
+def delete_renditions(name, storage=default_storage):
+    for size in RENDITIONS:
+        for fmt in FORMATS:
+            path = rendition_path(name, size, fmt)
+            if storage.exists(path):
+                storage.delete(path)
+
+
+def _save(storage, path, image, side, fmt):
+    _, pil_format, options, _ = FORMATS[fmt]
+    thumbnail = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+    if pil_format == 'JPEG' or thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGB')
+    buffer = BytesIO()
+    thumbnail.save(buffer, pil_format, **options)
+    saved = storage.save(path, ContentFile(buffer.getvalue()))
+    if saved != path:
+        # Otro proceso guardó la misma miniatura primero y el storage renombró esta copia
+        storage.delete(saved)
+
+
+def _run_in_worker(function, name):
+    try:
+        function(name)
+    finally:
+        # Los hilos del pool son de larga vida: no deben retener la conexión abierta
+        connection.close()
+
+
+def schedule(function, name):
+    """Ejecuta function(name) en el pool de miniaturas."""
+    _executor.submit(_run_in_worker, function, name)
+
+
+def _generate_pending(name):
+    try:
+        generate_renditions(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def schedule_missing(name):
+    """
+    Encola la generación de las miniaturas que faltan de `name`, salvo que ya haya
+    una encolada para esa foto en este proceso.
+    """
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    schedule(_generate_pending, name)
+
+
+@lru_cache(maxsize=None)
+def _url_template(size, fmt):
+    # reverse() por fila es costoso en listas grandes: se resuelve una vez por tamaño y formato
+    return reverse('profile_thumbnail', args=(0, size, fmt)).replace('/0/', '/{user_id}/', 1)
+
+
+def thumbnail_urls(user_id, name, request=None):
+    """
+    URLs de las miniaturas de una foto de perfil como {tamaño: {formato: url}}, o
+    None si el usuario no tiene foto. Apuntan a profileThumbnail, que sirve la
+    miniatura ya generada; `v` cambia con la foto para invalidar cachés HTTP.
+    """
+    if not name:
+        return None
+    version = zlib.crc32(str(name).encode())
+    urls = {}
+    for size in RENDITIONS:
+        urls[size] = {}
+        for fmt in FORMATS:
+            url = f'{_url_template(size, fmt).format(user_id=user_id)}?v={version}'
+            urls[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
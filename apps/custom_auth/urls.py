@@ -5,13 +5,16 @@ from . import views
 urlpatterns = [
     # Rutas de autenticación JWT
     path('token/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', views.TokenRefreshView.as_view(), name='token_refresh'), 
+    path('token/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'), 
     # Rutas de usuarios
     path('register/', views.UserRegistrationView.as_view(), name='register_user'),
+    path('import/', views.importUsers, name='import_users'),
     path('profile/', views.getUserProfile, name='user_profile'),
+    path('thumbnail/<int:custom_user_id>/<slug:size>.<slug:fmt>', views.profileThumbnail, name='profile_thumbnail'),
     path('delete/<int:custom_user_id>/', views.deleteUser, name='delete_user'),
     path('update/<int:custom_user_id>/', views.updateUser, name='update_user'),
     path('get/<int:custom_user_id>/', views.getUser, name='get_user'),
     path('list/', views.listUsers, name='list_users'),
+    path('search/', views.searchUsers, name='search_users'),
     path("logout/", views.logoutUser, name="logout-user"),
 ]
\ No newline at end of file
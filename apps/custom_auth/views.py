@@ -1,14 +1,26 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from apps.custom_auth.models import CustomUser
-from .serializers import CustomUserSerializer, CustomTokenObtainPairSerializer, UserRegisterSerializer
+from .serializers import (
+    USERNAME_TAKEN, CustomUserSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer,
+    UserRegisterSerializer
+)
+from .blacklist import FilteredRefreshToken
+from . import roster, search, thumbnails
+from django.db import IntegrityError
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponseRedirect
+from django.urls import reverse
 from rest_framework import generics
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.generics import GenericAPIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from apps.lab import purge
+from athletes_tracking.pagination import KeysetPagination
+from athletes_tracking.params import is_integer
 
 def is_admin(user):
     """
@@ -24,6 +36,14 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    Vista personalizada para refrescar tokens JWT sin consultar la lista negra
+    en la base de datos cuando el token no fue revocado.
+    """
+    serializer_class = CustomTokenRefreshSerializer
+
+
 class UserRegistrationView(generics.CreateAPIView):
     """
     Vista para el registro de usuarios.
@@ -34,7 +54,14 @@ class UserRegistrationView(generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except IntegrityError:
+                # Otro registro tomó el username después de la validación
+                return Response({
+                    'status': 'error',
+                    'message': {'username': [USERNAME_TAKEN]}
+                }, status=status.HTTP_400_BAD_REQUEST)
             refresh = RefreshToken.for_user(user)
             return Response({
                 'status': 'success',
@@ -51,6 +78,62 @@ class UserRegistrationView(generics.CreateAPIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importUsers(request):
+    """
+    Importa masivamente un roster de usuarios (normalmente atletas).
+
+    Acepta una lista JSON en `users` o un CSV (cuerpo text/csv o archivo `file` en
+    multipart). Las filas válidas se crean en lote y las inválidas se reportan por
+    fila. Los tokens JWT solo se generan si se indica `tokens=true`.
+
+    Esta vista está restringida a superusuarios o usuarios con privilegios de administrador.
+    """
+    if not is_admin(request.user):
+        return Response({
+            'status': 'error',
+            'message': 'No tienes permiso para importar usuarios'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        if request.content_type.startswith('text/csv'):
+            rows = roster.parse_csv(request.body.decode('utf-8-sig'))
+        elif 'file' in request.FILES:
+            rows = roster.parse_csv(request.FILES['file'].read().decode('utf-8-sig'))
+        elif isinstance(request.data, dict):
+            rows = request.data.get('users')
+        else:
+            rows = None
+    except UnicodeDecodeError:
+        return Response({
+            'status': 'error',
+            'message': 'El roster debe estar codificado en UTF-8'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not isinstance(rows, list) or not rows:
+        return Response({
+            'status': 'error',
+            'message': 'El roster no contiene usuarios'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with_tokens = str(request.query_params.get('tokens', '')).lower() in ('1', 'true', 'yes')
+    created, errors = roster.import_roster(rows, with_tokens=with_tokens)
+    if not created:
+        return Response({
+            'status': 'error',
+            'message': 'Ningún usuario pudo importarse',
+            'errors': errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'status': 'success',
+        'message': f'{len(created)} usuarios importados',
+        'created': created,
+        'errors': errors
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def deleteUser(request, custom_user_id):
@@ -58,6 +141,9 @@ def deleteUser(request, custom_user_id):
     Elimina un usuario del sistema basado en el ID proporcionado.
     
     Esta vista está restringida a superusuarios o usuarios con privilegios de administrador.
+    El usuario se desactiva y deja de ser visible de inmediato; sus resultados y demás
+    dependientes se eliminan en segundo plano (ver apps.lab.purge) y el progreso se
+    consulta en la URL `purge_status_url` de la respuesta.
     """
     if not is_admin(request.user):
         return Response({
@@ -67,10 +153,12 @@ def deleteUser(request, custom_user_id):
     
     try:
         user = CustomUser.objects.get(id=custom_user_id)
-        user.delete()
+        job = purge.soft_delete_user(user)
         return Response({
             'status': 'success',
-            'message': 'Usuario eliminado correctamente'
+            'message': 'Usuario eliminado correctamente',
+            'purge_job': job.id,
+            'purge_status_url': reverse('purge_status', args=[job.id])
         })
     except CustomUser.DoesNotExist:
         return Response({
@@ -97,7 +185,14 @@ def updateUser(request, custom_user_id):
         user = CustomUser.objects.get(id=custom_user_id)
         serializer = CustomUserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except IntegrityError:
+                # Otro registro tomó el username después de la validación
+                return Response({
+                    'status': 'error',
+                    'message': {'username': [USERNAME_TAKEN]}
+                }, status=status.HTTP_400_BAD_REQUEST)
             return Response({
                 'status': 'success',
                 'message': 'Usuario actualizado correctamente'
@@ -144,18 +239,92 @@ def listUsers(request):
     """
     Maneja el listado de usuarios en formato JSON.
     
+    Los usuarios se devuelven paginados por cursor sobre `id`. Acepta los parámetros
+    opcionales `page_size` y `cursor`; la respuesta incluye `next_cursor`, que es
+    None en la última página.
+    
     Esta vista está restringida a usuarios con privilegios administrativos.
     """
     if request.user.is_staff or request.user.is_superuser:
-        users = CustomUser.objects.all()
+        paginator = KeysetPagination(ordering=('id',))
+        users = paginator.paginate_queryset(CustomUser.objects.all(), request)
         serializer = CustomUserSerializer(users, many=True)
-        return Response({"Users": serializer.data})
+        return Response({"Users": serializer.data, "next_cursor": paginator.next_cursor})
     
     return Response({
         "status": "error",
         "message": "No tienes permiso para ver esta página"
     }, status=status.HTTP_403_FORBIDDEN)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def searchUsers(request):
+    """
+    Busca usuarios por nombre, username o email para los selectores con autocompletado.
+    
+    Primero se devuelven los usuarios que contienen cada palabra de `q` completa y
+    después los que la contienen como prefijo, cada grupo ordenado por relevancia
+    (ver apps.custom_auth.search). Acepta los filtros opcionales `role`,
+    `discipline` y `coach` (ID del entrenador), y `limit` (entre 1 y 50, por
+    defecto 10).
+    
+    Los administradores buscan entre todos los usuarios y los entrenadores solo
+    entre sus atletas.
+    """
+    if is_admin(request.user):
+        coach = request.query_params.get('coach')
+        if coach is not None and not is_integer(coach):
+            return Response({
+                'status': 'error',
+                'message': 'coach debe ser el ID de un entrenador'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        coach_id = int(coach) if coach is not None else None
+    elif request.user.is_coach():
+        coach_id = request.user.id
+    else:
+        return Response({
+            'status': 'error',
+            'message': 'No tienes permiso para buscar usuarios'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    query = request.query_params.get('q', '').strip()
+    if not query or len(query) > 100:
+        return Response({
+            'status': 'error',
+            'message': 'q debe tener entre 1 y 100 caracteres'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    role = request.query_params.get('role')
+    if role is not None and role not in dict(CustomUser.ROLE_CHOICES):
+        return Response({
+            'status': 'error',
+            'message': 'Rol no válido'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    discipline = request.query_params.get('discipline')
+    if discipline is not None and discipline not in dict(CustomUser.DISCIPLINE_CHOICES):
+        return Response({
+            'status': 'error',
+            'message': 'Disciplina no válida'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = request.query_params.get('limit', str(search.DEFAULT_LIMIT))
+    if not is_integer(limit) or not 1 <= int(limit) <= search.MAX_LIMIT:
+        return Response({
+            'status': 'error',
+            'message': f'limit debe estar entre 1 y {search.MAX_LIMIT}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    users = search.search_users(query, role=role, discipline=discipline, coach_id=coach_id, limit=int(limit))
+    return Response({
+        'status': 'success',
+        'users': [
+            {**{field: user[field] for field in search.RESULT_FIELDS if field != 'coach_id'},
+             'coach': user['coach_id']}
+            for user in users
+        ]
+    })
+
 @api_view(['POST'])
 def logoutUser(request):
     """
@@ -170,7 +339,7 @@ def logoutUser(request):
                 'message': 'Token de refresco no proporcionado'
             }, status=status.HTTP_400_BAD_REQUEST)
             
-        token = RefreshToken(refresh_token)
+        token = FilteredRefreshToken(refresh_token)
         token.blacklist()     
         return Response({
             'status': 'success',
@@ -189,4 +358,43 @@ def getUserProfile(request):
     Obtiene el perfil del usuario autenticado actual.
     """
     serializer = CustomUserSerializer(request.user)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def profileThumbnail(request, custom_user_id, size, fmt):
+    """
+    Sirve una miniatura de la foto de perfil de un usuario.
+
+    Nunca procesa la imagen en la solicitud: si la miniatura todavía no existe,
+    encola su generación en el pool de miniaturas y redirige a la foto original
+    (sin caché, para que la siguiente solicitud reciba la miniatura). Es pública,
+    como la URL de la foto original, para que pueda usarse directamente en
+    etiquetas <img>.
+    """
+    if size not in thumbnails.RENDITIONS or fmt not in thumbnails.FORMATS:
+        return Response({
+            'status': 'error',
+            'message': 'Tamaño o formato de miniatura no válido'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    name = CustomUser.objects.filter(id=custom_user_id).values_list('profile_picture', flat=True).first()
+    if not name:
+        return Response({
+            'status': 'error',
+            'message': 'El usuario no tiene foto de perfil'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        thumbnail = default_storage.open(thumbnails.rendition_path(name, size, fmt), 'rb')
+    except FileNotFoundError:
+        thumbnails.schedule_missing(name)
+        response = HttpResponseRedirect(default_storage.url(name))
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    response = FileResponse(thumbnail, content_type=thumbnails.FORMATS[fmt][3])
+    # La URL incluye la versión de la foto (?v=...), así que la respuesta puede cachearse
+    response['Cache-Control'] = 'public, max-age=2592000'
+    return response
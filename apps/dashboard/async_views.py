@@ -0,0 +1,218 @@
+"""
+Versiones asíncronas (ASGI) de las vistas de lectura del dashboard.
+
+DRF no ejecuta vistas asíncronas, así que estas son vistas nativas de Django que
+usan el ORM asíncrono (afirst, aexists, async for). Autentican con las mismas
+clases que las vistas de DRF (DEFAULT_AUTHENTICATION_CLASSES): las que definen
+aauthenticate (ClaimsJWTAuthentication) se ejecutan sin pasar por un hilo y las
+demás con sync_to_async. Las consultas independientes se lanzan juntas con
+asyncio.gather. Devuelven el mismo JSON y los mismos códigos de estado que las
+vistas de apps.dashboard.views, incluidos los ETags y las respuestas 304 (ver
+apps.dashboard.etags).
+
+Se activan con ASYNC_DASHBOARD_VIEWS = True en settings (ver apps.dashboard.urls),
+pensado para despliegues con athletes_tracking.asgi.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from apps.custom_auth.models import CustomUser
+from apps.custom_auth.permissions import CanViewAthlete, athlete_scope
+from apps.lab.catalog import etag_matches
+from apps.lab.models import ACTIVE_RESULTS, TestResult
+from apps.lab.result_filters import FilterError, filter_results
+from athletes_tracking.db import read_from_replica
+from athletes_tracking.pagination import KeysetPagination
+from .etags import apage_etag, aresults_etag, ausers_etag, with_etag
+from .serializers import test_result_data, test_result_values, user_data, user_values
+
+
+def _response(data, status=200, etag=None):
+    response = JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    return with_etag(response, etag) if etag else response
+
+
+def _not_modified(etag):
+    return with_etag(HttpResponseNotModified(), etag)
+
+
+def _error(message, status):
+    return _response({'status': 'error', 'message': message}, status=status)
+
+
+async def authenticate(request):
+    """
+    Devuelve el usuario autenticado por la primera clase de
+    DEFAULT_AUTHENTICATION_CLASSES que acepte las credenciales de la solicitud, o
+    None si ninguna lo hace o alguna las rechaza (como DRF, que responde 401).
+    """
+    drf_request = Request(request)
+    for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        authenticator = authenticator_class()
+        try:
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(drf_request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(drf_request)
+        except APIException:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+def jwt_required(view):
+    """Equivalente asíncrono de @permission_classes([IsAuthenticated]) con JWT."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await authenticate(request)
+        if user is None:
+            response = _error('Las credenciales de autenticación no se proveyeron o no son válidas', 401)
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+            return response
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _rows(queryset):
+    return [row async for row in queryset]
+
+
+@require_GET
+@jwt_required
+async def adminDashboard(request):
+    """
+    Vista asíncrona del dashboard de administrador.
+
+    Usuarios paginados por cursor sobre (role, id), con los parámetros opcionales
+    `role`, `page_size` y `cursor`.
+    """
+    if not request.user.is_admin():
+        return _error('No tiene permiso para ver esta página', 403)
+
+    users = CustomUser.objects.all()
+    role = request.GET.get('role')
+    if role:
+        users = users.filter(role=role)
+
+    paginator = KeysetPagination(ordering=('role', 'id'))
+    try:
+        page, page_size = paginator.page_queryset(users, request)
+    except ValidationError as e:
+        return _response({'status': 'error', 'message': e.detail}, status=400)
+
+    etag = await apage_etag(request, page)
+    if etag_matches(request, etag):
+        return _not_modified(etag)
+
+    page = paginator.finish_page([row async for row in user_values(page)], page_size)
+
+    return _response({
+        'status': 'success',
+        'users': user_data(page),
+        'next_cursor': paginator.next_cursor
+    }, etag=etag)
+
+
+@require_GET
+@jwt_required
+async def coachDashboard(request, custom_user_id):
+    """
+    Vista asíncrona del dashboard de entrenador.
+
+    La existencia del entrenador y la versión de su lista de atletas se consultan
+    en paralelo; la lista solo se recupera si el ETag del cliente no está vigente.
+    """
+    if request.user.role not in ('coach', 'admin'):
+        return _error('Solo los entrenadores pueden acceder a esta vista', 403)
+
+    athletes = CustomUser.objects.filter(coach_id=custom_user_id)
+    coach_exists, etag = await asyncio.gather(
+        CustomUser.objects.filter(id=custom_user_id, role='coach').aexists(),
+        ausers_etag(request, athletes),
+    )
+    if not coach_exists:
+        return _error('Entrenador no encontrado', 404)
+    if etag_matches(request, etag):
+        return _not_modified(etag)
+
+    return _response({
+        'status': 'success',
+        'athletes': user_data(await _rows(user_values(athletes)))
+    }, etag=etag)
+
+
+async def _can_view(request, athlete_id):
+    """Equivalente asíncrono de CanViewAthlete."""
+    scope = athlete_scope(request)
+    await scope.aathlete_ids()
+    return scope.can_view(athlete_id)
+
+
+@require_GET
+@jwt_required
+async def athleteDashboard(request, custom_user_id):
+    """Vista asíncrona del dashboard de atleta."""
+    if not await _can_view(request, custom_user_id):
+        return _error(CanViewAthlete.message, 403)
+
+    athlete = await user_values(
+        CustomUser.objects.filter(id=custom_user_id, role='athlete')
+    ).afirst()
+    if athlete is None:
+        return _error('Atleta no encontrado', 404)
+
+    return _response({
+        'status': 'success',
+        'athlete': user_data([athlete])[0]
+    })
+
+
+@read_from_replica
+@require_GET
+@jwt_required
+async def testResults(request, custom_user_id):
+    """
+    Vista asíncrona de resultados de pruebas de un atleta.
+
+    Acepta los mismos filtros que la vista síncrona (ver apps.lab.result_filters).
+    Para los administradores, la existencia del atleta y la versión de sus
+    resultados se consultan en paralelo; los resultados solo se recuperan si el
+    ETag del cliente no está vigente.
+    """
+    if not await _can_view(request, custom_user_id):
+        return _error(CanViewAthlete.message, 403)
+
+    try:
+        results = filter_results(
+            test_result_values(TestResult.objects.filter(ACTIVE_RESULTS, athlete_id=custom_user_id)),
+            request.GET,
+        )
+    except FilterError as e:
+        return _error(str(e), 400)
+
+    etag = aresults_etag(request, custom_user_id)
+    if athlete_scope(request).sees_all:
+        exists, etag = await asyncio.gather(
+            CustomUser.objects.filter(id=custom_user_id, role='athlete').aexists(),
+            etag,
+        )
+        if not exists:
+            return _error('Atleta no encontrado', 404)
+    else:
+        etag = await etag
+    if etag_matches(request, etag):
+        return _not_modified(etag)
+
+    return _response({
+        'status': 'success',
+        'test_results': test_result_data(await _rows(results))
+    }, etag=etag)
@@ -0,0 +1,113 @@
+"""
+ETags de las vistas del dashboard calculados a partir de versiones de datos.
+
+En lugar de serializar la respuesta y hashear el cuerpo, el ETag se deriva de una
+versión de los datos del alcance de la vista, leída de la base de datos con una
+sola consulta:
+
+    - Resultados de un atleta: número de filas, máximo id y máximo updated_at de
+      los resultados, y máximo updated_at de sus sesiones y tests (cuyos datos se
+      incluyen en la respuesta o se usan en los filtros).
+    - Listas de usuarios (atletas de un entrenador): número de filas, máximo id y
+      máximo updated_at de los usuarios y de sus entrenadores.
+    - Páginas de adminDashboard: id y updated_at de cada usuario de la página (y
+      de su entrenador), leídos con la misma consulta por cursor que la página. El
+      costo es el de una página y no crece con la tabla de usuarios.
+
+Las inserciones y eliminaciones cambian el número de filas o el máximo id, y las
+ediciones el máximo updated_at (auto_now), así que la versión es la misma en
+todos los procesos y no depende de señales ni de la caché. Las actualizaciones
+con QuerySet.update() o SQL directo deben asignar updated_at explícitamente. El
+ETag incluye además la ruta con sus parámetros, de modo que cada combinación de
+filtros, orden o cursor tiene el suyo.
+
+Las vistas comparan el ETag con If-None-Match (apps.lab.catalog.etag_matches)
+después de validar permisos y parámetros, y responden 304 sin consultar ni
+serializar las filas. Como el contenido depende del usuario autenticado, las
+respuestas llevan `Vary: Authorization` y `Cache-Control: private, no-cache`:
+ninguna caché compartida las guarda y el cliente revalida siempre con el ETag.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from apps.lab.models import ACTIVE_RESULTS, TestResult
+
+
+def _etag(request, *parts):
+    payload = '|'.join(str(part) for part in (request.get_full_path(), *parts)).encode()
+    return '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+def _results(athlete_id):
+    return TestResult.objects.filter(ACTIVE_RESULTS, athlete_id=athlete_id)
+
+
+def _results_version():
+    return {
+        'count': Count('id'),
+        'last': Max('id'),
+        'updated': Max('updated_at'),
+        'session': Max('session__updated_at'),
+        'test': Max('test__updated_at'),
+    }
+
+
+def _users_version():
+    return {
+        'count': Count('id'),
+        'last': Max('id'),
+        'updated': Max('updated_at'),
+        'coach': Max('coach__updated_at'),
+    }
+
+
+def _version_etag(request, version):
+    return _etag(request, *(version[key] for key in sorted(version)))
+
+
+def results_etag(request, athlete_id):
+    """ETag de los resultados del atleta para la ruta de la solicitud."""
+    return _version_etag(request, _results(athlete_id).aggregate(**_results_version()))
+
+
+async def aresults_etag(request, athlete_id):
+    """Versión asíncrona de results_etag."""
+    return _version_etag(request, await _results(athlete_id).aaggregate(**_results_version()))
+
+
+# Columnas de cada fila de una página de usuarios que forman su versión
+PAGE_VERSION_FIELDS = ('id', 'updated_at', 'coach__updated_at')
+
+
+def users_etag(request, users):
+    """ETag de la lista de usuarios `users` (un queryset de CustomUser) para la ruta de la solicitud."""
+    return _version_etag(request, users.aggregate(**_users_version()))
+
+
+async def ausers_etag(request, users):
+    """Versión asíncrona de users_etag."""
+    return _version_etag(request, await users.aaggregate(**_users_version()))
+
+
+def page_etag(request, page):
+    """
+    ETag de una página de usuarios para la ruta de la solicitud. `page` es el
+    queryset de KeysetPagination.page_queryset (incluye la fila extra, de modo que
+    una inserción o eliminación que cambie la página siguiente también lo cambia).
+    """
+    return _etag(request, *page.values_list(*PAGE_VERSION_FIELDS))
+
+
+async def apage_etag(request, page):
+    """Versión asíncrona de page_etag."""
+    return _etag(request, *[row async for row in page.values_list(*PAGE_VERSION_FIELDS)])
+
+
+def with_etag(response, etag):
+    """Agrega a la respuesta (200 o 304) el ETag y las cabeceras de caché privada."""
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization',))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
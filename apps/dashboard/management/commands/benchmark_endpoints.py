@@ -0,0 +1,221 @@
+import logging
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.custom_auth.models import CustomUser
+from apps.lab.models import Test, TestResult
+
+# Parámetros de ruta, p. ej. <int:custom_user_id>
+ROUTE_PARAM = re.compile(r'<(?:\w+:)?(\w+)>')
+
+# Número de consultas informado por RequestMetricsMiddleware en Server-Timing
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+SKIPPED_NAMESPACES = ('admin',)
+
+
+def iter_routes(patterns, prefix=''):
+    """Recorre el URLconf y produce (ruta, URLPattern) para cada vista."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            yield from iter_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def allows_get(callback):
+    """True si la vista (función @api_view o vista de clase) responde a GET."""
+    view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+    return view_class is not None and hasattr(view_class, 'get')
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta solicitudes GET autenticadas contra todas las rutas de lectura de '
+        'athletes_tracking/urls.py con la concurrencia indicada e informa la latencia '
+        'p50/p95/p99 y las consultas SQL por solicitud. Las rutas que modifican datos se omiten.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Solicitudes por ruta.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Clientes concurrentes por ruta.')
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='Solicitudes previas no medidas por ruta.')
+        parser.add_argument('--role', choices=['admin', 'coach', 'athlete'], default='admin',
+                            help='Rol del usuario autenticado si no se indica --user.')
+        parser.add_argument('--user', help='Username del usuario autenticado.')
+        parser.add_argument('--base-url',
+                            help='URL de un servidor en ejecución (p. ej. http://localhost:8000); '
+                                 'por defecto las solicitudes se ejecutan en proceso.')
+        parser.add_argument('--match', help='Solo rutas que contengan este texto.')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options)
+        ids = self.sample_ids(user)
+        token = str(RefreshToken.for_user(user).access_token)
+
+        if options['base_url']:
+            fetch = self.http_fetcher(options['base_url'].rstrip('/'), token)
+        else:
+            fetch = self.client_fetcher(token)
+            if options['verbosity'] < 2:
+                # Una línea de log por solicitud ocultaría el reporte
+                logging.getLogger('athletes_tracking.requests').setLevel(logging.WARNING)
+                logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        routes, skipped = self.build_routes(ids, options['match'])
+        self.stdout.write(f'Usuario: {user.username} ({user.role}); {len(routes)} rutas, '
+                          f'{options["requests"]} solicitudes cada una, concurrencia {options["concurrency"]}')
+        self.stdout.write(f'{"ruta":48} {"ok":>5} {"err":>4} {"p50 ms":>8} {"p95 ms":>8} '
+                          f'{"p99 ms":>8} {"q/req":>6} {"req/s":>7}')
+        for path in routes:
+            for _ in range(options['warmup']):
+                fetch(path)
+            samples, elapsed = self.run(fetch, path, options['requests'], options['concurrency'])
+            self.report(path, samples, elapsed)
+        for route, reason in skipped:
+            self.stdout.write(self.style.WARNING(f'omitida {route}: {reason}'))
+
+    def get_user(self, options):
+        users = CustomUser.objects.order_by('id')
+        if options['user']:
+            user = users.filter(username=options['user']).first()
+        else:
+            user = users.filter(role=options['role'], is_active=True).first()
+        if user is None:
+            raise CommandError('No se encontró el usuario; genere datos con generate_synthetic_data')
+        return user
+
+    def sample_ids(self, user):
+        """Ids de coach, atleta y test visibles para el usuario, usados en las rutas."""
+        if user.role == 'athlete':
+            coach_id, athlete_id = user.coach_id, user.id
+        elif user.role == 'coach':
+            coach_id = user.id
+            athlete_id = CustomUser.objects.filter(coach_id=user.id).values_list('id', flat=True).first()
+        else:
+            athlete = CustomUser.objects.filter(
+                role='athlete', coach__isnull=False
+            ).order_by('id').values('id', 'coach_id').first() or {}
+            coach_id, athlete_id = athlete.get('coach_id'), athlete.get('id')
+        test_id = (
+            TestResult.objects.filter(athlete_id=athlete_id).values_list('test_id', flat=True).first()
+            or Test.objects.values_list('id', flat=True).first()
+        )
+        return {'coach': coach_id, 'athlete': athlete_id, 'test': test_id}
+
+    def build_routes(self, ids, match):
+        routes, skipped = [], []
+        for route, pattern in iter_routes(get_resolver().url_patterns):
+            if match and match not in route:
+                continue
+            if not allows_get(pattern.callback):
+                skipped.append((route, 'no responde a GET'))
+                continue
+            values = {}
+            for param in ROUTE_PARAM.findall(route):
+                if param == 'custom_user_id':
+                    values[param] = ids['coach'] if 'coach' in (pattern.name or '') else ids['athlete']
+                elif param == 'test_id':
+                    values[param] = ids['test']
+                else:
+                    values[param] = None
+            missing = [param for param, value in values.items() if value is None]
+            if missing:
+                skipped.append((route, f'sin valor para {", ".join(missing)}'))
+                continue
+            routes.append('/' + ROUTE_PARAM.sub(lambda m: str(values[m.group(1)]), route))
+        return routes, skipped
+
+    def client_fetcher(self, token):
+        local = threading.local()
+
+        def fetch(path):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(
+                    raise_request_exception=False, HTTP_HOST=_host(),
+                    HTTP_AUTHORIZATION=f'Bearer {token}',
+                )
+            start = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+            return response.status_code, elapsed, response.get('Server-Timing', '')
+        return fetch
+
+    def http_fetcher(self, base_url, token):
+        def fetch(path):
+            request = urllib.request.Request(base_url + path, headers={'Authorization': f'Bearer {token}'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    code, timing = response.status, response.headers.get('Server-Timing', '')
+            except urllib.error.HTTPError as e:
+                e.read()
+                code, timing = e.code, e.headers.get('Server-Timing', '')
+            elapsed = (time.perf_counter() - start) * 1000
+            return code, elapsed, timing
+        return fetch
+
+    def run(self, fetch, path, requests, concurrency):
+        """Reparte `requests` solicitudes entre `concurrency` hilos; retorna (muestras, segundos)."""
+        samples = []
+        lock = threading.Lock()
+        pending = iter(range(requests))
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(pending, None) is None:
+                            return
+                    sample = fetch(path)
+                    with lock:
+                        samples.append(sample)
+            finally:
+                # Cada hilo abre su propia conexión a la base de datos en modo en proceso
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(concurrency, 1))]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - start
+
+    def report(self, path, samples, elapsed):
+        ok = [s for s in samples if s[0] < 400]
+        errors = len(samples) - len(ok)
+        latencies = np.array([s[1] for s in samples])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies.size else (0, 0, 0)
+        queries = [int(m.group(1)) for s in samples for m in [SERVER_TIMING_QUERIES.search(s[2])] if m]
+        per_request = f'{sum(queries) / len(queries):6.1f}' if queries else f'{"-":>6}'
+        line = (f'{path:48} {len(ok):5} {errors:4} {p50:8.1f} {p95:8.1f} {p99:8.1f} '
+                f'{per_request} {len(samples) / elapsed if elapsed else 0:7.1f}')
+        self.stdout.write(self.style.ERROR(line) if errors else line)
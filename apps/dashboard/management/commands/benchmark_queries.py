@@ -0,0 +1,123 @@
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min
+
+from apps.custom_auth.models import CustomUser
+from apps.lab.models import EvaluationSession, PersonalBest, TestResult
+from apps.lab.synthetic import generate_dataset
+
+# En SQLite una línea "SCAN <tabla>" sin "USING ... INDEX" es un recorrido completo
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?!.*\bINDEX\b)')
+
+INDEXED_MODELS = (CustomUser, EvaluationSession, TestResult)
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un conjunto de datos sintético en una base de datos de prueba y muestra el '
+        'plan de ejecución y los tiempos de las consultas de los dashboards, sin y con los '
+        'índices declarados en Meta.indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coaches', type=int, default=20)
+        parser.add_argument('--athletes', type=int, default=2000)
+        parser.add_argument('--tests', type=int, default=12)
+        parser.add_argument('--sessions', type=int, default=120)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Repeticiones por consulta; se informa la mediana.')
+        parser.add_argument('--strict', action='store_true',
+                            help='Termina con error si alguna consulta recorre una tabla completa con índices.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            counts = generate_dataset(
+                coaches=options['coaches'], athletes=options['athletes'], tests=options['tests'],
+                sessions=options['sessions'], prefix='bench',
+            )
+            self.stdout.write('Datos generados: ' + ', '.join(f'{k}={v}' for k, v in counts.items()))
+            queries = self.build_queries()
+
+            self.set_indexes(False)
+            before = self.run_queries(queries, options['repeat'])
+            self.set_indexes(True)
+            after = self.run_queries(queries, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        scans = []
+        for label, _ in queries:
+            b_ms, b_plan = before[label]
+            a_ms, a_plan = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.stdout.write(f'  sin índices: {b_ms:8.3f} ms')
+            self.stdout.write(self.indent(b_plan))
+            self.stdout.write(f'  con índices: {a_ms:8.3f} ms')
+            self.stdout.write(self.indent(a_plan))
+            tables = FULL_SCAN.findall(a_plan)
+            if tables:
+                scans.append(label)
+                self.stdout.write(self.style.WARNING(f'  recorrido completo: {", ".join(tables)}'))
+
+        if scans and options['strict']:
+            raise SystemExit(f'Consultas con recorrido completo: {", ".join(scans)}')
+
+    def build_queries(self):
+        """Consultas equivalentes a las que ejecutan los endpoints de los dashboards."""
+        coach_id = CustomUser.objects.filter(role='coach').values_list('id', flat=True).first()
+        athlete = CustomUser.objects.filter(role='athlete').values('id', 'discipline').first()
+        result = TestResult.objects.filter(athlete_id=athlete['id']).values('test_id', 'session_id').first()
+        return [
+            ('adminDashboard (página por role, id)',
+             CustomUser.objects.select_related('coach').order_by('role', 'id')[:11]),
+            ('coachDashboard (atletas del coach)',
+             CustomUser.objects.filter(role='athlete', coach_id=coach_id)),
+            ('testResults (historial del atleta)',
+             TestResult.objects.select_related('test', 'session').filter(athlete_id=athlete['id'])),
+            ('último resultado por atleta y test',
+             TestResult.objects.filter(athlete_id=athlete['id'], test_id=result['test_id'])
+             .order_by('-date_recorded')[:1]),
+            ('sesiones por disciplina',
+             EvaluationSession.objects.filter(discipline=athlete['discipline']).order_by('-date')),
+            ('resumen de sesión por test',
+             TestResult.objects.filter(session_id=result['session_id']).values('test_id')
+             .annotate(count=Count('id'), mean=Avg('numeric_value'),
+                       minimum=Min('numeric_value'), maximum=Max('numeric_value'))),
+            ('mejores marcas del roster',
+             PersonalBest.objects.select_related('test').filter(athlete__coach_id=coach_id)),
+            ('cohorte de percentiles',
+             PersonalBest.objects.filter(test_id=result['test_id'], athlete__discipline=athlete['discipline'])
+             .values_list('athlete_id', 'numeric_value')),
+        ]
+
+    def set_indexes(self, enabled):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    if enabled:
+                        editor.add_index(model, index)
+                    else:
+                        editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run_queries(self, queries, repeat):
+        results = {}
+        for label, queryset in queries:
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(timings), plan)
+        return results
+
+    def indent(self, text):
+        return '\n'.join(f'    {line}' for line in text.splitlines())
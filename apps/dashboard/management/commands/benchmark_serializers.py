@@ -0,0 +1,96 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from apps.custom_auth.models import CustomUser
+from apps.dashboard.serializers import (
+    CustomUserSerializer, TestResultSerializer,
+    test_result_data, test_result_values, user_data, user_values
+)
+from apps.lab.models import EvaluationSession, Test, TestResult
+
+TESTS = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara en una base de datos de prueba los serializadores de modelo con la '
+        'serialización ligera basada en values() para las listas de usuarios y resultados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Número de usuarios y de resultados a serializar.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Repeticiones por caso; se informa la mediana.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            athlete_id = self.seed(options['rows'])
+            users = CustomUser.objects.filter(role='athlete').order_by('id')
+            results = TestResult.objects.filter(athlete_id=athlete_id).order_by('id')
+            cases = [
+                ('usuarios: CustomUserSerializer',
+                 lambda: CustomUserSerializer(users.select_related('coach'), many=True).data),
+                ('usuarios: user_data(values())',
+                 lambda: user_data(user_values(users))),
+                ('resultados: TestResultSerializer',
+                 lambda: TestResultSerializer(results.select_related('test', 'session'), many=True).data),
+                ('resultados: test_result_data(values())',
+                 lambda: test_result_data(test_result_values(results))),
+            ]
+            for label, build in cases:
+                total, render, size = self.measure(build, options['repeat'])
+                self.stdout.write(
+                    f'{label:42} {total:9.1f} ms consulta+serialización, '
+                    f'{render:8.1f} ms JSON, {size / 1024:8.0f} KiB'
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, rows):
+        """Crea `rows` atletas y `rows` resultados de un mismo atleta; retorna su id."""
+        password = make_password(None)
+        coaches = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_coach_{i}', email=f'bench_coach_{i}@example.com',
+                       name=f'Coach {i}', password=password, role='coach', discipline='athletics')
+            for i in range(20)
+        ])
+        athletes = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench_athlete_{i}', email=f'bench_athlete_{i}@example.com',
+                       name=f'Athlete {i}', password=password, role='athlete', discipline='athletics',
+                       coach=coaches[i % len(coaches)])
+            for i in range(rows)
+        ], batch_size=2000)
+        tests = Test.objects.bulk_create([
+            Test(name=f'bench test {i}', category='strength', description='', unit='kilograms')
+            for i in range(TESTS)
+        ])
+        sessions = EvaluationSession.objects.bulk_create([
+            EvaluationSession(date='2024-01-01', location='Sede', discipline='athletics', evaluator=coaches[0])
+            for _ in range(-(-rows // TESTS))
+        ])
+        athlete = athletes[0]
+        TestResult.objects.bulk_create([
+            TestResult(athlete=athlete, test=tests[i % TESTS], session=sessions[i // TESTS],
+                       numeric_value=i % 1000 + 0.25, notes='bench')
+            for i in range(rows)
+        ], batch_size=2000)
+        return athlete.id
+
+    def measure(self, build, repeat):
+        totals, renders, size = [], [], 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = build()
+            totals.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            size = len(JSONRenderer().render(data))
+            renders.append((time.perf_counter() - start) * 1000)
+        return statistics.median(totals), statistics.median(renders), size
@@ -4,29 +4,37 @@ from apps.lab.models import TestResult  # Ajusta la importación según tu model
 
 from rest_framework import serializers
 from apps.custom_auth.models import CustomUser
-from apps.lab.models import TestResult
+from apps.lab.models import FitnessScore, TestResult, PersonalBest
+from apps.custom_auth.thumbnails import thumbnail_urls
+from athletes_tracking.middleware import measure_serialization
+from athletes_tracking.serializers import TimedSerializerMixin
 
-class CoachSummarySerializer(serializers.ModelSerializer):
+class CoachSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer simplificado para información básica del coach"""
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'name', 'email', 'discipline', 'phone_number']
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     coach_details = CoachSummarySerializer(source='coach', read_only=True)
     coach_username = serializers.SerializerMethodField()
+    profile_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
         fields = [
             'id', 'username', 'name', 'email', 'role', 'discipline',
-            'date_of_birth', 'phone_number', 'coach', 'coach_username', 'coach_details'
+            'date_of_birth', 'phone_number', 'coach', 'coach_username', 'coach_details',
+            'profile_thumbnails'
         ]
 
     def get_coach_username(self, obj):
         return obj.coach.username if obj.coach else None
 
-class TestResultSerializer(serializers.ModelSerializer):
+    def get_profile_thumbnails(self, obj):
+        return thumbnail_urls(obj.id, obj.profile_picture.name if obj.profile_picture else None)
+
+class TestResultSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializador para el modelo TestResult."""
     test_name = serializers.CharField(source='test.name', read_only=True)
     test_unit = serializers.CharField(source='test.unit', read_only=True)
@@ -37,4 +45,124 @@ class TestResultSerializer(serializers.ModelSerializer):
         model = TestResult
         fields = ['id', 'athlete', 'test', 'session', 'numeric_value', 
                  'notes', 'date_recorded', 'test_name', 'test_unit', 
-                 'test_category', 'test_higher_is_better']
\ No newline at end of file
+                 'test_category', 'test_higher_is_better']
+
+
+class PersonalBestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializador para la mejor marca de un atleta en un test."""
+    test_name = serializers.CharField(source='test.name', read_only=True)
+    test_unit = serializers.CharField(source='test.unit', read_only=True)
+    test_category = serializers.CharField(source='test.category', read_only=True)
+    test_higher_is_better = serializers.BooleanField(source='test.higher_is_better', read_only=True)
+
+    class Meta:
+        model = PersonalBest
+        fields = ['athlete', 'test', 'result', 'numeric_value', 'date_recorded',
+                  'test_name', 'test_unit', 'test_category', 'test_higher_is_better']
+
+
+class FitnessScoreSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializador para el puntaje compuesto de un atleta en una categoría."""
+
+    class Meta:
+        model = FitnessScore
+        fields = ['athlete', 'category', 'score', 'tests', 'updated_at']
+
+
+class RosterAthleteSerializer(CustomUserSerializer):
+    """Atleta del roster con su resultado más reciente en cada test."""
+    latest_results = TestResultSerializer(many=True, read_only=True)
+
+    class Meta(CustomUserSerializer.Meta):
+        fields = CustomUserSerializer.Meta.fields + ['latest_results']
+
+
+"""
+Serialización ligera de solo lectura para los endpoints de listas.
+
+Los serializadores anteriores recorren sus campos por cada fila (y resuelven
+`coach` y `test.*` a través de objetos relacionados), lo que domina el tiempo de
+las respuestas grandes. Estas funciones leen una proyección values() con las
+columnas relacionadas unidas en la misma consulta y construyen diccionarios
+planos con exactamente la misma forma JSON que CustomUserSerializer y
+TestResultSerializer. Los tipos con formato (fechas, decimales) se convierten con
+los mismos campos de DRF para respetar la configuración de REST_FRAMEWORK.
+"""
+
+_date_field = serializers.DateField()
+_datetime_field = serializers.DateTimeField()
+_decimal_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+USER_VALUES = (
+    'id', 'username', 'name', 'email', 'role', 'discipline', 'date_of_birth', 'phone_number',
+    'coach', 'coach__username', 'coach__name', 'coach__email', 'coach__discipline',
+    'coach__phone_number', 'profile_picture',
+)
+
+TEST_RESULT_VALUES = (
+    'id', 'athlete', 'test', 'session', 'numeric_value', 'notes', 'date_recorded',
+    'test__name', 'test__unit', 'test__category', 'test__higher_is_better',
+)
+
+
+def user_values(queryset):
+    """Proyección de usuarios (con su coach) para user_data."""
+    return queryset.values(*USER_VALUES)
+
+
+@measure_serialization()
+def user_data(rows):
+    """Equivalente a CustomUserSerializer(..., many=True).data sobre filas de user_values."""
+    data = []
+    for row in rows:
+        coach = row['coach']
+        data.append({
+            'id': row['id'],
+            'username': row['username'],
+            'name': row['name'],
+            'email': row['email'],
+            'role': row['role'],
+            'discipline': row['discipline'],
+            'date_of_birth': _date_field.to_representation(row['date_of_birth']) if row['date_of_birth'] else None,
+            'phone_number': row['phone_number'],
+            'coach': coach,
+            'coach_username': row['coach__username'] if coach is not None else None,
+            'coach_details': {
+                'id': coach,
+                'username': row['coach__username'],
+                'name': row['coach__name'],
+                'email': row['coach__email'],
+                'discipline': row['coach__discipline'],
+                'phone_number': row['coach__phone_number'],
+            } if coach is not None else None,
+            'profile_thumbnails': thumbnail_urls(row['id'], row['profile_picture']),
+        })
+    return data
+
+
+def test_result_values(queryset):
+    """Proyección de resultados (con los datos del test) para test_result_data."""
+    return queryset.values(*TEST_RESULT_VALUES)
+
+
+@measure_serialization()
+def test_result_data(rows):
+    """Equivalente a TestResultSerializer(..., many=True).data sobre filas de test_result_values."""
+    to_decimal = _decimal_field.to_representation
+    to_datetime = _datetime_field.to_representation
+    return [
+        {
+            'id': row['id'],
+            'athlete': row['athlete'],
+            'test': row['test'],
+            'session': row['session'],
+            'numeric_value': to_decimal(row['numeric_value']),
+            'notes': row['notes'],
+            'date_recorded': to_datetime(row['date_recorded']) if row['date_recorded'] else None,
+            'test_name': row['test__name'],
+            'test_unit': row['test__unit'],
+            'test_category': row['test__category'],
+            'test_higher_is_better': row['test__higher_is_better'],
+        }
+        for row in rows
+    ]
@@ -1,3 +1,507 @@
-from django.test import TestCase
+import json
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.custom_auth.authentication import ClaimsUser
+from apps.custom_auth.models import CustomUser
+from apps.custom_auth.permissions import AthleteScope
+from apps.lab.models import EvaluationSession, Test, TestResult
+from athletes_tracking import middleware, versioned_cache
+from athletes_tracking.pagination import decode_cursor, encode_cursor
+from . import async_views
+from .serializers import (
+    CustomUserSerializer, TestResultSerializer,
+    test_result_data, test_result_values, user_data, user_values
+)
+
+
+def as_json(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class LeanSerializerParityTests(TestCase):
+    """La serialización basada en values() debe producir el mismo JSON que los serializadores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = CustomUser.objects.create(
+            username='coach', email='coach@example.com', name='Coach', role='coach',
+            discipline='athletics', phone_number='555-0100',
+            profile_picture='profile_pictures/coach.jpg',
+        )
+        cls.athlete = CustomUser.objects.create(
+            username='athlete', email='athlete@example.com', name='Athlete', role='athlete',
+            discipline='athletics', date_of_birth=date(2004, 5, 17), coach=cls.coach,
+        )
+        CustomUser.objects.create(username='no_birth_date', role='athlete', discipline='soccer',
+                                  coach=cls.coach)
+        evaluator = CustomUser.objects.create(username='evaluator', role='admin', discipline='athletics')
+        session = EvaluationSession.objects.create(
+            date=date(2024, 3, 1), location='Sede 1', discipline='athletics', evaluator=evaluator,
+        )
+        sprint = Test.objects.create(name='Sprint 30m', category='speed', description='',
+                                     unit='seconds', higher_is_better=False)
+        jump = Test.objects.create(name='Salto', category='strength', description='', unit='centimeters')
+        TestResult.objects.create(athlete=cls.athlete, test=sprint, session=session,
+                                  numeric_value='4.10', notes='Viento a favor')
+        TestResult.objects.create(athlete=cls.athlete, test=jump, session=session, numeric_value=52)
+
+    def test_user_data_matches_custom_user_serializer(self):
+        users = CustomUser.objects.order_by('id')
+        expected = CustomUserSerializer(users.select_related('coach'), many=True).data
+        actual = user_data(user_values(users))
+        self.assertEqual(as_json(actual), as_json(expected))
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+
+    def test_test_result_data_matches_test_result_serializer(self):
+        results = TestResult.objects.order_by('id')
+        expected = TestResultSerializer(results.select_related('test', 'session'), many=True).data
+        actual = test_result_data(test_result_values(results))
+        self.assertEqual(as_json(actual), as_json(expected))
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+
+
+class KeysetPaginationTests(TestCase):
+    """La paginación por cursor recorre cada fila una sola vez y rechaza cursores inválidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics', is_staff=True)
+        coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        for i in range(7):
+            CustomUser.objects.create(username=f'athlete{i}', role='athlete', discipline='soccer', coach=coach)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_pages_cover_every_user_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            body = self.client.get(reverse('admin_dashboard'), params).json()
+            self.assertLessEqual(len(body['users']), 3)
+            seen.extend((user['role'], user['id']) for user in body['users'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        expected = list(CustomUser.objects.order_by('role', 'id').values_list('role', 'id'))
+        self.assertEqual(seen, expected)
+
+    def test_last_page_has_no_next_cursor(self):
+        body = self.client.get(reverse('admin_dashboard'), {'page_size': 50}).json()
+        self.assertEqual(len(body['users']), 9)
+        self.assertIsNone(body['next_cursor'])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['athlete', 42]), 2), ['athlete', 42])
+
+    def test_invalid_cursors_are_rejected(self):
+        for token in ('%%%', encode_cursor(['athlete']), encode_cursor([True, 1]), encode_cursor([[1], 2])):
+            with self.subTest(token=token):
+                with self.assertRaises(ValidationError):
+                    decode_cursor(token, 2)
+        response = self.client.get(reverse('admin_dashboard'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_values_of_the_wrong_type_are_rejected(self):
+        for url, values in (
+            (reverse('list_users'), ['abc']),
+            (reverse('list_users'), [2 ** 70]),
+            (reverse('admin_dashboard'), ['athlete', 'abc']),
+            (reverse('admin_dashboard'), ['athlete', '1.5']),
+        ):
+            with self.subTest(url=url, values=values):
+                response = self.client.get(url, {'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('admin_dashboard'), {'cursor': encode_cursor(['athlete', '3'])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_page_size_is_rejected(self):
+        for value in ('0', 'x'):
+            with self.subTest(page_size=value):
+                response = self.client.get(reverse('admin_dashboard'), {'page_size': value})
+                self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestTests(TestCase):
+    """Los ETags derivan de la base de datos: 304 mientras los datos no cambian, 200 con un ETag nuevo si cambian."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.coach = CustomUser.objects.create(username='coach', name='Coach', role='coach', discipline='athletics')
+        cls.athlete = CustomUser.objects.create(
+            username='athlete', role='athlete', discipline='athletics', coach=cls.coach
+        )
+        cls.session = EvaluationSession.objects.create(
+            date=date(2024, 3, 1), location='Sede 1', discipline='athletics', evaluator=cls.admin
+        )
+        cls.test = Test.objects.create(name='Salto', category='strength', description='', unit='centimeters')
+        cls.result = TestResult.objects.create(
+            athlete=cls.athlete, test=cls.test, session=cls.session, numeric_value=52
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.results_url = reverse('test_results', args=(self.athlete.id,))
+        self.coach_url = reverse('coach_dashboard', args=(self.coach.id,))
+
+    def get(self, url, etag=None):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(url)
+
+    def assertPrivate(self, response):
+        self.assertIn('Authorization', response['Vary'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def assertChanged(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_matching_etag_returns_304_with_private_headers(self):
+        for url in (self.results_url, self.coach_url, reverse('admin_dashboard')):
+            with self.subTest(url=url):
+                first = self.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertPrivate(first)
+
+                for etag in (first['ETag'], 'W/' + first['ETag'], f'"other", {first["ETag"]}'):
+                    response = self.get(url, etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], first['ETag'])
+                    self.assertPrivate(response)
+
+    def test_results_etag_changes_with_results_sessions_and_tests(self):
+        etag = self.get(self.results_url)['ETag']
+
+        self.result.numeric_value = 53
+        self.result.save()
+        etag = self.assertChanged(self.results_url, etag)
+
+        self.session.date = date(2024, 3, 2)
+        self.session.save()
+        etag = self.assertChanged(self.results_url, etag)
+
+        self.test.name = 'Salto largo'
+        self.test.save()
+        etag = self.assertChanged(self.results_url, etag)
+
+        TestResult.objects.filter(id=self.result.id).delete()
+        self.assertChanged(self.results_url, etag)
+
+    def test_users_etag_changes_with_users_and_their_coach(self):
+        etag = self.get(self.coach_url)['ETag']
+
+        self.athlete.name = 'Atleta'
+        self.athlete.save()
+        etag = self.assertChanged(self.coach_url, etag)
+
+        self.coach.name = 'Entrenador'
+        self.coach.save()
+        self.assertChanged(self.coach_url, etag)
+
+    def test_admin_page_etag_covers_only_the_page(self):
+        url = f'{reverse("admin_dashboard")}?page_size=1'
+        etag = self.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url, etag).status_code, 304)
+
+        # La página es el admin; la fila extra (el atleta) también forma parte de la versión
+        self.athlete.name = 'Atleta'
+        self.athlete.save()
+        etag = self.assertChanged(url, etag)
+
+        # Fuera de la página y de su fila extra
+        CustomUser.objects.create(username='coach2', role='coach', discipline='soccer')
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        self.admin.name = 'Administrador'
+        self.admin.save()
+        self.assertChanged(url, etag)
+
+    def test_last_login_does_not_change_users_etag(self):
+        etag = self.get(self.coach_url)['ETag']
+        update_last_login(None, self.athlete)
+        self.assertEqual(self.get(self.coach_url, etag).status_code, 304)
+
+    def test_etag_depends_on_query_parameters(self):
+        etag = self.get(self.results_url)['ETag']
+        response = self.get(f'{self.results_url}?ordering=-numeric_value', etag)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_views_share_the_etag_and_headers(self):
+        token = str(AccessToken.for_user(self.admin))
+        factory = AsyncRequestFactory()
+        etag = (await self.async_client.get(self.results_url, headers={'Authorization': f'Bearer {token}'}))['ETag']
+
+        request = factory.get(self.results_url, headers={'Authorization': f'Bearer {token}', 'If-None-Match': etag})
+        response = await async_views.testResults(request, custom_user_id=self.athlete.id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertPrivate(response)
+
+        request = factory.get(self.results_url, headers={'Authorization': f'Bearer {token}'})
+        response = await async_views.testResults(request, custom_user_id=self.athlete.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertPrivate(response)
+
+
+class AthleteScopeTests(TestCase):
+    """Las vistas de un atleta o de un roster aplican la misma regla de acceso (ver AthleteScope)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.superuser = CustomUser.objects.create(
+            username='root', role='coach', discipline='athletics', is_superuser=True
+        )
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.other_coach = CustomUser.objects.create(username='other_coach', role='coach', discipline='athletics')
+        cls.athlete = CustomUser.objects.create(
+            username='athlete', role='athlete', discipline='athletics', coach=cls.coach
+        )
+        cls.other_athlete = CustomUser.objects.create(
+            username='other_athlete', role='athlete', discipline='athletics', coach=cls.other_coach
+        )
+        cls.test = Test.objects.create(name='Salto', category='strength', description='', unit='centimeters')
+        session = EvaluationSession.objects.create(
+            date=date(2024, 3, 1), location='Sede 1', discipline='athletics', evaluator=cls.admin
+        )
+        for athlete in (cls.athlete, cls.other_athlete):
+            TestResult.objects.create(athlete=athlete, test=cls.test, session=session, numeric_value=50)
+
+    def setUp(self):
+        versioned_cache.local_cache.clear()
+        self.client = APIClient()
+
+    def athlete_urls(self, athlete_id):
+        return [
+            reverse(name, args=(athlete_id,))
+            for name in ('athlete_dashboard', 'test_results', 'personal_bests', 'fitness_index')
+        ] + [reverse('athlete_trend', args=(athlete_id, self.test.id))]
+
+    def status_codes(self, user, urls):
+        self.client.force_authenticate(user)
+        return {url: self.client.get(url).status_code for url in urls}
+
+    def assertStatus(self, user, urls, expected):
+        self.assertEqual(self.status_codes(user, urls), {url: expected for url in urls})
+
+    def test_athlete_views(self):
+        urls = self.athlete_urls(self.athlete.id)
+        for user in (self.admin, self.superuser, self.coach, self.athlete):
+            with self.subTest(user=user.username):
+                self.assertStatus(user, urls, 200)
+        for user in (self.other_coach, self.other_athlete):
+            with self.subTest(user=user.username):
+                self.assertStatus(user, urls, 403)
+
+    def test_missing_athlete(self):
+        urls = self.athlete_urls(9999)
+        self.assertStatus(self.admin, urls, 404)
+        self.assertStatus(self.coach, urls, 403)
+
+    def test_coach_views(self):
+        urls = [reverse(name, args=(self.coach.id,)) for name in ('coach_personal_bests', 'coach_roster')]
+        for user in (self.admin, self.superuser, self.coach):
+            with self.subTest(user=user.username):
+                self.assertStatus(user, urls, 200)
+        for user in (self.other_coach, self.athlete):
+            with self.subTest(user=user.username):
+                self.assertStatus(user, urls, 403)
+
+    def test_percentiles_are_limited_to_visible_athletes(self):
+        url = reverse('test_percentiles', args=(self.test.id,))
+        for user, expected in (
+            (self.superuser, {self.athlete.id, self.other_athlete.id}),
+            (self.coach, {self.athlete.id}),
+            (self.other_athlete, {self.other_athlete.id}),
+        ):
+            with self.subTest(user=user.username):
+                self.client.force_authenticate(user)
+                rows = self.client.get(url).data['percentiles']
+                self.assertEqual({row['athlete'] for row in rows}, expected)
+
+    def test_coach_check_is_cached_and_invalidated(self):
+        scope = AthleteScope(self.coach)
+        self.assertEqual(scope.athlete_ids, {self.athlete.id})
+        with self.assertNumQueries(0):
+            self.assertTrue(AthleteScope(self.coach).can_view(self.athlete.id))
+
+        self.athlete.coach = self.other_coach
+        with self.captureOnCommitCallbacks(execute=True):
+            self.athlete.save()
+
+        self.assertFalse(AthleteScope(self.coach).can_view(self.athlete.id))
+        self.assertTrue(AthleteScope(self.other_coach).can_view(self.athlete.id))
+
+
+class CoachRosterTests(TestCase):
+    """El roster devuelve cada atleta del entrenador con su último resultado por test en dos consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.athletes = [
+            CustomUser.objects.create(username=f'athlete{i}', role='athlete', discipline='athletics', coach=cls.coach)
+            for i in range(3)
+        ]
+        cls.sprint = Test.objects.create(name='Sprint', category='speed', description='', unit='seconds')
+        cls.jump = Test.objects.create(name='Salto', category='strength', description='', unit='centimeters')
+        sessions = [
+            EvaluationSession.objects.create(
+                date=date(2024, month, 1), location='Sede 1', discipline='athletics', evaluator=cls.admin
+            )
+            for month in (1, 2)
+        ]
+        cls.latest = {}
+        for i, athlete in enumerate(cls.athletes[:2]):
+            for j, session in enumerate(sessions):
+                result = TestResult.objects.create(
+                    athlete=athlete, test=cls.sprint, session=session, numeric_value=12 - i - j
+                )
+                cls.latest[athlete.id, cls.sprint.id] = result.id
+        result = TestResult.objects.create(
+            athlete=cls.athletes[0], test=cls.jump, session=sessions[0], numeric_value=200
+        )
+        cls.latest[cls.athletes[0].id, cls.jump.id] = result.id
+
+    def setUp(self):
+        versioned_cache.local_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_latest_result_per_athlete_and_test(self):
+        url = reverse('coach_roster', args=(self.coach.id,))
+        self.client.get(url)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        athletes = response.data['athletes']
+        self.assertEqual([athlete['id'] for athlete in athletes], [athlete.id for athlete in self.athletes])
+        self.assertEqual(
+            {(athlete['id'], result['test']): result['id'] for athlete in athletes for result in athlete['latest_results']},
+            self.latest,
+        )
+        self.assertEqual(athletes[2]['latest_results'], [])
+        self.assertEqual(athletes[0]['coach'], self.coach.id)
+
+    def test_unknown_coach(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('coach_roster', args=(9999,))).status_code, 404)
+        self.assertEqual(self.client.get(reverse('coach_roster', args=(self.coach.id,))).status_code, 200)
+
+
+class RequestMetricsTests(TestCase):
+    """RequestMetricsMiddleware reporta consultas, serialización, renderizado y tiempo total por solicitud."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        for i in range(3):
+            CustomUser.objects.create(username=f'athlete{i}', role='athlete', discipline='athletics', coach=cls.coach)
+
+    def test_server_timing_header_and_log(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with self.assertLogs('athletes_tracking.requests', 'INFO') as logs:
+            response = client.get(reverse('admin_dashboard'))
+
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        self.assertEqual(list(timings), ['db', 'serialize', 'render', 'app', 'total'])
+        durations = {name: float(params['dur']) for name, params in timings.items()}
+        parts = durations['db'] + durations['serialize'] + durations['render'] + durations['app']
+        self.assertAlmostEqual(parts, durations['total'], delta=0.05)
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['view'], 'admin_dashboard')
+        self.assertEqual(timings['db']['desc'], f'"{line["db_queries"]} queries"')
+        self.assertGreater(line['db_queries'], 0)
+        self.assertEqual(line['response_bytes'], len(response.content))
+        self.assertIn('serialize_ms', line)
+
+    def test_serialization_excludes_queries_and_nested_blocks(self):
+        metrics = middleware.RequestMetrics()
+        token = middleware._current_metrics.set(metrics)
+        try:
+            with mock.patch.object(middleware.time, 'perf_counter', side_effect=[1.0, 1.005]):
+                with middleware.measure_serialization():
+                    with middleware.measure_serialization():
+                        # Consulta hecha durante la serialización (p. ej. una relación diferida)
+                        metrics.db_ms += 2
+        finally:
+            middleware._current_metrics.reset(token)
+
+        self.assertAlmostEqual(metrics.serialize_ms, 3)
+        self.assertFalse(metrics.serializing)
+
+
+CLAIMS_AUTHENTICATION = {
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': ['apps.custom_auth.authentication.ClaimsJWTAuthentication'],
+}
+
+
+class AsyncAuthenticationTests(TestCase):
+    """Las vistas asíncronas autentican con las mismas clases de DRF que las síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+
+    def setUp(self):
+        versioned_cache.local_cache.clear()
+
+    def request(self, token):
+        return AsyncRequestFactory().get(reverse('admin_dashboard'), headers={'Authorization': f'Bearer {token}'})
+
+    def deactivate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_active = False
+            self.admin.save()
+
+    async def test_default_authentication(self):
+        token = AccessToken.for_user(self.admin)
+        user = await async_views.authenticate(self.request(token))
+        self.assertIsInstance(user, CustomUser)
+        self.assertEqual(user.pk, self.admin.pk)
+
+        self.assertIsNone(await async_views.authenticate(self.request('x')))
+        await sync_to_async(self.deactivate)()
+        self.assertIsNone(await async_views.authenticate(self.request(token)))
+
+    @override_settings(REST_FRAMEWORK=CLAIMS_AUTHENTICATION)
+    async def test_claims_authentication(self):
+        token = AccessToken.for_user(self.admin)
+        user = await async_views.authenticate(self.request(token))
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertTrue(user.is_admin())
+        self.assertEqual((await async_views.adminDashboard(self.request(token))).status_code, 200)
+
+        # El estado cacheado se invalida al desactivar al usuario, igual que en las vistas de DRF
+        await sync_to_async(self.deactivate)()
+        self.assertIsNone(await async_views.authenticate(self.request(token)))
+        self.assertEqual((await async_views.adminDashboard(self.request(token))).status_code, 401)
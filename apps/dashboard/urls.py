@@ -1,10 +1,20 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Bajo ASGI las vistas de lectura principales pueden servirse con sus versiones asíncronas
+dashboard = async_views if getattr(settings, 'ASYNC_DASHBOARD_VIEWS', False) else views
 
 urlpatterns = [
-    path('admin-dashboard/', views.adminDashboard, name='admin_dashboard'),
-    path('coach-dashboard/<int:custom_user_id>/', views.coachDashboard, name='coach_dashboard'),
-    path('athlete-dashboard/<int:custom_user_id>/', views.athleteDashboard, name='athlete_dashboard'),
+    path('admin-dashboard/', dashboard.adminDashboard, name='admin_dashboard'),
+    path('coach-dashboard/<int:custom_user_id>/', dashboard.coachDashboard, name='coach_dashboard'),
+    path('athlete-dashboard/<int:custom_user_id>/', dashboard.athleteDashboard, name='athlete_dashboard'),
     path('athlete-details/<int:custom_user_id>/', views.athleteDetails, name='athlete_details'),
-    path('test-results/<int:custom_user_id>/', views.testResults, name='test_results'),
+    path('test-results/<int:custom_user_id>/', dashboard.testResults, name='test_results'),
+    path('personal-bests/<int:custom_user_id>/', views.personalBests, name='personal_bests'),
+    path('coach-personal-bests/<int:custom_user_id>/', views.coachPersonalBests, name='coach_personal_bests'),
+    path('fitness-index/<int:custom_user_id>/', views.fitnessIndex, name='fitness_index'),
+    path('test-percentiles/<int:test_id>/', views.testPercentiles, name='test_percentiles'),
+    path('coach-roster/<int:custom_user_id>/', views.coachRoster, name='coach_roster'),
+    path('athlete-trend/<int:custom_user_id>/<int:test_id>/', views.athleteTrend, name='athlete_trend'),
 ]
\ No newline at end of file
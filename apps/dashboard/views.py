@@ -1,12 +1,44 @@
 # views.py (Dashboard views)
+import logging
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from apps.custom_auth.models import CustomUser
-from .serializers import CustomUserSerializer, TestResultSerializer
+from apps.custom_auth.permissions import CanViewAthlete, athlete_scope
+from apps.lab.models import ACTIVE_RESULTS, FitnessScore, PersonalBest, Test, TestResult
+from apps.lab import trends
+from apps.lab.catalog import etag_matches
+from apps.lab.rankings import cohort_percentiles
+from apps.lab.result_filters import FilterError, filter_results
+from athletes_tracking.db import read_from_replica
+from athletes_tracking.pagination import KeysetPagination
+from athletes_tracking.params import is_integer
+from .etags import page_etag, results_etag, users_etag, with_etag
+from .serializers import (
+    CustomUserSerializer, FitnessScoreSerializer, PersonalBestSerializer, RosterAthleteSerializer,
+    test_result_data, test_result_values, user_data, user_values
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _athlete_not_found(request, athlete_id):
+    """
+    Indica si el atleta no existe. Se usa después de CanViewAthlete: para
+    entrenadores y atletas el permiso ya garantiza que existe, así que solo se
+    consulta para quienes ven a todos los atletas.
+    """
+    return athlete_scope(request).sees_all and not CustomUser.objects.filter(
+        id=athlete_id, role='athlete'
+    ).exists()
 
 """
 Este módulo contiene las diferentes vistas para el dashboard
@@ -24,21 +56,41 @@ def adminDashboard(request):
     """
     Vista del dashboard de administrador.
 
-    Esta vista recupera todos los usuarios en el sistema y devuelve sus detalles.
+    Esta vista recupera los usuarios del sistema paginados por cursor sobre (role, id)
+    y devuelve sus detalles. Acepta los parámetros opcionales `role`, `page_size` y
+    `cursor`; la respuesta incluye `next_cursor` (None en la última página).
+    Responde 304 si If-None-Match coincide con el ETag de la versión de la página
+    (ver apps.dashboard.etags), sin recuperar ni serializar sus filas.
     Asegura que el usuario solicitante esté autenticado y tenga el rol de administrador.
     """
     # Verificar si el usuario está autenticado y tiene rol de administrador
     if request.user.is_authenticated and request.user.is_admin():
         try:
-            # Recuperar todos los usuarios del sistema con información del coach
-            users = CustomUser.objects.select_related('coach').all()
-            serializer = CustomUserSerializer(users, many=True)
+            # Recuperar una página de usuarios del sistema con información del coach
+            users = CustomUser.objects.all()
+            role = request.query_params.get('role')
+            if role:
+                users = users.filter(role=role)
+
+            paginator = KeysetPagination(ordering=('role', 'id'))
+            page, page_size = paginator.page_queryset(users, request)
+            etag = page_etag(request, page)
+            if etag_matches(request, etag):
+                return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+            page = paginator.finish_page(list(user_values(page)), page_size)
             
             # Devolver respuesta exitosa con la lista de usuarios
-            return Response({
+            return with_etag(Response({
                 'status': 'success',
-                'users': serializer.data
-            })
+                'users': user_data(page),
+                'next_cursor': paginator.next_cursor
+            }), etag)
+        except ValidationError as e:
+            return Response({
+                'status': 'error',
+                'message': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             # Manejar caso donde ocurre un error al recuperar usuarios
             return Response({
@@ -61,6 +113,7 @@ def coachDashboard(request, custom_user_id):
 
     Esta vista recupera todos los atletas asociados a un entrenador específico.
     Asegura que el usuario solicitante esté autenticado y tenga el rol de entrenador.
+    Responde 304 si If-None-Match coincide con el ETag de la versión de los datos.
     """
     try:
         # Verificar que el usuario autenticado sea un entrenador o un administrador
@@ -73,24 +126,24 @@ def coachDashboard(request, custom_user_id):
         # Recuperar el objeto de usuario entrenador basado en el ID proporcionado y rol
         coach = get_object_or_404(CustomUser, id=custom_user_id, role='coach')
       
-        # Recuperar atletas con información del coach usando select_related para optimizar
-        athletes = CustomUser.objects.select_related('coach').filter(coach=coach)
-        
-        print(f"Coach ID: {coach.id}, Coach Username: {coach.username}")
-        print(f"Número de atletas encontrados: {athletes.count()}")
-        
-        # Serializar y devolver los atletas
-        serializer = CustomUserSerializer(athletes, many=True)
-        print("Datos serializados:", serializer.data)
+        athletes = CustomUser.objects.filter(coach=coach)
+        etag = users_etag(request, athletes)
+        if etag_matches(request, etag):
+            return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        # Recuperar atletas con información del coach en una sola proyección
+        athletes = user_values(athletes)
         
         # Devolver respuesta exitosa con la lista de atletas
-        return Response({
+        return with_etag(Response({
             'status': 'success',
-            'athletes': serializer.data
-        })
+            'athletes': user_data(athletes)
+        }), etag)
+    except Http404:
+        raise
     except Exception as e:
         # Capturar y registrar cualquier excepción no manejada
-        print(f"Error en coachDashboard: {str(e)}")
+        logger.exception('Error en coachDashboard')
         return Response({
             'status': 'error',
             'message': f'Error interno: {str(e)}'
@@ -98,42 +151,31 @@ def coachDashboard(request, custom_user_id):
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanViewAthlete])
 def athleteDashboard(request, custom_user_id):
     """
     Vista del dashboard de atleta.
     
     Esta vista recupera los detalles de un atleta específico.
-    Asegura que el usuario solicitante esté autenticado y tenga el rol de atleta.
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete).
     """
-    if request.user.is_authenticated:
-        try:
-            # Recuperar el objeto de usuario atleta basado en el ID proporcionado y rol
-            # Usar select_related para incluir información del coach en una sola consulta
-            athlete = get_object_or_404(
-                CustomUser.objects.select_related('coach'), 
-                id=custom_user_id, 
-                role='athlete'
-            )
-            serializer = CustomUserSerializer(athlete)
-            
-            # Devolver respuesta exitosa con los detalles del atleta
-            return Response({
-                'status': 'success',
-                'athlete': serializer.data
-            })
-        except CustomUser.DoesNotExist:
-            # Manejar caso donde el atleta no existe
-            return Response({
-                'status': 'error',
-                'message': 'Atleta no encontrado'
-            }, status=status.HTTP_404_NOT_FOUND)
-    else:
-        # Devolver error de permiso si el usuario no está autorizado para acceder a esta vista
+    # Usar select_related para incluir información del coach en una sola consulta
+    athlete = CustomUser.objects.select_related('coach').filter(
+        id=custom_user_id, role='athlete'
+    ).first()
+    if athlete is None:
+        # Manejar caso donde el atleta no existe
         return Response({
             'status': 'error',
-            'message': 'No tiene permiso para ver esta página'
-        }, status=status.HTTP_403_FORBIDDEN)
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    # Devolver respuesta exitosa con los detalles del atleta
+    return Response({
+        'status': 'success',
+        'athlete': CustomUserSerializer(athlete).data
+    })
 
 
 """
@@ -142,41 +184,30 @@ Estas vistas son responsables de mostrar los detalles del dashboard y gestionar
 """
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanViewAthlete])
 def athleteDetails(request, custom_user_id):
     """
     Vista de detalles de atleta.
     
     Esta vista recupera los detalles de un atleta específico basado en su ID.
-    Asegura que el usuario solicitante esté autenticado y tenga el rol apropiado.
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete).
     """
-    if request.user.is_authenticated and request.user.is_coach():
-        try:
-            # Recuperar el objeto de usuario atleta basado en el ID proporcionado y rol
-            athlete = get_object_or_404(
-                CustomUser.objects.select_related('coach'), 
-                id=custom_user_id, 
-                role='athlete'
-            )
-            serializer = CustomUserSerializer(athlete)
-            
-            # Devolver respuesta exitosa con los detalles del atleta
-            return Response({
-                'status': 'success',
-                'athlete': serializer.data
-            })
-        except CustomUser.DoesNotExist:
-            # Manejar caso donde el atleta no existe
-            return Response({
-                'status': 'error',
-                'message': 'Atleta no encontrado'
-            }, status=status.HTTP_404_NOT_FOUND)
-    else:
-        # Devolver error de permiso si el usuario no está autorizado para acceder a esta vista
+    athlete = CustomUser.objects.select_related('coach').filter(
+        id=custom_user_id, role='athlete'
+    ).first()
+    if athlete is None:
+        # Manejar caso donde el atleta no existe
         return Response({
             'status': 'error',
-            'message': 'No tiene permiso para ver esta página'
-        }, status=status.HTTP_403_FORBIDDEN)
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    # Devolver respuesta exitosa con los detalles del atleta
+    return Response({
+        'status': 'success',
+        'athlete': CustomUserSerializer(athlete).data
+    })
 
 
 """
@@ -184,50 +215,297 @@ Esta sección contiene las diferentes vistas para las pruebas que aparecen para
 Estas vistas son responsables de mostrar las pruebas y gestionar datos de usuarios.
 """
 
+@read_from_replica
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanViewAthlete])
 def testResults(request, custom_user_id):
     """
     Vista de resultados de pruebas para un atleta específico.
 
     Esta vista recupera los resultados de pruebas asociados con un atleta específico.
-    Asegura que el usuario solicitante esté autenticado y tenga el rol apropiado
-    (administrador, entrenador, o el atleta mismo) para acceder a los datos.
-    """
-    # Recuperar el objeto atleta basado en el ID proporcionado y rol, o devolver un 404 si no se encuentra
-    athlete = get_object_or_404(CustomUser, id=custom_user_id, role='athlete')
-
-    # Verificar el rol del usuario solicitante y validar permisos
-    if request.user.is_admin():
-        # Los administradores pueden acceder a los resultados de pruebas para todos los atletas
-        pass
-    elif request.user.is_coach():
-        # Los entrenadores solo pueden acceder a los resultados de pruebas para atletas con los que están asociados
-        if athlete.coach != request.user:
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete). Para entrenadores y atletas el permiso ya garantiza que el
+    atleta existe, así que solo se consulta su existencia para los administradores.
+
+    Acepta los parámetros opcionales `date_from`, `date_to`, `date_field`, `test`,
+    `category`, `session`, `discipline`, `ordering` y `limit`, que se resuelven en
+    SQL (ver apps.lab.result_filters). Responde 304 si If-None-Match coincide con el
+    ETag de la versión de los resultados del atleta (ver apps.dashboard.etags).
+    """
+    try:
+        # Recuperar los resultados de pruebas para el atleta con los datos del test unidos
+        test_results = filter_results(
+            test_result_values(TestResult.objects.filter(ACTIVE_RESULTS, athlete_id=custom_user_id)),
+            request.query_params,
+        )
+    except FilterError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if _athlete_not_found(request, custom_user_id):
+        return Response({
+            'status': 'error',
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    etag = results_etag(request, custom_user_id)
+    if etag_matches(request, etag):
+        return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+    # Devolver respuesta exitosa con los resultados de pruebas
+    return with_etag(Response({
+        'status': 'success',
+        'test_results': test_result_data(test_results)
+    }), etag)
+
+
+"""
+Esta sección contiene las vistas de mejores marcas por atleta y test.
+Las mejores marcas se leen de la tabla desnormalizada PersonalBest, que se mantiene
+actualizada en cada escritura de resultados.
+"""
+
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, CanViewAthlete])
+def personalBests(request, custom_user_id):
+    """
+    Vista de mejores marcas de un atleta.
+
+    Devuelve la mejor marca del atleta en cada test en una sola consulta indexada.
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete).
+    """
+    if _athlete_not_found(request, custom_user_id):
+        return Response({
+            'status': 'error',
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    bests = PersonalBest.objects.select_related('test').filter(
+        ACTIVE_RESULTS, athlete_id=custom_user_id
+    ).order_by('test_id')
+    serializer = PersonalBestSerializer(bests, many=True)
+    return Response({
+        'status': 'success',
+        'personal_bests': serializer.data
+    })
+
+
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def coachPersonalBests(request, custom_user_id):
+    """
+    Vista de mejores marcas de todos los atletas de un entrenador.
+
+    Devuelve las mejores marcas del roster completo en una sola consulta.
+    Tienen acceso los administradores y el propio entrenador.
+    """
+    if not athlete_scope(request).can_view_coach(custom_user_id):
+        return Response({
+            'status': 'error',
+            'message': 'No tiene permiso para ver este roster'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    bests = PersonalBest.objects.select_related('test').filter(
+        ACTIVE_RESULTS, athlete__coach_id=custom_user_id
+    ).order_by('athlete_id', 'test_id')
+    serializer = PersonalBestSerializer(bests, many=True)
+    return Response({
+        'status': 'success',
+        'personal_bests': serializer.data
+    })
+
+
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, CanViewAthlete])
+def fitnessIndex(request, custom_user_id):
+    """
+    Vista del índice de condición física compuesto de un atleta.
+
+    Devuelve el puntaje 0-100 del atleta en cada categoría de test frente a su
+    cohorte de disciplina (50 es la media), leído de la tabla precalculada
+    FitnessScore en una sola consulta indexada.
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete).
+    """
+    if _athlete_not_found(request, custom_user_id):
+        return Response({
+            'status': 'error',
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    scores = FitnessScore.objects.filter(
+        athlete_id=custom_user_id, athlete__deleted_at__isnull=True
+    ).order_by('category')
+    serializer = FitnessScoreSerializer(scores, many=True)
+    return Response({
+        'status': 'success',
+        'fitness_index': serializer.data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def testPercentiles(request, test_id):
+    """
+    Vista de percentiles por cohorte para un test.
+
+    Devuelve el percentil y la posición de la mejor marca de cada atleta frente a su
+    cohorte: la misma disciplina y, si se indica `age_band` (ancho en años), el mismo
+    rango de edad. Respeta `higher_is_better` del test. Parámetros opcionales:
+    `discipline` (por defecto todas) y `age_band`.
+    Los administradores ven a todos los atletas, los entrenadores solo a sus atletas y
+    los atletas solo su propio percentil; la cohorte siempre es completa.
+    """
+    test = get_object_or_404(Test, id=test_id)
+
+    disciplines = [d for d, _ in CustomUser.DISCIPLINE_CHOICES]
+    discipline = request.query_params.get('discipline')
+    if discipline:
+        if discipline not in disciplines:
             return Response({
                 'status': 'error',
-                'message': 'No tiene permiso para ver este atleta'
-            }, status=status.HTTP_403_FORBIDDEN)
-    elif request.user.is_athlete() and request.user.id != athlete.id:
-        # Los atletas solo pueden ver sus propios resultados
+                'message': 'Disciplina no válida'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        disciplines = [discipline]
+
+    age_band = request.query_params.get('age_band')
+    if age_band is not None:
+        if not is_integer(age_band) or int(age_band) < 1:
+            return Response({
+                'status': 'error',
+                'message': 'age_band debe ser un número entero positivo de años'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        age_band = int(age_band)
+
+    scope = athlete_scope(request)
+    if not (scope.sees_all or request.user.is_coach() or request.user.is_athlete()):
         return Response({
             'status': 'error',
-            'message': 'No tiene permiso para ver resultados de otros atletas'
+            'message': 'No tiene permiso para ver esta página'
         }, status=status.HTTP_403_FORBIDDEN)
-    else:
-        # Devolver error de permiso si el usuario no tiene un rol válido
+
+    percentiles = []
+    for name in disciplines:
+        rows = cohort_percentiles(test, name, age_band)
+        if scope.athlete_ids is not None:
+            rows = [row for row in rows if row['athlete'] in scope.athlete_ids]
+        percentiles.extend(rows)
+
+    return Response({
+        'status': 'success',
+        'test': test.id,
+        'higher_is_better': test.higher_is_better,
+        'percentiles': percentiles
+    })
+
+
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def coachRoster(request, custom_user_id):
+    """
+    Vista del roster de un entrenador con los últimos resultados.
+
+    Devuelve cada atleta del entrenador junto con su resultado más reciente en cada
+    test. Usa un número constante de consultas: una para los atletas y otra que
+    precarga, con una función de ventana, el último resultado por atleta y test.
+    Tienen acceso los administradores y el propio entrenador.
+    """
+    if not athlete_scope(request).can_view_coach(custom_user_id):
         return Response({
             'status': 'error',
-            'message': 'No tiene permiso para ver esta página'
+            'message': 'No tiene permiso para ver este roster'
         }, status=status.HTTP_403_FORBIDDEN)
 
-    # Recuperar y serializar los resultados de pruebas para el atleta
-    # Usar select_related para optimizar las consultas
-    test_results = athlete.test_results.select_related('test', 'session').all()
-    serializer = TestResultSerializer(test_results, many=True)
+    latest = TestResult.objects.filter(ACTIVE_RESULTS).select_related('test').annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('athlete_id'), F('test_id')],
+            order_by=[F('date_recorded').desc(), F('id').desc()],
+        )
+    ).filter(position=1).order_by('test_id')
 
-    # Devolver respuesta exitosa con los resultados de pruebas
+    athletes = list(
+        CustomUser.objects.select_related('coach')
+        .filter(coach_id=custom_user_id, role='athlete')
+        .order_by('id')
+        .prefetch_related(Prefetch('test_results', queryset=latest, to_attr='latest_results'))
+    )
+    if not athletes and not CustomUser.objects.filter(id=custom_user_id, role='coach').exists():
+        return Response({
+            'status': 'error',
+            'message': 'Entrenador no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = RosterAthleteSerializer(athletes, many=True)
+    return Response({
+        'status': 'success',
+        'athletes': serializer.data
+    })
+
+
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, CanViewAthlete])
+def athleteTrend(request, custom_user_id, test_id):
+    """
+    Vista de la tendencia de un atleta en un test.
+
+    Devuelve la serie temporal de resultados agrupada por `bucket` (week, month,
+    season o none para los resultados sin agrupar) con min, max, mean y count por
+    grupo. Parámetros opcionales: `rolling` (media móvil sobre ese número de grupos)
+    y `max_points` (número máximo de puntos; la serie se reduce con LTTB).
+    Tienen acceso los administradores, el entrenador del atleta y el propio atleta
+    (ver CanViewAthlete).
+    """
+    bucket = request.query_params.get('bucket', trends.DEFAULT_BUCKET)
+    if bucket not in trends.BUCKETS:
+        return Response({
+            'status': 'error',
+            'message': f"bucket debe ser uno de: {', '.join(trends.BUCKETS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    rolling = request.query_params.get('rolling')
+    if rolling is not None:
+        if not is_integer(rolling) or int(rolling) < 1:
+            return Response({
+                'status': 'error',
+                'message': 'rolling debe ser un número entero positivo'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        rolling = int(rolling)
+
+    max_points = request.query_params.get('max_points', str(trends.DEFAULT_MAX_POINTS))
+    if not is_integer(max_points) or not (
+        trends.MIN_POINTS <= int(max_points) <= trends.MAX_POINTS_LIMIT
+    ):
+        return Response({
+            'status': 'error',
+            'message': f'max_points debe estar entre {trends.MIN_POINTS} y {trends.MAX_POINTS_LIMIT}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    max_points = int(max_points)
+
+    if _athlete_not_found(request, custom_user_id):
+        return Response({
+            'status': 'error',
+            'message': 'Atleta no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    test = get_object_or_404(Test, id=test_id)
+    points, total = trends.trend(custom_user_id, test.id, bucket, rolling, max_points)
     return Response({
         'status': 'success',
-        'test_results': serializer.data
-    })
\ No newline at end of file
+        'athlete': custom_user_id,
+        'test': test.id,
+        'unit': test.unit,
+        'higher_is_better': test.higher_is_better,
+        'bucket': bucket,
+        'total_points': total,
+        'downsampled': total > len(points),
+        'points': points
+    })
@@ -1,7 +1,11 @@
 from django.contrib import admin
-from apps.lab.models import Test, EvaluationSession, TestResult
+from apps.lab.models import Test, EvaluationSession, TestResult, PersonalBest, CohortStatistic, FitnessScore, PurgeJob
 
 # Register your models here.
 admin.site.register(Test)
 admin.site.register(EvaluationSession)
-admin.site.register(TestResult) 
\ No newline at end of file
+admin.site.register(TestResult)
+admin.site.register(PersonalBest)
+admin.site.register(CohortStatistic)
+admin.site.register(FitnessScore)
+admin.site.register(PurgeJob)
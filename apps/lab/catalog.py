@@ -0,0 +1,108 @@
+"""
+Caché versionada del catálogo de tests.
+
+La versión del catálogo vive en la caché por defecto, compartida entre procesos
+(ver CACHES en settings), y se incrementa desde apps.lab.signals cada vez que se
+crea, modifica o elimina un Test. El catálogo serializado, en cambio, se guarda
+en la caché local de cada proceso (CACHES['local']) bajo la versión actual: al
+cambiar la versión, cada worker lo reconstruye una vez desde la base de datos.
+
+Cada solicitud lee solo la versión compartida; con Redis o memcached eso no
+toca la base de datos (con DatabaseCache es una consulta a django_cache). Los
+ETags, calculados una sola vez a partir del contenido, se guardan en claves
+propias (el de la lista completa, y el de cada test junto a sus datos), de modo
+que las vistas pueden responder 304 Not Modified sin cargar el catálogo,
+consultar los tests ni serializar nada.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags
+
+from .models import Test
+from .serializers import TestSerializer
+
+VERSION_KEY = 'lab:catalog:version'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+local_cache = caches['local']
+
+
+def _etag(data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+def _initial_version():
+    # Si la caché compartida pierde la versión (reinicio, flush), la nueva no debe
+    # coincidir con una que algún proceso todavía tenga en su caché local
+    return time.time_ns()
+
+
+def bump_version():
+    """Invalida el catálogo en caché pasando a una nueva versión."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _initial_version(), None)
+
+
+def _prefix():
+    return 'lab:catalog:%s' % cache.get_or_set(VERSION_KEY, _initial_version, None)
+
+
+def _build(prefix):
+    tests = TestSerializer(Test.objects.order_by('id'), many=True).data
+    tests = [dict(test) for test in tests]
+    etags = {test['id']: _etag(test) for test in tests}
+    entries = {f'{prefix}:test:{test["id"]}': (test, etags[test['id']]) for test in tests}
+    entries.update({
+        prefix: tests,
+        f'{prefix}:etag': _etag(tests),
+        f'{prefix}:etags': etags,
+    })
+    local_cache.set_many(entries, CACHE_TIMEOUT)
+    return entries
+
+
+def _get(prefix, key):
+    value = local_cache.get(key)
+    if value is None:
+        value = _build(prefix).get(key)
+    return value
+
+
+def catalog_etag():
+    """ETag de la lista completa de tests de la versión actual."""
+    prefix = _prefix()
+    return _get(prefix, f'{prefix}:etag')
+
+
+def get_catalog():
+    """
+    Devuelve la lista serializada de todos los tests de la versión actual. Solo
+    consulta la base de datos si la versión actual no está en la caché local.
+    """
+    prefix = _prefix()
+    return _get(prefix, prefix)
+
+
+def get_test(test_id):
+    """Devuelve (datos del test, ETag) en la versión actual, o None si no existe."""
+    prefix = _prefix()
+    if test_id not in _get(prefix, f'{prefix}:etags'):
+        return None
+    return _get(prefix, f'{prefix}:test:{test_id}')
+
+
+def etag_matches(request, etag):
+    """Indica si la cabecera If-None-Match de la solicitud coincide con el ETag."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    return '*' in etags or etag in {e.removeprefix('W/') for e in etags}
@@ -0,0 +1,99 @@
+"""
+Exportación en streaming de los resultados de tests.
+
+Las filas se leen con .iterator(chunk_size=...) sobre una proyección values_list
+que une TestResult con Test, EvaluationSession y el atleta, y se codifican como
+CSV o NDJSON a medida que se envían, de modo que la memoria no crece con el
+número de filas exportadas.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from athletes_tracking.db import replica_alias
+
+from .models import ACTIVE_RESULTS, TestResult
+
+CHUNK_SIZE = 2000
+
+# (nombre de columna, campo de la consulta)
+EXPORT_FIELDS = (
+    ('result_id', 'id'),
+    ('numeric_value', 'numeric_value'),
+    ('notes', 'notes'),
+    ('date_recorded', 'date_recorded'),
+    ('test_id', 'test_id'),
+    ('test_name', 'test__name'),
+    ('test_category', 'test__category'),
+    ('test_unit', 'test__unit'),
+    ('test_higher_is_better', 'test__higher_is_better'),
+    ('session_id', 'session_id'),
+    ('session_date', 'session__date'),
+    ('session_location', 'session__location'),
+    ('session_discipline', 'session__discipline'),
+    ('athlete_id', 'athlete_id'),
+    ('athlete_username', 'athlete__username'),
+    ('athlete_name', 'athlete__name'),
+    ('athlete_discipline', 'athlete__discipline'),
+    ('athlete_date_of_birth', 'athlete__date_of_birth'),
+    ('athlete_coach_id', 'athlete__coach_id'),
+)
+
+HEADER = [name for name, _ in EXPORT_FIELDS]
+
+
+class Echo:
+    """Objeto tipo archivo que devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(discipline=None, date_from=None, date_to=None, category=None):
+    """Resultados filtrados y proyectados en el orden de EXPORT_FIELDS."""
+    # Se lee después de que la vista termina, fuera de @read_from_replica
+    queryset = TestResult.objects.using(replica_alias()).filter(ACTIVE_RESULTS)
+    if discipline:
+        queryset = queryset.filter(session__discipline=discipline)
+    if date_from:
+        queryset = queryset.filter(session__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(session__date__lte=date_to)
+    if category:
+        queryset = queryset.filter(test__category=category)
+    return queryset.order_by('id').values_list(*(field for _, field in EXPORT_FIELDS))
+
+
+def _buffered(lines, size):
+    """Agrupa las líneas en bloques para no enviar un fragmento HTTP por fila."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_value(value):
+    # Fechas en ISO 8601, igual que en NDJSON
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    yield from _buffered(
+        (writer.writerow([_csv_value(v) for v in row]) for row in rows.iterator(chunk_size=chunk_size)),
+        chunk_size,
+    )
+
+
+def stream_ndjson(rows, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield from _buffered(
+        (encoder.encode(dict(zip(HEADER, row))) + '\n' for row in rows.iterator(chunk_size=chunk_size)),
+        chunk_size,
+    )
@@ -0,0 +1,262 @@
+"""
+Índice de condición física compuesto por categoría de test.
+
+Para cada (test, disciplina) se mantiene en CohortStatistic la cantidad, la media
+y la suma de cuadrados de las desviaciones (M2) de todos los resultados de los
+atletas de esa disciplina. Las estadísticas se actualizan de forma incremental en
+cada escritura con el algoritmo de Welford, en su forma por lotes (Chan et al.):
+un lote de n valores se resume como (n, media, M2) y se combina con el acumulado,
+o se resta de él al eliminar o modificar resultados. Un valor individual es un
+lote de tamaño 1, que se reduce a la actualización clásica de Welford.
+
+El puntaje de un atleta en una categoría promedia el z-score de su último
+resultado en cada test de la categoría (con el signo invertido si un valor menor
+es mejor) y lo lleva a 0-100 con la función de distribución normal, de modo que
+50 es la media de la cohorte. Los puntajes se guardan en FitnessScore y solo se
+recalculan para los atletas afectados por cada escritura, así que los del resto
+de la cohorte reflejan las estadísticas de su última actualización. El comando
+rebuild_fitness_index reconstruye ambas tablas desde cero y puede programarse
+para reconciliarlos.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count, F, Variance, Window
+from django.db.models.functions import RowNumber
+
+from apps.custom_auth.models import CustomUser
+from .models import CohortStatistic, FitnessScore, TestResult
+
+BATCH_SIZE = 1000
+
+
+def merge(a, b):
+    """Combina dos resúmenes (count, mean, m2) en el resumen de la unión."""
+    n = a[0] + b[0]
+    if n == 0:
+        return (0, 0.0, 0.0)
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / n
+    m2 = a[2] + b[2] + delta * delta * a[0] * b[0] / n
+    return (n, mean, m2)
+
+
+def subtract(total, b):
+    """Resta el resumen `b` de `total`, que debe contener los valores de `b`."""
+    n = total[0] - b[0]
+    if n <= 0:
+        return (0, 0.0, 0.0)
+    mean = (total[0] * total[1] - b[0] * b[1]) / n
+    delta = b[1] - mean
+    m2 = total[2] - b[2] - delta * delta * n * b[0] / total[0]
+    return (n, mean, max(m2, 0.0))
+
+
+def summarize(values):
+    """Resumen (count, mean, m2) de una lista de valores."""
+    array = np.asarray(values, dtype=np.float64)
+    mean = float(array.mean())
+    return (len(array), mean, float(((array - mean) ** 2).sum()))
+
+
+def _group(changes):
+    groups = defaultdict(list)
+    for test_id, discipline, value in changes:
+        groups[(test_id, discipline)].append(float(value))
+    return {key: summarize(values) for key, values in groups.items()}
+
+
+def update_statistics(added=(), removed=()):
+    """
+    Aplica a CohortStatistic los valores agregados y eliminados, cada uno como una
+    tupla (test_id, discipline, value). Lee las filas afectadas en una consulta y
+    las escribe por lotes.
+    """
+    added, removed = _group(added), _group(removed)
+    keys = set(added) | set(removed)
+    if not keys:
+        return
+    with transaction.atomic():
+        existing = {
+            (stat.test_id, stat.discipline): stat
+            for stat in CohortStatistic.objects.select_for_update().filter(
+                test_id__in={key[0] for key in keys},
+                discipline__in={key[1] for key in keys},
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for key in keys:
+            stat = existing.get(key)
+            if stat is None and key not in added:
+                # El test o la cohorte ya no existen (p. ej. borrado en cascada)
+                continue
+            total = (stat.count, stat.mean, stat.m2) if stat else (0, 0.0, 0.0)
+            if key in removed:
+                total = subtract(total, removed[key])
+            if key in added:
+                total = merge(total, added[key])
+            if stat is None:
+                to_create.append(CohortStatistic(
+                    test_id=key[0], discipline=key[1], count=total[0], mean=total[1], m2=total[2]
+                ))
+            elif total[0] == 0:
+                to_delete.append(stat.id)
+            else:
+                stat.count, stat.mean, stat.m2 = total
+                to_update.append(stat)
+        CohortStatistic.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        CohortStatistic.objects.bulk_update(to_update, ['count', 'mean', 'm2'], batch_size=BATCH_SIZE)
+        CohortStatistic.objects.filter(id__in=to_delete).delete()
+
+
+def _disciplines(athlete_ids):
+    return dict(CustomUser.all_objects.filter(id__in=athlete_ids).values_list('id', 'discipline'))
+
+
+def record_results(results):
+    """Incorpora resultados nuevos a las estadísticas y actualiza a sus atletas."""
+    if not results:
+        return
+    disciplines = _disciplines({r.athlete_id for r in results})
+    update_statistics(added=[
+        (r.test_id, disciplines[r.athlete_id], r.numeric_value)
+        for r in results if r.athlete_id in disciplines
+    ])
+    refresh_scores(disciplines)
+
+
+def replace_result(previous, result):
+    """
+    Actualiza las estadísticas tras modificar un resultado. `previous` es la tupla
+    (athlete_id, test_id, numeric_value) anterior a la modificación.
+    """
+    athlete_id, test_id, value = previous
+    if previous == (result.athlete_id, result.test_id, result.numeric_value):
+        return
+    disciplines = _disciplines({athlete_id, result.athlete_id})
+    update_statistics(
+        added=[(result.test_id, disciplines[result.athlete_id], result.numeric_value)],
+        removed=[(test_id, disciplines[athlete_id], value)] if athlete_id in disciplines else [],
+    )
+    refresh_scores(disciplines)
+
+
+def remove_result(result):
+    """Descuenta un resultado eliminado de las estadísticas y actualiza a su atleta."""
+    remove_results([(result.athlete_id, result.test_id, result.numeric_value)])
+
+
+def remove_results(rows, disciplines=None):
+    """
+    Descuenta resultados eliminados, como tuplas (athlete_id, test_id, numeric_value),
+    de las estadísticas y actualiza a sus atletas por lotes. `disciplines`
+    ({athlete_id: disciplina}) permite descontar los de atletas ya eliminados.
+    """
+    athlete_ids = {athlete_id for athlete_id, _, _ in rows}
+    existing = _disciplines(athlete_ids)
+    disciplines = {**existing, **(disciplines or {})}
+    update_statistics(removed=[
+        (test_id, disciplines[athlete_id], value)
+        for athlete_id, test_id, value in rows if athlete_id in disciplines
+    ])
+    athlete_ids = sorted(existing)
+    for start in range(0, len(athlete_ids), BATCH_SIZE):
+        refresh_scores(athlete_ids[start:start + BATCH_SIZE])
+
+
+def move_athlete(athlete_id, previous_discipline, discipline):
+    """Traslada los resultados de un atleta que cambió de disciplina a su nueva cohorte."""
+    rows = list(TestResult.objects.filter(athlete_id=athlete_id).values_list('test_id', 'numeric_value'))
+    update_statistics(
+        added=[(test_id, discipline, value) for test_id, value in rows],
+        removed=[(test_id, previous_discipline, value) for test_id, value in rows],
+    )
+    refresh_scores([athlete_id])
+
+
+def refresh_test(test_id):
+    """Recalcula los puntajes de los atletas con resultados en un test (p. ej. si cambió su dirección)."""
+    athlete_ids = list(TestResult.objects.filter(test_id=test_id).values_list('athlete_id', flat=True).distinct())
+    for start in range(0, len(athlete_ids), BATCH_SIZE):
+        refresh_scores(athlete_ids[start:start + BATCH_SIZE])
+
+
+def score(z):
+    """Lleva un z-score a la escala 0-100 con la función de distribución normal."""
+    return round(50 * (1 + math.erf(z / math.sqrt(2))), 1)
+
+
+def refresh_scores(athlete_ids):
+    """
+    Recalcula los puntajes por categoría de los atletas indicados: una consulta para
+    sus últimos resultados por test, una para las estadísticas de sus cohortes y la
+    escritura de los puntajes.
+    """
+    athlete_ids = list(athlete_ids)
+    if not athlete_ids:
+        return
+    latest = list(
+        TestResult.objects.filter(athlete_id__in=athlete_ids)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('athlete_id'), F('test_id')],
+            order_by=[F('date_recorded').desc(), F('id').desc()],
+        ))
+        .filter(position=1)
+        .values_list('athlete_id', 'athlete__discipline', 'test_id', 'test__category',
+                     'test__higher_is_better', 'numeric_value')
+    )
+    stats = {}
+    if latest:
+        stats = {
+            (stat.test_id, stat.discipline): stat
+            for stat in CohortStatistic.objects.filter(
+                test_id__in={row[2] for row in latest},
+                discipline__in={row[1] for row in latest},
+            )
+        }
+
+    z_scores = defaultdict(list)
+    for athlete_id, discipline, test_id, category, higher_is_better, value in latest:
+        stat = stats.get((test_id, discipline))
+        std = stat.std if stat else 0.0
+        # Con un solo resultado o sin dispersión el atleta queda en la media
+        z = (float(value) - stat.mean) / std if std > 0 else 0.0
+        z_scores[(athlete_id, category)].append(z if higher_is_better else -z)
+
+    with transaction.atomic():
+        FitnessScore.objects.filter(athlete_id__in=athlete_ids).delete()
+        FitnessScore.objects.bulk_create([
+            FitnessScore(athlete_id=athlete_id, category=category,
+                         score=score(sum(zs) / len(zs)), tests=len(zs))
+            for (athlete_id, category), zs in z_scores.items()
+        ], batch_size=BATCH_SIZE)
+
+
+def rebuild_fitness_index(batch_size=BATCH_SIZE):
+    """
+    Reconstruye desde cero las estadísticas (una consulta agrupada) y los puntajes de
+    todos los atletas con resultados, por lotes. Retorna (estadísticas, puntajes).
+    """
+    with transaction.atomic():
+        CohortStatistic.objects.all().delete()
+        FitnessScore.objects.all().delete()
+        rows = (
+            TestResult.objects.values('test_id', 'athlete__discipline')
+            .annotate(count=Count('id'), mean=Avg('numeric_value'), variance=Variance('numeric_value'))
+            .order_by()
+        )
+        CohortStatistic.objects.bulk_create([
+            CohortStatistic(
+                test_id=row['test_id'], discipline=row['athlete__discipline'], count=row['count'],
+                mean=float(row['mean']), m2=float(row['variance'] or 0) * row['count'],
+            )
+            for row in rows
+        ], batch_size=batch_size)
+
+        athlete_ids = list(TestResult.objects.values_list('athlete_id', flat=True).distinct().order_by('athlete_id'))
+        for start in range(0, len(athlete_ids), batch_size):
+            refresh_scores(athlete_ids[start:start + batch_size])
+    return CohortStatistic.objects.count(), FitnessScore.objects.count()
@@ -0,0 +1,277 @@
+"""
+Carga masiva de resultados de una sesión de evaluación.
+
+Una planilla completa (cientos de atletas por una docena de tests) se valida en
+una sola pasada contra mapas precargados de Test y CustomUser, y se inserta con
+bulk_create por lotes dentro de una única transacción.
+
+Formatos aceptados:
+    - JSON: {"session": <id | {date, location, discipline, notes}>,
+             "results": [{"athlete" | "athlete_id": ..., "test": ..., "numeric_value": ..., "notes": ...}]}
+    - CSV largo: columnas athlete (o athlete_id), test, numeric_value y
+      opcionalmente notes.
+    - CSV ancho: columna athlete (o athlete_id) y una columna por test (id o
+      nombre); cada celda no vacía es un resultado.
+
+Los atletas se identifican por username en `athlete` o por id en `athlete_id`
+(un username formado solo por dígitos sigue siendo un username), y los tests por
+id o nombre.
+
+Si otra carga inserta resultados de la misma sesión entre la validación y la
+inserción, la restricción única de TestResult rechaza el lote; la planilla se
+vuelve a validar y se informan las filas en conflicto.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from athletes_tracking.params import is_integer
+from apps.custom_auth.models import CustomUser
+from .models import EvaluationSession, Test, TestResult
+from .signals import test_results_bulk_created
+
+BATCH_SIZE = 500
+
+# Límite impuesto por DecimalField(max_digits=10, decimal_places=2)
+MAX_VALUE = Decimal('99999999.99')
+TWO_PLACES = Decimal('0.01')
+
+LONG_COLUMNS = {'test', 'numeric_value'}
+ATHLETE_COLUMNS = ('athlete', 'athlete_id')
+
+
+class SheetError(Exception):
+    """Error que invalida la planilla completa (formato o sesión)."""
+
+
+class SessionNotFound(SheetError):
+    """La sesión de evaluación indicada no existe."""
+
+
+def parse_csv(text):
+    """
+    Convierte una planilla CSV (formato largo o ancho) en una lista de filas
+    con las claves athlete, test, numeric_value y notes.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise SheetError('La planilla CSV está vacía')
+
+    columns = [c.strip() for c in reader.fieldnames]
+    reader.fieldnames = columns
+    if not any(column in columns for column in ATHLETE_COLUMNS):
+        raise SheetError('La planilla CSV debe incluir la columna "athlete" o "athlete_id"')
+
+    rows = []
+    if LONG_COLUMNS.issubset(columns):
+        for record in reader:
+            rows.append({
+                'athlete': record.get('athlete'),
+                'athlete_id': record.get('athlete_id'),
+                'test': record.get('test'),
+                'numeric_value': record.get('numeric_value'),
+                'notes': record.get('notes') or '',
+            })
+        return rows
+
+    test_columns = [c for c in columns if c not in (*ATHLETE_COLUMNS, 'notes')]
+    if not test_columns:
+        raise SheetError('La planilla CSV no contiene columnas de tests')
+    for record in reader:
+        for column in test_columns:
+            value = (record.get(column) or '').strip()
+            if value:
+                rows.append({
+                    'athlete': record.get('athlete'),
+                    'athlete_id': record.get('athlete_id'),
+                    'test': column,
+                    'numeric_value': value,
+                    'notes': record.get('notes') or '',
+                })
+    return rows
+
+
+def resolve_session(value, evaluator_id):
+    """
+    Devuelve la EvaluationSession indicada por id, o crea una nueva a partir de
+    un diccionario con date, location, discipline y notes.
+    """
+    if isinstance(value, dict):
+        session = EvaluationSession(
+            date=value.get('date'),
+            location=value.get('location', ''),
+            discipline=value.get('discipline', ''),
+            notes=value.get('notes', ''),
+            evaluator_id=evaluator_id,
+        )
+        try:
+            session.full_clean()
+        except ValidationError as e:
+            raise SheetError('Sesión inválida: ' + '; '.join(
+                f'{field}: {message}' for field, messages in e.message_dict.items() for message in messages
+            ))
+        return session
+
+    try:
+        return EvaluationSession.objects.get(id=int(value))
+    except (TypeError, ValueError):
+        raise SheetError('Se requiere el id de la sesión de evaluación')
+    except EvaluationSession.DoesNotExist:
+        raise SessionNotFound('Sesión de evaluación no encontrada')
+
+
+def _clean_key(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _load_tests(rows):
+    """Precarga en una consulta los tests referenciados por id o por nombre."""
+    keys = {_clean_key(row.get('test')) for row in rows}
+    ids = {int(k) for k in keys if is_integer(k)}
+    names = {k.lower() for k in keys if k and not is_integer(k)}
+
+    by_id, by_name = {}, {}
+    if ids or names:
+        for test in Test.objects.all().only('id', 'name'):
+            if test.id in ids:
+                by_id[test.id] = test
+            if test.name.lower() in names:
+                by_name[test.name.lower()] = test
+    return by_id, by_name
+
+
+def _load_athletes(rows):
+    """Precarga en una consulta los atletas referenciados por id (athlete_id) o username (athlete)."""
+    ids = {int(k) for k in (_clean_key(row.get('athlete_id')) for row in rows) if is_integer(k)}
+    usernames = {k for k in (_clean_key(row.get('athlete')) for row in rows) if k}
+
+    by_id, by_username = {}, {}
+    athletes = CustomUser.objects.filter(role='athlete').only('id', 'username')
+    if ids and usernames:
+        athletes = athletes.filter(id__in=ids) | athletes.filter(username__in=usernames)
+    elif ids:
+        athletes = athletes.filter(id__in=ids)
+    elif usernames:
+        athletes = athletes.filter(username__in=usernames)
+    else:
+        return by_id, by_username
+
+    for athlete in athletes:
+        by_id[athlete.id] = athlete
+        by_username[athlete.username] = athlete
+    return by_id, by_username
+
+
+def _parse_value(raw):
+    try:
+        value = Decimal(str(raw).strip().replace(',', '.'))
+    except (InvalidOperation, TypeError):
+        return None
+    if not value.is_finite():
+        return None
+    value = value.quantize(TWO_PLACES)
+    if abs(value) > MAX_VALUE:
+        return None
+    return value
+
+
+def validate_rows(session, rows):
+    """
+    Valida todas las filas en una sola pasada.
+
+    Retorna una tupla (results, errors) donde results es la lista de instancias
+    TestResult sin guardar y errors es una lista de {'row': n, 'errors': [...]}
+    con la posición de cada fila inválida (empezando en 1).
+    """
+    valid_rows = [row for row in rows if isinstance(row, dict)]
+    tests_by_id, tests_by_name = _load_tests(valid_rows)
+    athletes_by_id, athletes_by_username = _load_athletes(valid_rows)
+
+    existing = set()
+    if session.pk:
+        existing = set(
+            TestResult.objects.filter(session=session).values_list('athlete_id', 'test_id')
+        )
+
+    results, errors, seen = [], [], set()
+    for index, row in enumerate(rows, start=1):
+        row_errors = []
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': ['Formato de fila inválido']})
+            continue
+
+        athlete_key = _clean_key(row.get('athlete_id'))
+        if athlete_key:
+            athlete = athletes_by_id.get(int(athlete_key)) if is_integer(athlete_key) else None
+        else:
+            athlete_key = _clean_key(row.get('athlete'))
+            athlete = athletes_by_username.get(athlete_key)
+        if athlete is None:
+            row_errors.append(f'Atleta no encontrado: {athlete_key or "(vacío)"}')
+
+        test_key = _clean_key(row.get('test'))
+        if is_integer(test_key):
+            test = tests_by_id.get(int(test_key))
+        else:
+            test = tests_by_name.get(test_key.lower())
+        if test is None:
+            row_errors.append(f'Test no encontrado: {test_key or "(vacío)"}')
+
+        value = _parse_value(row.get('numeric_value'))
+        if value is None:
+            row_errors.append(f'Valor numérico inválido: {row.get("numeric_value")}')
+
+        if athlete is not None and test is not None:
+            key = (athlete.id, test.id)
+            if key in existing:
+                row_errors.append('Ya existe un resultado para este atleta y test en la sesión')
+            elif key in seen:
+                row_errors.append('Resultado duplicado en la planilla')
+            seen.add(key)
+
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+            continue
+
+        results.append(TestResult(
+            athlete_id=athlete.id,
+            test_id=test.id,
+            session=session,
+            numeric_value=value,
+            notes=row.get('notes') or '',
+        ))
+    return results, errors
+
+
+def ingest_sheet(session, rows):
+    """
+    Valida e inserta una planilla completa. Si alguna fila es inválida no se
+    escribe nada y se devuelve la lista de errores.
+
+    Retorna una tupla (results, errors).
+    """
+    results, errors = validate_rows(session, rows)
+    if errors:
+        return [], errors
+
+    created = session.pk is None
+    try:
+        with transaction.atomic():
+            if created:
+                session.save()
+            # bulk_create no dispara post_save; se notifica con una señal propia
+            results = TestResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+            test_results_bulk_created.send(sender=TestResult, results=results)
+    except IntegrityError:
+        if created:
+            # La sesión se creó dentro de la transacción revertida
+            session.pk = None
+            session._state.adding = True
+            return [], [{'row': None, 'errors': ['No se pudo guardar la planilla; vuelva a intentarlo']}]
+        # Una carga concurrente insertó resultados de la sesión después de la validación
+        _, errors = validate_rows(session, rows)
+        return [], errors or [{'row': None, 'errors': ['La sesión cambió durante la carga; vuelva a intentarlo']}]
+    return results, []
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.custom_auth.models import CustomUser
+from apps.lab.synthetic import BATCH_SIZE, PASSWORD, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un conjunto de datos sintético (coaches, atletas, tests, sesiones y '
+        'resultados) con bulk_create para pruebas de carga y benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coaches', type=int, default=10)
+        parser.add_argument('--athletes', type=int, default=500,
+                            help='Atletas repartidos entre los coaches y sus disciplinas.')
+        parser.add_argument('--tests', type=int, default=12,
+                            help='Tests repartidos entre todas las categorías.')
+        parser.add_argument('--sessions', type=int, default=40)
+        parser.add_argument('--tests-per-session', type=int, default=6,
+                            help='Tests evaluados a cada atleta de la disciplina en cada sesión.')
+        parser.add_argument('--years', type=int, default=3,
+                            help='Años hacia atrás en que se reparten las sesiones.')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Prefijo de los usernames y nombres de tests generados.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Ya existen usuarios con el prefijo "{prefix}"; use otro --prefix')
+        if options['coaches'] < 1:
+            raise CommandError('Se requiere al menos un coach')
+
+        counts = generate_dataset(
+            coaches=options['coaches'], athletes=options['athletes'], tests=options['tests'],
+            sessions=options['sessions'], tests_per_session=options['tests_per_session'],
+            years=options['years'], prefix=prefix, seed=options['seed'],
+            batch_size=options['batch_size'], stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Datos generados: ' + ', '.join(f'{k}={v}' for k, v in counts.items())
+        ))
+        self.stdout.write(f'Usuarios {prefix}_admin, {prefix}_coach_N y {prefix}_athlete_N '
+                          f'con contraseña "{PASSWORD}"')
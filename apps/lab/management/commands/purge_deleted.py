@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.lab.purge import BATCH_SIZE, resume_jobs
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las eliminaciones en segundo plano pendientes, interrumpidas o fallidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Número de resultados eliminados por transacción.')
+
+    def handle(self, *args, **options):
+        for job in resume_jobs(batch_size=options['batch_size']):
+            message = f'{job.target} {job.object_id}: {job.status} ({job.deleted} resultados eliminados)'
+            if job.status == 'done':
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.ERROR(f'{message}: {job.error}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.lab.fitness import BATCH_SIZE, rebuild_fitness_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero las estadísticas de cohorte y los puntajes del índice de condición física.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Número de atletas recalculados por lote.')
+
+    def handle(self, *args, **options):
+        statistics, scores = rebuild_fitness_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{statistics} estadísticas de cohorte y {scores} puntajes reconstruidos'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.lab.personal_bests import BATCH_SIZE, rebuild_personal_bests
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero la tabla de mejores marcas (PersonalBest) por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Número de filas leídas e insertadas por lote.')
+        parser.add_argument('--test', type=int, action='append', dest='tests',
+                            help='Reconstruye solo el test indicado (se puede repetir).')
+
+    def handle(self, *args, **options):
+        created = rebuild_personal_bests(test_ids=options['tests'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{created} mejores marcas reconstruidas'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalBest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numeric_value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date_recorded', models.DateTimeField()),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_bests', to=settings.AUTH_USER_MODEL)),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lab.testresult')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_bests', to='lab.test')),
+            ],
+            options={
+                'unique_together': {('athlete', 'test')},
+            },
+        ),
+    ]
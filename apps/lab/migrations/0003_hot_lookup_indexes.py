@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0002_personalbest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evaluationsession',
+            index=models.Index(fields=['discipline', 'date'], name='session_discipline_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['athlete', 'test', 'date_recorded'], name='result_athlete_test_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['session', 'test', 'numeric_value'], name='result_session_test_value_idx'),
+        ),
+    ]
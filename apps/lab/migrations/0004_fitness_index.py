@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 13:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0003_hot_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('discipline', models.CharField(choices=[('athletics', 'Athletics'), ('soccer', 'Soccer'), ('volleyball', 'Volleyball'), ('basketball', 'Basketball'), ('tennis', 'Tennis'), ('rugby', 'Rugby'), ('american_football', 'American Football'), ('swimming', 'Swimming'), ('taekwondo', 'Taekwondo'), ('flag_football', 'Flag Football'), ('futsal', 'Futsal'), ('beach_volleyball', 'Beach Volleyball'), ('table_tennis', 'Table Tennis'), ('martial_arts', 'Martial Arts'), ('boxing', 'Boxing'), ('physical_conditioning', 'Physical Conditioning'), ('gap_training', 'GAP (Glutes, Abs, Legs)'), ('investigation', 'Investigation')], max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_statistics', to='lab.test')),
+            ],
+            options={
+                'unique_together': {('test', 'discipline')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FitnessScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('strength', 'Fuerza'), ('endurance', 'Resistencia'), ('speed', 'Velocidad'), ('flexibility', 'Flexibilidad'), ('agility', 'Agilidad'), ('balance', 'Equilibrio'), ('coordination', 'Coordinación')], max_length=100)),
+                ('score', models.FloatField()),
+                ('tests', models.PositiveSmallIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitness_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('athlete', 'category')},
+            },
+        ),
+    ]
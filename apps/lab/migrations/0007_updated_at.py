@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0006_result_athlete_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evaluationsession',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='testresult',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,6 +1,13 @@
 from django.db import models
 from apps.custom_auth.models import CustomUser
 
+class ActiveTestManager(models.Manager):
+    """Default manager that hides tests pending purge (see apps.lab.purge)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Test(models.Model):
     """
     Represents a physical test type with associated metadata.
@@ -27,6 +34,10 @@ class Test(models.Model):
         unit (str): The unit of measurement for the test result, chosen from `UNIT_CHOICES`.
         higher_is_better (bool): Indicates whether a higher value represents a better result.
             Defaults to True.
+        deleted_at (datetime): Set when the test is soft-deleted. The default manager
+            `objects` hides these tests until the background purge removes them;
+            `all_objects` still returns them.
+        updated_at (datetime): Last time the test was saved; part of the dashboard ETags.
     Methods:
         __str__(): Returns the name of the test as its string representation.
     """
@@ -56,6 +67,11 @@ class Test(models.Model):
     description = models.TextField()
     unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
     higher_is_better = models.BooleanField(default=True, help_text="¿Un valor más alto representa un mejor resultado?")
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ActiveTestManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return self.name
@@ -71,6 +87,9 @@ class EvaluationSession(models.Model):
         evaluator (ForeignKey): A reference to the user (of type `CustomUser`) who conducts the evaluation. 
             Limited to users with the role 'admin'. Deleting the evaluator will cascade and delete related sessions.
         notes (TextField): Optional field for additional notes or observations about the session.
+        updated_at (DateTimeField): Last time the session was saved; part of the dashboard ETags.
+    Meta:
+        indexes: Composite index on (discipline, date) for the session listings.
     Methods:
         __str__(): Returns a string representation of the evaluation session in the format 
             "Evaluación <discipline> - <date>".
@@ -82,11 +101,17 @@ class EvaluationSession(models.Model):
     evaluator = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conducted_evaluations', 
                                  limit_choices_to={'role': 'admin'})
     notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     #falta agregar el campo de tests
     
     def __str__(self):
         return f"Evaluación {self.discipline} - {self.date}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['discipline', 'date'], name='session_discipline_date_idx'),
+        ]
+
 class TestResult(models.Model):
     """
     TestResult model represents the outcome of a specific physical test conducted for an athlete.
@@ -103,9 +128,13 @@ class TestResult(models.Model):
         notes (TextField): Optional additional information or observations about the test result.
         date_recorded (DateTimeField): The timestamp when the test result was recorded, 
             automatically set to the current date and time.
+        updated_at (DateTimeField): Last time the result was saved; part of the dashboard ETags.
     Meta:
         unique_together: Ensures that a combination of athlete, test, and session is unique, 
             preventing duplicate entries for the same test result.
+        indexes: (athlete, test, date_recorded) for result histories,
+            (athlete, date_recorded) for date ranges across all of an athlete's tests and
+            (session, test, numeric_value) to cover per-session aggregations.
     Methods:
         __str__: Returns a human-readable string representation of the test result, 
             including the athlete's name, test name, numeric value, and test unit.
@@ -118,10 +147,180 @@ class TestResult(models.Model):
     numeric_value = models.DecimalField(max_digits=10, decimal_places=2)
     notes = models.TextField(blank=True)
     date_recorded = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     
     def __str__(self):
         return f"{self.athlete.name} - {self.test.name}: {self.numeric_value} {self.test.unit}"
     
     class Meta:
-        unique_together = ('athlete', 'test', 'session')
\ No newline at end of file
+        unique_together = ('athlete', 'test', 'session')
+        indexes = [
+            # Historial de un atleta por test en orden cronológico
+            models.Index(fields=['athlete', 'test', 'date_recorded'], name='result_athlete_test_date_idx'),
+            # Rangos de fechas y orden cronológico de todos los resultados de un atleta
+            models.Index(fields=['athlete', 'date_recorded'], name='result_athlete_date_idx'),
+            # Cubre las agregaciones por sesión y test sin leer la tabla
+            models.Index(fields=['session', 'test', 'numeric_value'], name='result_session_test_value_idx'),
+        ]
+
+
+# Results whose athlete and test are not pending purge (see apps.lab.purge). Reports
+# that read TestResult or PersonalBest directly, without going through the users' or
+# tests' default managers, filter with it.
+ACTIVE_RESULTS = models.Q(athlete__deleted_at__isnull=True, test__deleted_at__isnull=True)
+
+
+class PersonalBest(models.Model):
+    """
+    PersonalBest model stores the best TestResult of each athlete for each test.
+    It is a denormalized table kept up to date on every TestResult insert, update and
+    delete (see apps.lab.signals), so reading the personal bests of a whole roster is a
+    single indexed query instead of a scan over the athletes' full result history.
+    Attributes:
+        athlete (ForeignKey): The athlete (CustomUser) who owns the personal best.
+        test (ForeignKey): The test (Test) the personal best belongs to.
+        result (ForeignKey): The TestResult that holds the personal best.
+        numeric_value (DecimalField): Copy of the result value, chosen according to
+            `Test.higher_is_better`.
+        date_recorded (DateTimeField): Copy of the date the result was recorded.
+    Meta:
+        unique_together: Ensures a single personal best per athlete and test.
+    Methods:
+        __str__: Returns the athlete, the test and the best value.
+    """
+
+    athlete = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='personal_bests')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='personal_bests')
+    result = models.ForeignKey(TestResult, on_delete=models.CASCADE, related_name='+')
+    numeric_value = models.DecimalField(max_digits=10, decimal_places=2)
+    date_recorded = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.athlete} - {self.test}: {self.numeric_value}"
+
+    class Meta:
+        unique_together = ('athlete', 'test')
+
+
+class CohortStatistic(models.Model):
+    """
+    CohortStatistic model stores the running statistics of all the results of a test
+    within a discipline, kept up to date incrementally with Welford's algorithm on every
+    TestResult insert, update and delete (see apps.lab.fitness), so the cohort mean and
+    standard deviation never require a scan over the results table.
+    Attributes:
+        test (ForeignKey): The test (Test) the statistics belong to.
+        discipline (CharField): The discipline of the athletes whose results are counted.
+        count (PositiveIntegerField): Number of results counted.
+        mean (FloatField): Running mean of the result values.
+        m2 (FloatField): Running sum of squared deviations from the mean.
+    Meta:
+        unique_together: Ensures a single row per test and discipline.
+    Methods:
+        std: Population standard deviation of the counted results.
+        __str__: Returns the test, the discipline and the running mean.
+    """
+
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='cohort_statistics')
+    discipline = models.CharField(max_length=100, choices=CustomUser.DISCIPLINE_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+
+    @property
+    def std(self):
+        return (max(self.m2, 0) / self.count) ** 0.5 if self.count else 0.0
+
+    def __str__(self):
+        return f"{self.test} ({self.discipline}): {self.mean:.2f}"
+
+    class Meta:
+        unique_together = ('test', 'discipline')
+
+
+class FitnessScore(models.Model):
+    """
+    FitnessScore model stores the precomputed 0-100 composite score of an athlete in a
+    test category. The score averages the z-scores of the athlete's latest result in each
+    test of the category against the CohortStatistic of their discipline (negated when
+    lower values are better) and maps the average through the normal CDF, so 50 is the
+    cohort average. Only the athletes affected by a result write are refreshed.
+    Attributes:
+        athlete (ForeignKey): The athlete (CustomUser) who owns the score.
+        category (CharField): The test category, chosen from `Test.CATEGORIES`.
+        score (FloatField): The composite score, between 0 and 100.
+        tests (PositiveSmallIntegerField): Number of tests that contribute to the score.
+        updated_at (DateTimeField): When the score was last refreshed.
+    Meta:
+        unique_together: Ensures a single score per athlete and category.
+    Methods:
+        __str__: Returns the athlete, the category and the score.
+    """
+
+    athlete = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='fitness_scores')
+    category = models.CharField(max_length=100, choices=Test.CATEGORIES)
+    score = models.FloatField()
+    tests = models.PositiveSmallIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.athlete} - {self.category}: {self.score:.1f}"
+
+    class Meta:
+        unique_together = ('athlete', 'category')
+
+
+class PurgeJob(models.Model):
+    """
+    PurgeJob model tracks the background removal of a soft-deleted user or test.
+    The dependent rows (test results and the denormalized tables built from them) are
+    deleted in bounded batches by apps.lab.purge, and the job records the progress so it
+    can be reported to the client and resumed after a restart.
+    Attributes:
+        TARGET_CHOICES (tuple): The kinds of objects that can be purged ('user' or 'test').
+        STATUS_CHOICES (tuple): The job states ('pending', 'running', 'done', 'failed').
+        target (CharField): The kind of object being purged.
+        object_id (PositiveIntegerField): The ID of the user or test being purged.
+        status (CharField): The current state of the job.
+        total (PositiveIntegerField): Number of test results to delete, counted when the
+            job was created.
+        deleted (PositiveIntegerField): Number of test results deleted so far.
+        error (TextField): The last error, if the job failed.
+        created_at (DateTimeField): When the object was soft-deleted.
+        started_at (DateTimeField): When the purge started (or last resumed).
+        finished_at (DateTimeField): When the purge finished.
+    Methods:
+        progress: Percentage of the test results already deleted.
+        __str__: Returns the target, the object ID and the status.
+    """
+
+    TARGET_CHOICES = (
+        ('user', 'Usuario'),
+        ('test', 'Test'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pendiente'),
+        ('running', 'En curso'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    )
+
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        if self.status == 'done' or not self.total:
+            return 100.0 if self.status == 'done' else 0.0
+        return round(min(self.deleted / self.total, 1) * 100, 1)
+
+    def __str__(self):
+        return f"{self.target} {self.object_id}: {self.status}"
@@ -0,0 +1,189 @@
+"""
+Mantenimiento de la tabla desnormalizada PersonalBest.
+
+Las funciones de este módulo se invocan desde los receptores de señales de
+apps.lab.signals en cada alta, modificación o baja de un TestResult (en lote
+cuando los resultados se eliminan en cascada con su sesión, atleta o test), y
+desde el comando rebuild_personal_bests para reconstruir la tabla completa.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import PersonalBest, Test, TestResult
+
+BATCH_SIZE = 1000
+
+
+def best_ordering(higher_is_better):
+    """Ordenamiento que deja primero el mejor resultado (el más antiguo en caso de empate)."""
+    value = F('numeric_value').desc() if higher_is_better else F('numeric_value').asc()
+    return [value, F('date_recorded').asc(), F('id').asc()]
+
+
+def _value(result):
+    # Un resultado recién creado conserva el valor tal como se asignó (p. ej. '4.10')
+    return Decimal(str(result.numeric_value))
+
+
+def is_better(value, current, higher_is_better):
+    """Indica si `value` supera estrictamente a `current` según el sentido del test."""
+    return value > current if higher_is_better else value < current
+
+
+def refresh_personal_best(athlete_id, test_id):
+    """Recalcula desde cero el mejor resultado de un atleta en un test."""
+    higher_is_better = Test.objects.filter(id=test_id).values_list('higher_is_better', flat=True).first()
+    if higher_is_better is None:
+        return
+    best = (
+        TestResult.objects.filter(athlete_id=athlete_id, test_id=test_id)
+        .order_by(*best_ordering(higher_is_better))
+        .only('id', 'numeric_value', 'date_recorded')
+        .first()
+    )
+    if best is None:
+        PersonalBest.objects.filter(athlete_id=athlete_id, test_id=test_id).delete()
+        return
+    PersonalBest.objects.update_or_create(
+        athlete_id=athlete_id,
+        test_id=test_id,
+        defaults={
+            'result_id': best.id,
+            'numeric_value': best.numeric_value,
+            'date_recorded': best.date_recorded,
+        },
+    )
+
+
+def _best_results(test_id, higher_is_better, athlete_ids=None):
+    """Mejor resultado por atleta en un test como tuplas (id, athlete_id, numeric_value, date_recorded)."""
+    results = TestResult.objects.filter(test_id=test_id)
+    if athlete_ids is not None:
+        results = results.filter(athlete_id__in=athlete_ids)
+    return (
+        results.annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('athlete_id')],
+            order_by=best_ordering(higher_is_better),
+        ))
+        .filter(position=1)
+        .values_list('id', 'athlete_id', 'numeric_value', 'date_recorded')
+    )
+
+
+def refresh_personal_bests(keys):
+    """
+    Versión por lotes de refresh_personal_best para pares (athlete_id, test_id):
+    una consulta con función de ventana por test y lote de atletas, en lugar de
+    una por par.
+    """
+    by_test = defaultdict(set)
+    for athlete_id, test_id in keys:
+        by_test[test_id].add(athlete_id)
+    if not by_test:
+        return
+    directions = dict(Test.objects.filter(id__in=by_test).values_list('id', 'higher_is_better'))
+    with transaction.atomic():
+        for test_id, athlete_ids in by_test.items():
+            if test_id not in directions:
+                continue
+            athlete_ids = sorted(athlete_ids)
+            for start in range(0, len(athlete_ids), BATCH_SIZE):
+                chunk = athlete_ids[start:start + BATCH_SIZE]
+                PersonalBest.objects.filter(test_id=test_id, athlete_id__in=chunk).delete()
+                PersonalBest.objects.bulk_create([
+                    PersonalBest(
+                        athlete_id=athlete_id,
+                        test_id=test_id,
+                        result_id=result_id,
+                        numeric_value=value,
+                        date_recorded=date_recorded,
+                    )
+                    for result_id, athlete_id, value, date_recorded in _best_results(
+                        test_id, directions[test_id], chunk
+                    )
+                ])
+
+
+def record_results(results):
+    """
+    Incorpora resultados nuevos a la tabla de mejores marcas comparándolos con los
+    registros existentes, que se cargan en una sola consulta.
+    """
+    if not results:
+        return
+    test_ids = {r.test_id for r in results}
+    directions = dict(Test.objects.filter(id__in=test_ids).values_list('id', 'higher_is_better'))
+
+    # Mejor candidato por (atleta, test) dentro del lote
+    candidates = {}
+    for result in results:
+        key = (result.athlete_id, result.test_id)
+        current = candidates.get(key)
+        if current is None or is_better(_value(result), _value(current), directions[result.test_id]):
+            candidates[key] = result
+
+    athlete_ids = {key[0] for key in candidates}
+    existing = {
+        (pb.athlete_id, pb.test_id): pb
+        for pb in PersonalBest.objects.filter(athlete_id__in=athlete_ids, test_id__in=test_ids)
+    }
+
+    to_create, to_update = [], []
+    for key, result in candidates.items():
+        pb = existing.get(key)
+        if pb is None:
+            to_create.append(PersonalBest(
+                athlete_id=result.athlete_id,
+                test_id=result.test_id,
+                result_id=result.id,
+                numeric_value=_value(result),
+                date_recorded=result.date_recorded,
+            ))
+        elif is_better(_value(result), pb.numeric_value, directions[result.test_id]):
+            pb.result_id = result.id
+            pb.numeric_value = _value(result)
+            pb.date_recorded = result.date_recorded
+            to_update.append(pb)
+
+    PersonalBest.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    PersonalBest.objects.bulk_update(
+        to_update, ['result', 'numeric_value', 'date_recorded'], batch_size=BATCH_SIZE
+    )
+
+
+def rebuild_personal_bests(test_ids=None, batch_size=BATCH_SIZE):
+    """
+    Reconstruye la tabla desde cero (o solo para los tests indicados). Para cada
+    test, una función de ventana selecciona el mejor resultado por atleta y las
+    filas se insertan por lotes. Retorna el número de mejores marcas creadas.
+    """
+    tests = Test.objects.all()
+    if test_ids is not None:
+        tests = tests.filter(id__in=test_ids)
+
+    created = 0
+    with transaction.atomic():
+        for test in tests.only('id', 'higher_is_better'):
+            PersonalBest.objects.filter(test_id=test.id).delete()
+            rows = _best_results(test.id, test.higher_is_better)
+            batch = []
+            for result_id, athlete_id, value, date_recorded in rows.iterator(chunk_size=batch_size):
+                batch.append(PersonalBest(
+                    athlete_id=athlete_id,
+                    test_id=test.id,
+                    result_id=result_id,
+                    numeric_value=value,
+                    date_recorded=date_recorded,
+                ))
+                if len(batch) >= batch_size:
+                    PersonalBest.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            PersonalBest.objects.bulk_create(batch)
+            created += len(batch)
+    return created
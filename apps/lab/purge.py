@@ -0,0 +1,197 @@
+"""
+Eliminación diferida de usuarios y tests.
+
+Eliminar un atleta con años de historial, un evaluador (con sus sesiones) o un test
+muy usado con .delete() hace que el colector de Django cargue en memoria todos los
+TestResult dependientes y mantenga el bloqueo de escritura de SQLite mientras los
+borra. En su lugar, las vistas marcan el objeto con deleted_at (los managers por
+defecto lo ocultan desde ese momento), crean un PurgeJob y lo encolan en un hilo
+de fondo después del commit.
+
+El hilo borra los resultados con SQL directo en lotes de BATCH_SIZE, cada uno en
+su propia transacción, junto con las mejores marcas que apuntaban a ellos, y
+descuenta sus valores de las estadísticas del índice de condición física. Como el
+SQL directo no dispara señales, al terminar recalcula las mejores marcas y los
+puntajes de los demás atletas afectados e invalida las cachés. Por último elimina
+el objeto con el ORM, que ya no tiene dependientes voluminosos.
+
+Mientras la purga está pendiente, los reportes que leen TestResult o PersonalBest
+directamente (resultados y mejores marcas del dashboard, rankings, resúmenes de
+sesión, exportación, roster) excluyen los del atleta o test marcado (ver
+ACTIVE_RESULTS en apps.lab.models). Las estadísticas de cohorte del índice de
+condición física (CohortStatistic) y los puntajes precalculados (FitnessScore) se
+actualizan de forma incremental y siguen incluyendo los valores de un test marcado
+hasta que el hilo los descuenta, en general pocos segundos después.
+
+Cada lote actualiza el progreso del PurgeJob. Un trabajo interrumpido (p. ej. por
+un reinicio) se retoma con el comando purge_deleted.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.custom_auth.authentication import invalidate_user_state
+from apps.custom_auth.models import CustomUser
+from apps.custom_auth.permissions import invalidate_coach
+from . import catalog, fitness, personal_bests, rankings, summaries
+from .models import EvaluationSession, PersonalBest, PurgeJob, Test, TestResult
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Un solo hilo: las purgas se serializan y nunca compiten entre sí por la escritura
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+
+
+def soft_delete_user(user):
+    """Marca al usuario como eliminado, lo desactiva y encola su purga. Retorna el PurgeJob."""
+    with transaction.atomic():
+        now = timezone.now()
+        CustomUser.all_objects.filter(pk=user.pk).update(deleted_at=now, is_active=False, updated_at=now)
+        total = TestResult.objects.filter(Q(athlete_id=user.pk) | Q(session__evaluator_id=user.pk)).count()
+        job = PurgeJob.objects.create(target='user', object_id=user.pk, total=total)
+        transaction.on_commit(lambda: schedule(job.id))
+    # update() no dispara post_save: se invalidan a mano el estado de autorización
+    # y el conjunto de atletas de su entrenador
+    invalidate_user_state(user.pk)
+    if user.coach_id is not None:
+        invalidate_coach(user.coach_id)
+    # Las cohortes y los resúmenes en caché todavía incluyen sus resultados
+    rankings.invalidate_all()
+    summaries.invalidate_all()
+    return job
+
+
+def soft_delete_test(test):
+    """Marca el test como eliminado y encola su purga. Retorna el PurgeJob."""
+    with transaction.atomic():
+        now = timezone.now()
+        Test.all_objects.filter(pk=test.pk).update(deleted_at=now, updated_at=now)
+        total = TestResult.objects.filter(test_id=test.pk).count()
+        job = PurgeJob.objects.create(target='test', object_id=test.pk, total=total)
+        transaction.on_commit(lambda: schedule(job.id))
+    catalog.bump_version()
+    summaries.invalidate_all()
+    return job
+
+
+def schedule(job_id):
+    _executor.submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # El hilo del pool es de larga vida: no debe retener la conexión abierta
+        connection.close()
+
+
+def run_job(job_id, batch_size=BATCH_SIZE):
+    """Ejecuta (o retoma) una purga. Retorna el PurgeJob actualizado."""
+    job = PurgeJob.objects.get(id=job_id)
+    if job.status == 'done':
+        return job
+    PurgeJob.objects.filter(id=job.id).update(status='running', started_at=timezone.now(), error='')
+    try:
+        if job.target == 'user':
+            _purge_user(job, batch_size)
+        else:
+            _purge_test(job, batch_size)
+    except Exception as e:
+        logger.exception('Falló la purga de %s %s', job.target, job.object_id)
+        PurgeJob.objects.filter(id=job.id).update(status='failed', error=str(e))
+    else:
+        PurgeJob.objects.filter(id=job.id).update(status='done', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def resume_jobs(batch_size=BATCH_SIZE):
+    """Ejecuta en el hilo actual las purgas pendientes, interrumpidas o fallidas."""
+    jobs = PurgeJob.objects.exclude(status='done').order_by('id').values_list('id', flat=True)
+    return [run_job(job_id, batch_size) for job_id in list(jobs)]
+
+
+def _purge_user(job, batch_size):
+    user_id = job.object_id
+    affected = _purge_results(job, 'athlete_id = %s', [user_id], batch_size)
+    # Las sesiones que el usuario evaluó se eliminan en cascada con todos sus resultados
+    sessions = list(EvaluationSession.objects.filter(evaluator_id=user_id).values_list('id', flat=True))
+    for session_id in sessions:
+        _merge(affected, _purge_results(job, 'session_id = %s', [session_id], batch_size))
+
+    affected['athletes'].discard(user_id)
+    _reconcile(affected, exclude=lambda athlete_id, test_id: athlete_id == user_id)
+    user = CustomUser.all_objects.filter(pk=user_id).first()
+    if user is not None:
+        user.delete()
+
+
+def _purge_test(job, batch_size):
+    test_id = job.object_id
+    affected = _purge_results(job, 'test_id = %s', [test_id], batch_size)
+    _reconcile(affected, exclude=lambda athlete_id, test_id_: test_id_ == test_id)
+    test = Test.all_objects.filter(pk=test_id).first()
+    if test is not None:
+        test.delete()
+
+
+def _purge_results(job, where, params, batch_size):
+    """
+    Borra por lotes los TestResult que cumplen `where` y las mejores marcas que los
+    referencian. Retorna los atletas, sesiones y mejores marcas afectados.
+    """
+    results_table = TestResult._meta.db_table
+    bests_table = PersonalBest._meta.db_table
+    affected = {'athletes': set(), 'sessions': set(), 'bests': set()}
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, athlete_id, test_id, session_id, numeric_value FROM {results_table} '
+                f'WHERE {where} LIMIT %s',
+                [*params, batch_size],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f'SELECT athlete_id, test_id FROM {bests_table} WHERE result_id IN ({placeholders})', ids)
+            affected['bests'].update(cursor.fetchall())
+            cursor.execute(f'DELETE FROM {bests_table} WHERE result_id IN ({placeholders})', ids)
+            cursor.execute(f'DELETE FROM {results_table} WHERE id IN ({placeholders})', ids)
+
+            disciplines = dict(
+                CustomUser.all_objects.filter(id__in={row[1] for row in rows}).values_list('id', 'discipline')
+            )
+            fitness.update_statistics(removed=[
+                (test_id, disciplines[athlete_id], value)
+                for _, athlete_id, test_id, _, value in rows if athlete_id in disciplines
+            ])
+            PurgeJob.objects.filter(id=job.id).update(deleted=F('deleted') + len(rows))
+        affected['athletes'].update(row[1] for row in rows)
+        affected['sessions'].update(row[3] for row in rows)
+    return affected
+
+
+def _merge(affected, other):
+    for key, values in other.items():
+        affected[key].update(values)
+
+
+def _reconcile(affected, exclude):
+    """Rehace lo que las señales habrían hecho por cada resultado borrado."""
+    for athlete_id, test_id in affected['bests']:
+        if not exclude(athlete_id, test_id):
+            personal_bests.refresh_personal_best(athlete_id, test_id)
+    athlete_ids = sorted(affected['athletes'])
+    for start in range(0, len(athlete_ids), fitness.BATCH_SIZE):
+        fitness.refresh_scores(athlete_ids[start:start + fitness.BATCH_SIZE])
+    for session_id in affected['sessions']:
+        summaries.invalidate_session(session_id)
+    rankings.invalidate_all()
@@ -0,0 +1,147 @@
+"""
+Motor de percentiles por cohorte.
+
+La cohorte de un atleta para un test son los atletas de la misma disciplina
+(opcionalmente del mismo rango de edad). El valor de cada atleta es su mejor marca
+(PersonalBest), de modo que cada atleta cuenta una sola vez sin importar cuántos
+resultados tenga. Los valores se extraen con values_list y se ordenan con NumPy;
+el percentil de cada atleta se obtiene con searchsorted sobre el arreglo ordenado.
+
+Los arreglos se guardan en la caché por (test, disciplina) y se invalidan desde
+apps.lab.signals cuando cambian los resultados o las mejores marcas de ese test, o
+los datos de cohorte (disciplina, fecha de nacimiento) de algún atleta.
+"""
+from datetime import date
+
+import numpy as np
+from django.core.cache import cache
+
+from apps.custom_auth.models import CustomUser
+from .models import PersonalBest
+
+CACHE_TIMEOUT = 60 * 60
+GENERATION_KEY = 'lab:cohort:generation'
+
+# Marca usada para los atletas sin fecha de nacimiento
+NO_BIRTH_DATE = -1
+DAYS_PER_YEAR = 365.25
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def _cache_key(test_id, discipline, generation):
+    return f'lab:cohort:{generation}:{test_id}:{discipline}'
+
+
+def invalidate_test(test_id):
+    """Descarta los arreglos de todas las disciplinas de un test."""
+    generation = _generation()
+    cache.delete_many([
+        _cache_key(test_id, discipline, generation)
+        for discipline, _ in CustomUser.DISCIPLINE_CHOICES
+    ])
+
+
+def invalidate_all():
+    """Descarta todos los arreglos en caché (p. ej. si cambia la cohorte de un atleta)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def cohort_arrays(test_id, discipline):
+    """
+    Devuelve los arreglos de la cohorte (test, disciplina): athlete_ids, values y
+    birth_days (ordinal de la fecha de nacimiento o NO_BIRTH_DATE), ordenados por valor.
+    """
+    key = _cache_key(test_id, discipline, _generation())
+    arrays = cache.get(key)
+    if arrays is not None:
+        return arrays
+
+    rows = list(
+        PersonalBest.objects.filter(
+            test_id=test_id, athlete__discipline=discipline, athlete__deleted_at__isnull=True
+        )
+        .values_list('athlete_id', 'numeric_value', 'athlete__date_of_birth')
+    )
+    athlete_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    birth_days = np.fromiter(
+        (r[2].toordinal() if r[2] else NO_BIRTH_DATE for r in rows), dtype=np.int64, count=len(rows)
+    )
+    order = np.argsort(values, kind='stable')
+    arrays = {
+        'athlete_ids': athlete_ids[order],
+        'values': values[order],
+        'birth_days': birth_days[order],
+    }
+    cache.set(key, arrays, CACHE_TIMEOUT)
+    return arrays
+
+
+def age_bands(birth_days, width, today=None):
+    """Rango de edad (edad en años // width) de cada atleta; -1 si no hay fecha de nacimiento."""
+    today = (today or date.today()).toordinal()
+    ages = np.floor((today - birth_days) / DAYS_PER_YEAR).astype(np.int64)
+    return np.where(birth_days == NO_BIRTH_DATE, -1, ages // width)
+
+
+def _rank(values, higher_is_better):
+    """
+    Calcula rank (1 = mejor) y percentil (porcentaje de la cohorte que el atleta
+    iguala o supera) para un arreglo ordenado de forma ascendente.
+    """
+    n = values.size
+    if higher_is_better:
+        at_or_below = np.searchsorted(values, values, side='right')
+        rank = n - at_or_below + 1
+        percentile = at_or_below / n * 100
+    else:
+        below = np.searchsorted(values, values, side='left')
+        rank = below + 1
+        percentile = (n - below) / n * 100
+    return rank, percentile
+
+
+def cohort_percentiles(test, discipline, age_band_width=None):
+    """
+    Calcula el percentil y la posición de cada atleta de la disciplina en el test.
+
+    Retorna una lista de diccionarios con athlete, discipline, age_band,
+    numeric_value, rank, percentile y cohort_size.
+    """
+    arrays = cohort_arrays(test.id, discipline)
+    values = arrays['values']
+    if values.size == 0:
+        return []
+
+    if age_band_width:
+        bands = age_bands(arrays['birth_days'], age_band_width)
+    else:
+        bands = np.full(values.size, -1, dtype=np.int64)
+
+    results = []
+    for band in np.unique(bands):
+        # La máscara conserva el orden ascendente del arreglo completo
+        mask = bands == band
+        band_values = values[mask]
+        rank, percentile = _rank(band_values, test.higher_is_better)
+        band_label = None if not age_band_width or band < 0 else [
+            int(band * age_band_width), int((band + 1) * age_band_width - 1)
+        ]
+        for athlete_id, value, r, p in zip(arrays['athlete_ids'][mask].tolist(), band_values.tolist(),
+                                           rank.tolist(), percentile.tolist()):
+            results.append({
+                'athlete': athlete_id,
+                'discipline': discipline,
+                'age_band': band_label,
+                'numeric_value': round(value, 2),
+                'rank': r,
+                'percentile': round(p, 2),
+                'cohort_size': int(band_values.size),
+            })
+    return results
@@ -0,0 +1,128 @@
+"""
+Filtros de los listados de resultados de un atleta.
+
+filter_results() traduce los parámetros de la solicitud a filtros del ORM que se
+resuelven en SQL con los índices de TestResult:
+
+    - `date_from` / `date_to` (AAAA-MM-DD, inclusivos) sobre `date_field`:
+      date_recorded (por defecto) o session_date (fecha de la sesión). Sobre
+      date_recorded se comparan instantes de inicio de día, sin funciones sobre la
+      columna, para que el rango use los índices (athlete, date_recorded) y
+      (athlete, test, date_recorded).
+    - `test`: uno o varios IDs separados por comas.
+    - `category`: se convierte en una subconsulta de IDs de test, de modo que el
+      filtro se resuelve como un conjunto de búsquedas sobre (athlete, test,
+      date_recorded) en lugar de un JOIN fila por fila.
+    - `session` y `discipline` (disciplina de la sesión).
+    - `ordering`: uno de ORDERINGS, con `-` para orden descendente.
+    - `limit`: entre 1 y MAX_LIMIT.
+
+Un parámetro inválido lanza FilterError con el mensaje para el cliente.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from athletes_tracking.params import is_integer, parse_day
+from apps.custom_auth.models import CustomUser
+from .models import Test
+
+DATE_FIELDS = ('date_recorded', 'session_date')
+
+ORDERINGS = {
+    'date_recorded': 'date_recorded',
+    'session_date': 'session__date',
+    'numeric_value': 'numeric_value',
+    'test': 'test_id',
+}
+DEFAULT_ORDERING = 'date_recorded'
+
+MAX_LIMIT = 1000
+MAX_TESTS = 50
+
+
+class FilterError(Exception):
+    """Parámetro de filtro inválido; el mensaje se devuelve al cliente."""
+
+
+def date_param(params, name):
+    """El parámetro `name` (AAAA-MM-DD) como date, o None si no viene."""
+    value = params.get(name)
+    if not value:
+        return None
+    day = parse_day(value)
+    if day is None:
+        raise FilterError(f'{name} debe tener el formato AAAA-MM-DD')
+    return day
+
+
+def _ids(value, name):
+    ids = value.split(',')
+    if not all(is_integer(part) for part in ids) or len(ids) > MAX_TESTS:
+        raise FilterError(f'{name} debe ser una lista de hasta {MAX_TESTS} IDs separados por comas')
+    return [int(part) for part in ids]
+
+
+def _start_of_day(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def filter_results(queryset, params):
+    """Aplica a `queryset` (de TestResult) los filtros, el orden y el límite de `params`."""
+    date_field = params.get('date_field', 'date_recorded')
+    if date_field not in DATE_FIELDS:
+        raise FilterError(f"date_field debe ser uno de: {', '.join(DATE_FIELDS)}")
+    date_from, date_to = date_param(params, 'date_from'), date_param(params, 'date_to')
+    if date_from and date_to and date_from > date_to:
+        raise FilterError('date_from no puede ser posterior a date_to')
+
+    if date_field == 'date_recorded':
+        # Rango semiabierto [inicio de date_from, inicio del día siguiente a date_to)
+        if date_from:
+            queryset = queryset.filter(date_recorded__gte=_start_of_day(date_from))
+        if date_to:
+            queryset = queryset.filter(date_recorded__lt=_start_of_day(date_to + timedelta(days=1)))
+    else:
+        if date_from:
+            queryset = queryset.filter(session__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(session__date__lte=date_to)
+
+    test = params.get('test')
+    if test:
+        queryset = queryset.filter(test_id__in=_ids(test, 'test'))
+
+    category = params.get('category')
+    if category:
+        if category not in dict(Test.CATEGORIES):
+            raise FilterError('Categoría no válida')
+        queryset = queryset.filter(test_id__in=Test.objects.filter(category=category).values('id'))
+
+    session = params.get('session')
+    if session:
+        if not is_integer(session):
+            raise FilterError('session debe ser un ID de sesión')
+        queryset = queryset.filter(session_id=int(session))
+
+    discipline = params.get('discipline')
+    if discipline:
+        if discipline not in dict(CustomUser.DISCIPLINE_CHOICES):
+            raise FilterError('Disciplina no válida')
+        queryset = queryset.filter(session__discipline=discipline)
+
+    ordering = params.get('ordering', DEFAULT_ORDERING)
+    descending = ordering.startswith('-')
+    field = ORDERINGS.get(ordering.lstrip('-'))
+    if field is None:
+        raise FilterError(f"ordering debe ser uno de: {', '.join(ORDERINGS)} (con - para orden descendente)")
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+    limit = params.get('limit')
+    if limit is not None:
+        if not is_integer(limit) or not 1 <= int(limit) <= MAX_LIMIT:
+            raise FilterError(f'limit debe estar entre 1 y {MAX_LIMIT}')
+        queryset = queryset[:int(limit)]
+    return queryset
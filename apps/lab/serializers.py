@@ -1,8 +1,9 @@
 # serializers.py
 from rest_framework import serializers
+from athletes_tracking.serializers import TimedSerializerMixin
 from .models import Test
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializador para el modelo Test.
     """
@@ -0,0 +1,280 @@
+from django.core.management import call_command
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from apps.custom_auth.models import CustomUser
+from .models import EvaluationSession, PersonalBest, Test, TestResult
+from . import catalog, fitness, personal_bests, rankings, summaries
+
+# Campos de CustomUser que determinan la cohorte de un atleta
+COHORT_FIELDS = {'role', 'discipline', 'date_of_birth'}
+
+# Campos de CustomUser que se muestran en los resúmenes de sesión
+SUMMARY_FIELDS = {'name', 'username'}
+
+# Se emite después de insertar resultados con bulk_create, que no dispara
+# post_save. Argumentos: sender (TestResult) y results (lista de instancias).
+test_results_bulk_created = Signal()
+
+# Modelos cuyo borrado elimina TestResult en cascada. Durante la cascada los
+# receptores por resultado no hacen nada y el trabajo se hace en lote al final
+# (ver remember_cascaded_results y reconcile_cascaded_results).
+CASCADE_PARENTS = (EvaluationSession, CustomUser, Test)
+
+
+def _cascaded(origin):
+    # origin es la instancia o el queryset sobre el que se llamó a delete()
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, CASCADE_PARENTS)
+    return isinstance(origin, CASCADE_PARENTS)
+
+
+@receiver(post_save, sender=TestResult)
+def update_personal_best_on_save(sender, instance, created, raw=False, **kwargs):
+    """Actualiza la mejor marca del atleta al crear o modificar un resultado."""
+    if raw:
+        return
+    if created:
+        personal_bests.record_results([instance])
+        return
+    # Si el resultado cambió de atleta o de test, la marca anterior queda obsoleta
+    stale = PersonalBest.objects.filter(result_id=instance.id).values_list('athlete_id', 'test_id')
+    keys = set(stale) | {(instance.athlete_id, instance.test_id)}
+    for athlete_id, test_id in keys:
+        personal_bests.refresh_personal_best(athlete_id, test_id)
+
+
+@receiver(post_delete, sender=TestResult)
+def update_personal_best_on_delete(sender, instance, origin=None, **kwargs):
+    """Recalcula la mejor marca si el resultado eliminado era el que la sostenía."""
+    if _cascaded(origin):
+        return
+    # La marca que apuntaba a este resultado ya fue eliminada en cascada
+    if not PersonalBest.objects.filter(athlete_id=instance.athlete_id, test_id=instance.test_id).exists():
+        personal_bests.refresh_personal_best(instance.athlete_id, instance.test_id)
+
+
+@receiver(test_results_bulk_created, sender=TestResult)
+def update_personal_bests_on_bulk_create(sender, results, **kwargs):
+    personal_bests.record_results(results)
+
+
+@receiver(pre_save, sender=Test)
+def remember_test_direction(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = Test.objects.filter(pk=instance.pk).values_list('higher_is_better', 'category').first()
+    instance._previous_higher_is_better, instance._previous_category = previous or (None, None)
+
+
+@receiver(post_save, sender=Test)
+def rebuild_personal_bests_on_direction_change(sender, instance, created, raw=False, **kwargs):
+    """Si cambia higher_is_better, todas las mejores marcas del test se recalculan."""
+    previous = getattr(instance, '_previous_higher_is_better', None)
+    if raw or created or previous is None or previous == instance.higher_is_better:
+        return
+    personal_bests.rebuild_personal_bests(test_ids=[instance.id])
+
+
+@receiver(post_save, sender=TestResult)
+@receiver(post_delete, sender=TestResult)
+def invalidate_cohort_on_result_change(sender, instance, origin=None, **kwargs):
+    if _cascaded(origin):
+        return
+    rankings.invalidate_test(instance.test_id)
+
+
+@receiver(test_results_bulk_created, sender=TestResult)
+def invalidate_cohort_on_bulk_create(sender, results, **kwargs):
+    for test_id in {result.test_id for result in results}:
+        rankings.invalidate_test(test_id)
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_cohort_on_test_change(sender, instance, **kwargs):
+    rankings.invalidate_test(instance.id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cohorts_on_athlete_change(sender, instance, update_fields=None, **kwargs):
+    """Un cambio de disciplina o fecha de nacimiento altera las cohortes de todos los tests."""
+    if update_fields is not None and not COHORT_FIELDS.intersection(update_fields):
+        return
+    rankings.invalidate_all()
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def bump_catalog_version(sender, instance, **kwargs):
+    catalog.bump_version()
+
+
+@receiver(post_save, sender=TestResult)
+@receiver(post_delete, sender=TestResult)
+def invalidate_session_summary(sender, instance, origin=None, **kwargs):
+    if _cascaded(origin):
+        return
+    summaries.invalidate_session(instance.session_id)
+
+
+@receiver(test_results_bulk_created, sender=TestResult)
+def invalidate_session_summaries_on_bulk_create(sender, results, **kwargs):
+    for session_id in {result.session_id for result in results}:
+        summaries.invalidate_session(session_id)
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_session_summaries_on_test_change(sender, instance, **kwargs):
+    summaries.invalidate_all()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_session_summaries_on_rename(sender, instance, created, raw=False, **kwargs):
+    """Los resúmenes incluyen el nombre de los mejores atletas: se invalidan sus sesiones."""
+    previous = getattr(instance, '_previous_summary_fields', None)
+    if raw or created or previous is None:
+        return
+    if all(previous[field] == getattr(instance, field) for field in SUMMARY_FIELDS):
+        return
+    session_ids = (
+        TestResult.objects.filter(athlete_id=instance.pk).order_by().values_list('session_id', flat=True).distinct()
+    )
+    for session_id in session_ids:
+        summaries.invalidate_session(session_id)
+
+
+@receiver(pre_save, sender=TestResult)
+def remember_result_value(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_result = (
+        TestResult.objects.filter(pk=instance.pk).values_list('athlete_id', 'test_id', 'numeric_value').first()
+    )
+
+
+@receiver(post_save, sender=TestResult)
+def update_fitness_index_on_save(sender, instance, created, raw=False, **kwargs):
+    """Actualiza con Welford las estadísticas de la cohorte y los puntajes del atleta."""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_result', None)
+    if created or previous is None:
+        fitness.record_results([instance])
+    else:
+        fitness.replace_result(previous, instance)
+
+
+@receiver(post_delete, sender=TestResult)
+def update_fitness_index_on_delete(sender, instance, origin=None, **kwargs):
+    if _cascaded(origin):
+        return
+    fitness.remove_result(instance)
+
+
+@receiver(test_results_bulk_created, sender=TestResult)
+def update_fitness_index_on_bulk_create(sender, results, **kwargs):
+    fitness.record_results(results)
+
+
+@receiver(post_save, sender=Test)
+def refresh_fitness_scores_on_test_change(sender, instance, created, raw=False, **kwargs):
+    """Si cambia la dirección o la categoría del test, cambian los puntajes de sus atletas."""
+    if raw or created:
+        return
+    previous = (
+        getattr(instance, '_previous_higher_is_better', None),
+        getattr(instance, '_previous_category', None),
+    )
+    if previous[0] is None or previous == (instance.higher_is_better, instance.category):
+        return
+    fitness.refresh_test(instance.id)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_athlete_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda la disciplina y los campos de SUMMARY_FIELDS anteriores para detectar si cambiaron."""
+    instance._previous_discipline = instance._previous_summary_fields = None
+    if raw or instance.pk is None or (
+        update_fields is not None and not ({'discipline'} | SUMMARY_FIELDS).intersection(update_fields)
+    ):
+        return
+    previous = CustomUser.objects.filter(pk=instance.pk).values('discipline', *SUMMARY_FIELDS).first()
+    if previous is not None:
+        instance._previous_discipline = previous.pop('discipline')
+        instance._previous_summary_fields = previous
+
+
+@receiver(post_save, sender=CustomUser)
+def move_fitness_cohort_on_discipline_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_discipline', None)
+    if raw or created or previous is None or previous == instance.discipline:
+        return
+    fitness.move_athlete(instance.id, previous, instance.discipline)
+
+
+def _dependent_results(instance):
+    if isinstance(instance, EvaluationSession):
+        return Q(session_id=instance.pk)
+    if isinstance(instance, Test):
+        return Q(test_id=instance.pk)
+    return Q(athlete_id=instance.pk) | Q(session__evaluator_id=instance.pk)
+
+
+@receiver(pre_delete, sender=EvaluationSession)
+@receiver(pre_delete, sender=CustomUser)
+@receiver(pre_delete, sender=Test)
+def remember_cascaded_results(sender, instance, origin=None, **kwargs):
+    """
+    Antes de borrar una sesión, un usuario o un test guarda en una consulta los
+    resultados que se eliminarán en cascada y las mejores marcas que sostenían.
+    """
+    direct = origin is instance or (isinstance(origin, QuerySet) and isinstance(instance, origin.model))
+    if not direct:
+        # La instancia se borra a su vez en cascada; su origen ya guardó los resultados
+        return
+    results = TestResult.objects.filter(_dependent_results(instance))
+    instance._cascaded_results = list(
+        results.values_list('id', 'athlete_id', 'test_id', 'session_id', 'numeric_value', 'athlete__discipline')
+    )
+    instance._cascaded_bests = set(
+        PersonalBest.objects.filter(result__in=results).values_list('athlete_id', 'test_id')
+    )
+
+
+@receiver(post_delete, sender=EvaluationSession)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Test)
+def reconcile_cascaded_results(sender, instance, origin=None, **kwargs):
+    """Hace en lote lo que los receptores por resultado omitieron durante la cascada."""
+    rows = instance.__dict__.pop('_cascaded_results', None)
+    bests = instance.__dict__.pop('_cascaded_bests', set())
+    if not rows:
+        return
+    if isinstance(origin, QuerySet):
+        # Al borrar varios padres juntos (p. ej. un atleta y el evaluador de sus
+        # sesiones) un resultado puede figurar en más de uno
+        reconciled = origin.__dict__.setdefault('_reconciled_results', set())
+        rows = [row for row in rows if row[0] not in reconciled]
+        reconciled.update(row[0] for row in rows)
+    personal_bests.refresh_personal_bests(bests)
+    fitness.remove_results(
+        [(athlete_id, test_id, value) for _, athlete_id, test_id, _, value, _ in rows],
+        # Los atletas pueden estar entre los usuarios eliminados
+        disciplines={row[1]: row[5] for row in rows},
+    )
+    for session_id in {row[3] for row in rows}:
+        summaries.invalidate_session(session_id)
+    for test_id in {row[2] for row in rows}:
+        rankings.invalidate_test(test_id)
+
+
+def create_cache_table(sender, using, **kwargs):
+    """
+    Conectado a post_migrate en apps.py: crea la tabla de DatabaseCache (ver CACHES
+    en settings) si falta, para que migrate baste al desplegar.
+    """
+    call_command('createcachetable', database=using, verbosity=0)
@@ -0,0 +1,126 @@
+"""
+Resumen estadístico de una sesión de evaluación.
+
+Por cada test evaluado en la sesión se calculan count, mean, std (poblacional),
+min y max en una sola consulta agrupada, resuelta con el índice
+(session, test, numeric_value). La mediana y los mejores resultados, que SQL no
+agrega de forma portable, salen de una segunda lectura de los valores ya
+ordenados por ese mismo índice y de una pasada con NumPy.
+
+El resumen se guarda en la caché bajo una versión por sesión, que apps.lab.signals
+incrementa cuando cambia algún resultado de la sesión, y una generación global,
+que se incrementa cuando cambia algún test o el nombre de algún atleta de la sesión.
+
+Los entrenadores ven el resumen calculado solo con los resultados de sus atletas;
+la clave de caché incluye un hash de ese conjunto, de modo que un cambio en el
+equipo produce una entrada nueva.
+"""
+import hashlib
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, StdDev
+
+from .models import ACTIVE_RESULTS, TestResult
+
+CACHE_TIMEOUT = 60 * 60
+GENERATION_KEY = 'lab:session_summary:generation'
+
+# Mejores resultados guardados por test; las vistas pueden pedir menos
+MAX_TOP = 10
+
+
+def _version_key(session_id):
+    return f'lab:session_summary:version:{session_id}'
+
+
+def invalidate_session(session_id):
+    try:
+        cache.incr(_version_key(session_id))
+    except ValueError:
+        cache.set(_version_key(session_id), 1, None)
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _scope_digest(athlete_ids):
+    if athlete_ids is None:
+        return 'all'
+    payload = ','.join(str(athlete_id) for athlete_id in sorted(athlete_ids)).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def session_summary(session_id, athlete_ids=None):
+    """
+    Devuelve la lista de resúmenes por test de la sesión, desde la caché si está
+    vigente. Con `athlete_ids` solo se consideran los resultados de esos atletas.
+    """
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    version = cache.get_or_set(_version_key(session_id), 1, None)
+    key = f'lab:session_summary:{generation}:{session_id}:{version}:{_scope_digest(athlete_ids)}'
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(session_id, athlete_ids)
+        cache.set(key, summary, CACHE_TIMEOUT)
+    return summary
+
+
+def build_summary(session_id, athlete_ids=None):
+    results = TestResult.objects.filter(ACTIVE_RESULTS, session_id=session_id)
+    if athlete_ids is not None:
+        results = results.filter(athlete_id__in=athlete_ids)
+    stats = list(
+        results.values('test_id', 'test__name', 'test__category', 'test__unit', 'test__higher_is_better')
+        .annotate(
+            count=Count('id'),
+            mean=Avg('numeric_value'),
+            std=StdDev('numeric_value'),
+            min=Min('numeric_value'),
+            max=Max('numeric_value'),
+        )
+        .order_by('test_id')
+    )
+    if not stats:
+        return []
+
+    rows = list(
+        results.order_by('test_id', 'numeric_value', 'id')
+        .values_list('test_id', 'numeric_value', 'athlete_id', 'athlete__name', 'athlete__username')
+    )
+    test_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((row[1] for row in rows), dtype=float, count=len(rows))
+    # Límites de cada grupo de test en el arreglo ordenado
+    keys = [entry['test_id'] for entry in stats]
+    starts = np.searchsorted(test_ids, keys, side='left').tolist()
+    ends = np.searchsorted(test_ids, keys, side='right').tolist()
+
+    summary = []
+    for entry, start, end in zip(stats, starts, ends):
+        if entry['test__higher_is_better']:
+            top = range(end - 1, max(end - 1 - MAX_TOP, start - 1), -1)
+        else:
+            top = range(start, min(start + MAX_TOP, end))
+        summary.append({
+            'test': entry['test_id'],
+            'test_name': entry['test__name'],
+            'test_category': entry['test__category'],
+            'test_unit': entry['test__unit'],
+            'test_higher_is_better': entry['test__higher_is_better'],
+            'count': entry['count'],
+            'mean': round(float(entry['mean']), 2),
+            'std': round(float(entry['std'] or 0), 2),
+            'min': round(float(entry['min']), 2),
+            'max': round(float(entry['max']), 2),
+            'median': round(float(np.median(values[start:end])), 2) if end > start else None,
+            'top_performers': [
+                {'athlete': rows[i][2], 'name': rows[i][3], 'username': rows[i][4],
+                 'numeric_value': round(float(rows[i][1]), 2)}
+                for i in top
+            ],
+        })
+    return summary
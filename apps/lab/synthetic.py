@@ -0,0 +1,155 @@
+"""
+Generador de datos sintéticos para pruebas de carga y benchmarks.
+
+Crea evaluadores, coaches, atletas repartidos entre las disciplinas, tests en
+todas las categorías, sesiones de evaluación y sus resultados, siempre con
+bulk_create por lotes. Los valores siguen una distribución normal por test con
+un factor de habilidad por atleta y una leve mejora a lo largo del tiempo.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from apps.custom_auth.models import CustomUser
+from .models import EvaluationSession, Test, TestResult
+from .fitness import rebuild_fitness_index
+from .personal_bests import rebuild_personal_bests
+
+BATCH_SIZE = 2000
+PASSWORD = 'synthetic-password'
+
+# (media, desviación estándar, higher_is_better) típicos por unidad
+UNIT_PROFILES = {
+    'seconds': (12.0, 1.5, False),
+    'minutes': (9.0, 1.2, False),
+    'meters': (2200.0, 300.0, True),
+    'centimeters': (45.0, 8.0, True),
+    'kilograms': (80.0, 20.0, True),
+    'repetitions': (30.0, 8.0, True),
+    'score': (50.0, 15.0, True),
+}
+
+
+def _log(stdout, message):
+    if stdout is not None:
+        stdout.write(message)
+
+
+def generate_dataset(coaches=10, athletes=500, tests=12, sessions=40, tests_per_session=6,
+                     years=3, prefix='synthetic', seed=0, batch_size=BATCH_SIZE, stdout=None):
+    """
+    Genera un conjunto de datos completo y devuelve un diccionario con los conteos.
+
+    Cada sesión evalúa `tests_per_session` tests a todos los atletas de su
+    disciplina, por lo que el número de resultados es aproximadamente
+    sessions * tests_per_session * athletes / disciplinas-con-atletas.
+    Los usuarios se crean con el prefijo indicado y la contraseña PASSWORD.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    disciplines = [d for d, _ in CustomUser.DISCIPLINE_CHOICES]
+    categories = [c for c, _ in Test.CATEGORIES]
+    units = list(UNIT_PROFILES)
+
+    with transaction.atomic():
+        evaluator = CustomUser.objects.create(
+            username=f'{prefix}_admin', email=f'{prefix}_admin@example.com', password=password,
+            role='admin', discipline=disciplines[0], is_staff=True,
+        )
+
+        coach_objs = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{prefix}_coach_{i}', email=f'{prefix}_coach_{i}@example.com',
+                name=f'Coach {i}', password=password, role='coach',
+                discipline=disciplines[i % len(disciplines)],
+            )
+            for i in range(coaches)
+        ], batch_size=batch_size)
+        _log(stdout, f'{len(coach_objs)} coaches creados')
+
+        today = date.today()
+        athlete_objs = []
+        for i in range(athletes):
+            coach = coach_objs[i % len(coach_objs)] if coach_objs else None
+            athlete_objs.append(CustomUser(
+                username=f'{prefix}_athlete_{i}', email=f'{prefix}_athlete_{i}@example.com',
+                name=f'Athlete {i}', password=password, role='athlete',
+                discipline=coach.discipline if coach else rng.choice(disciplines),
+                date_of_birth=today - timedelta(days=rng.randint(14 * 365, 35 * 365)),
+                coach=coach,
+            ))
+        athlete_objs = CustomUser.objects.bulk_create(athlete_objs, batch_size=batch_size)
+        _log(stdout, f'{len(athlete_objs)} atletas creados')
+
+        test_objs = []
+        for i in range(tests):
+            unit = units[i % len(units)]
+            test_objs.append(Test(
+                name=f'{prefix} test {i}', category=categories[i % len(categories)],
+                description='Test sintético', unit=unit,
+                higher_is_better=UNIT_PROFILES[unit][2],
+            ))
+        test_objs = Test.objects.bulk_create(test_objs, batch_size=batch_size)
+        _log(stdout, f'{len(test_objs)} tests creados')
+
+        by_discipline = {}
+        for athlete in athlete_objs:
+            by_discipline.setdefault(athlete.discipline, []).append(athlete)
+        active = sorted(by_discipline) or disciplines[:1]
+
+        start = today - timedelta(days=365 * years)
+        session_objs = EvaluationSession.objects.bulk_create([
+            EvaluationSession(
+                date=start + timedelta(days=rng.randint(0, 365 * years)),
+                location=f'Sede {rng.randint(1, 5)}',
+                discipline=active[i % len(active)],
+                evaluator=evaluator,
+            )
+            for i in range(sessions)
+        ], batch_size=batch_size)
+        _log(stdout, f'{len(session_objs)} sesiones creadas')
+
+        ability = {athlete.id: rng.gauss(0, 1) for athlete in athlete_objs}
+        total = 0
+        batch = []
+        for session in session_objs:
+            progress = (session.date - start).days / (365 * years or 1)
+            for test in rng.sample(test_objs, min(tests_per_session, len(test_objs))):
+                mean, sd, higher = UNIT_PROFILES[test.unit]
+                direction = 1 if higher else -1
+                for athlete in by_discipline.get(session.discipline, []):
+                    value = mean + direction * sd * (0.6 * ability[athlete.id] + 0.3 * progress)
+                    value += rng.gauss(0, sd * 0.4)
+                    batch.append(TestResult(
+                        athlete_id=athlete.id, test_id=test.id, session_id=session.id,
+                        numeric_value=round(max(value, 0.01), 2),
+                    ))
+            if len(batch) >= batch_size:
+                total += _flush(batch, batch_size)
+                batch = []
+        total += _flush(batch, batch_size)
+
+        # date_recorded es auto_now_add: se ajusta a la fecha de cada sesión
+        for session in session_objs:
+            recorded = timezone.make_aware(datetime.combine(session.date, time(10)))
+            TestResult.objects.filter(session_id=session.id).update(date_recorded=recorded)
+        _log(stdout, f'{total} resultados creados')
+
+        rebuild_personal_bests(test_ids=[t.id for t in test_objs])
+        rebuild_fitness_index()
+
+    return {
+        'coaches': len(coach_objs),
+        'athletes': len(athlete_objs),
+        'tests': len(test_objs),
+        'sessions': len(session_objs),
+        'results': total,
+    }
+
+
+def _flush(batch, batch_size):
+    TestResult.objects.bulk_create(batch, batch_size=batch_size)
+    return len(batch)
@@ -1,3 +1,750 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.custom_auth.models import CustomUser
+from . import fitness, ingestion, personal_bests, purge, trends
+from .export import HEADER, export_queryset
+from .ingestion import SheetError, ingest_sheet, parse_csv, validate_rows
+from .models import CohortStatistic, EvaluationSession, PersonalBest, PurgeJob, Test, TestResult
+from .rankings import cohort_percentiles
+from .result_filters import MAX_LIMIT, FilterError, filter_results
+from .signals import test_results_bulk_created
+from .summaries import session_summary
+
+
+class WelfordSummaryTests(SimpleTestCase):
+    """merge y subtract deben coincidir con la varianza calculada por NumPy sobre los valores."""
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.left = rng.normal(50, 12, 137).tolist()
+        self.right = rng.normal(65, 3, 41).tolist()
+
+    def assertSummary(self, summary, values):
+        count, mean, m2 = summary
+        self.assertEqual(count, len(values))
+        self.assertAlmostEqual(mean, float(np.mean(values)), places=9)
+        self.assertAlmostEqual(m2 / count, float(np.var(values)), places=9)
+
+    def test_merge_matches_numpy(self):
+        merged = fitness.merge(fitness.summarize(self.left), fitness.summarize(self.right))
+        self.assertSummary(merged, self.left + self.right)
+
+    def test_merge_one_value_at_a_time(self):
+        total = (0, 0.0, 0.0)
+        for value in self.left:
+            total = fitness.merge(total, fitness.summarize([value]))
+        self.assertSummary(total, self.left)
+
+    def test_merge_with_empty_summary(self):
+        summary = fitness.summarize(self.left)
+        self.assertEqual(fitness.merge((0, 0.0, 0.0), summary), summary)
+        self.assertEqual(fitness.merge((0, 0.0, 0.0), (0, 0.0, 0.0)), (0, 0.0, 0.0))
+
+    def test_subtract_matches_numpy(self):
+        total = fitness.summarize(self.left + self.right)
+        self.assertSummary(fitness.subtract(total, fitness.summarize(self.right)), self.left)
+
+    def test_subtract_one_value_at_a_time(self):
+        total = fitness.summarize(self.left)
+        for index in range(len(self.left) - 1, 9, -1):
+            total = fitness.subtract(total, fitness.summarize([self.left[index]]))
+        self.assertSummary(total, self.left[:10])
+
+    def test_subtract_everything_returns_empty_summary(self):
+        summary = fitness.summarize(self.left)
+        self.assertEqual(fitness.subtract(summary, summary), (0, 0.0, 0.0))
+
+    def test_subtract_never_returns_negative_m2(self):
+        values = [1e9 + 0.1] * 3
+        total = fitness.summarize(values)
+        _, _, m2 = fitness.subtract(total, fitness.summarize(values[:2]))
+        self.assertGreaterEqual(m2, 0.0)
+
+
+class SoftDeletePurgeTests(TestCase):
+    """Un usuario o test marcado desaparece de los reportes y la purga deja el estado como una reconstrucción."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.evaluator = CustomUser.objects.create(username='evaluator', role='admin', discipline='athletics')
+        cls.athletes = [
+            CustomUser.objects.create(
+                username=f'athlete{i}', name=f'Athlete {i}', role='athlete', discipline='athletics',
+                coach=cls.coach, date_of_birth=date(2000 + i, 1, 1),
+            )
+            for i in range(3)
+        ]
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.jump = Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+        cls.sessions = [
+            EvaluationSession.objects.create(
+                date=date(2024, month, 1), location='Pista', discipline='athletics', evaluator=cls.evaluator
+            )
+            for month in (1, 2)
+        ]
+        for i, athlete in enumerate(cls.athletes):
+            for j, session in enumerate(cls.sessions):
+                TestResult.objects.create(
+                    athlete=athlete, test=cls.sprint, session=session, numeric_value=12 - i + j
+                )
+                TestResult.objects.create(
+                    athlete=athlete, test=cls.jump, session=session, numeric_value=200 + 10 * i - j
+                )
+
+    def snapshot(self):
+        # Los FitnessScore del resto de la cohorte no se recalculan al cambiar sus
+        # estadísticas (ver apps.lab.fitness), así que no se comparan
+        return (
+            sorted(PersonalBest.objects.values_list('athlete_id', 'test_id', 'result_id')),
+            sorted(
+                (test_id, discipline, count, round(mean, 6), round(m2, 6))
+                for test_id, discipline, count, mean, m2
+                in CohortStatistic.objects.values_list('test_id', 'discipline', 'count', 'mean', 'm2')
+            ),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        personal_bests.rebuild_personal_bests()
+        fitness.rebuild_fitness_index()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_soft_deleted_athlete_is_hidden_from_reports(self):
+        athlete = self.athletes[0]
+        purge.soft_delete_user(athlete)
+
+        ranked = {row['athlete'] for row in cohort_percentiles(self.sprint, 'athletics')}
+        self.assertEqual(ranked, {self.athletes[1].id, self.athletes[2].id})
+        self.assertEqual([entry['count'] for entry in session_summary(self.sessions[0].id)], [2, 2])
+        self.assertNotIn(athlete.id, {row[13] for row in export_queryset()})
+
+    def test_soft_deleted_test_is_hidden_from_reports(self):
+        purge.soft_delete_test(self.jump)
+
+        self.assertEqual([entry['test'] for entry in session_summary(self.sessions[0].id)], [self.sprint.id])
+        self.assertEqual({row[4] for row in export_queryset()}, {self.sprint.id})
+
+    def test_soft_deleted_test_is_hidden_from_dashboard(self):
+        purge.soft_delete_test(self.jump)
+        client = APIClient()
+        client.force_authenticate(self.evaluator)
+        athlete = self.athletes[0]
+
+        response = client.get(reverse('test_results', args=(athlete.id,)))
+        self.assertEqual({row['test'] for row in response.data['test_results']}, {self.sprint.id})
+        for url in (
+            reverse('personal_bests', args=(athlete.id,)),
+            reverse('coach_personal_bests', args=(self.coach.id,)),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual({row['test'] for row in response.data['personal_bests']}, {self.sprint.id})
+        response = client.get(reverse('coach_roster', args=(self.coach.id,)))
+        for entry in response.data['athletes']:
+            self.assertEqual({row['test'] for row in entry['latest_results']}, {self.sprint.id})
+
+    def test_user_purge_matches_rebuild(self):
+        athlete = self.athletes[0]
+        job = purge.run_job(purge.soft_delete_user(athlete).id, batch_size=3)
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.deleted, job.total)
+        self.assertFalse(CustomUser.all_objects.filter(id=athlete.id).exists())
+        self.assertFalse(TestResult.objects.filter(athlete_id=athlete.id).exists())
+        self.assertMatchesRebuild()
+
+    def test_evaluator_purge_removes_their_sessions(self):
+        job = purge.run_job(purge.soft_delete_user(self.evaluator).id, batch_size=5)
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.deleted, 12)
+        self.assertFalse(EvaluationSession.objects.exists())
+        self.assertFalse(TestResult.objects.exists())
+        self.assertMatchesRebuild()
+
+    def test_test_purge_matches_rebuild(self):
+        job = purge.run_job(purge.soft_delete_test(self.jump).id)
+
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(Test.all_objects.filter(id=self.jump.id).exists())
+        self.assertEqual(set(TestResult.objects.values_list('test_id', flat=True)), {self.sprint.id})
+        self.assertMatchesRebuild()
+
+    def test_interrupted_job_is_resumed(self):
+        job = purge.soft_delete_user(self.athletes[1])
+        PurgeJob.objects.filter(id=job.id).update(status='running')
+
+        [resumed] = purge.resume_jobs()
+
+        self.assertEqual(resumed.status, 'done')
+        self.assertFalse(CustomUser.all_objects.filter(id=self.athletes[1].id).exists())
+        self.assertMatchesRebuild()
+
+
+class FilterResultsTests(TestCase):
+    """filter_results traduce los parámetros a filtros, orden y límite, y rechaza los inválidos con FilterError."""
+
+    @classmethod
+    def setUpTestData(cls):
+        coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.athlete = CustomUser.objects.create(
+            username='athlete', role='athlete', discipline='athletics', coach=coach
+        )
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.jump = Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+        cls.track = EvaluationSession.objects.create(
+            date=date(2024, 3, 1), location='Pista', discipline='athletics', evaluator=coach
+        )
+        cls.pool = EvaluationSession.objects.create(
+            date=date(2024, 4, 1), location='Piscina', discipline='swimming', evaluator=coach
+        )
+        cls.results = {}
+        for name, test, session, value, recorded in (
+            ('sprint_march', cls.sprint, cls.track, 12, datetime(2024, 3, 1, 23, 59, tzinfo=timezone.utc)),
+            ('jump_march', cls.jump, cls.track, 210, datetime(2024, 3, 2, 0, 0, tzinfo=timezone.utc)),
+            ('sprint_april', cls.sprint, cls.pool, 11, datetime(2024, 4, 1, 10, 0, tzinfo=timezone.utc)),
+        ):
+            result = TestResult.objects.create(athlete=cls.athlete, test=test, session=session, numeric_value=value)
+            TestResult.objects.filter(id=result.id).update(date_recorded=recorded)
+            cls.results[name] = result.id
+
+    def ids(self, **params):
+        return list(filter_results(TestResult.objects.all(), params).values_list('id', flat=True))
+
+    def expected(self, *names):
+        return [self.results[name] for name in names]
+
+    def test_date_recorded_range_is_inclusive_by_day(self):
+        self.assertEqual(self.ids(date_from='2024-03-01', date_to='2024-03-01'), self.expected('sprint_march'))
+        self.assertEqual(self.ids(date_from='2024-03-02'), self.expected('jump_march', 'sprint_april'))
+
+    def test_session_date_range(self):
+        self.assertEqual(
+            self.ids(date_field='session_date', date_to='2024-03-01'), self.expected('sprint_march', 'jump_march')
+        )
+
+    def test_test_category_session_and_discipline(self):
+        self.assertEqual(self.ids(test=f'{self.jump.id}'), self.expected('jump_march'))
+        self.assertEqual(
+            self.ids(test=f'{self.sprint.id},{self.jump.id}', category='speed'),
+            self.expected('sprint_march', 'sprint_april'),
+        )
+        self.assertEqual(self.ids(session=str(self.pool.id)), self.expected('sprint_april'))
+        self.assertEqual(self.ids(discipline='athletics'), self.expected('sprint_march', 'jump_march'))
+
+    def test_ordering_and_limit(self):
+        self.assertEqual(
+            self.ids(ordering='-numeric_value'), self.expected('jump_march', 'sprint_march', 'sprint_april')
+        )
+        self.assertEqual(self.ids(ordering='-date_recorded', limit='2'), self.expected('sprint_april', 'jump_march'))
+
+    def test_invalid_parameters_raise_filter_error(self):
+        invalid = (
+            {'date_from': '2024-02-30'},
+            {'date_to': '2024-13-01'},
+            {'date_from': '2024-3-1'},
+            {'date_from': '2024-03-02', 'date_to': '2024-03-01'},
+            {'date_field': 'created'},
+            {'test': '1,x'},
+            {'test': '²'},
+            {'test': ','.join(['1'] * 51)},
+            {'category': 'magic'},
+            {'session': '²'},
+            {'discipline': 'chess'},
+            {'ordering': 'name'},
+            {'limit': '0'},
+            {'limit': str(MAX_LIMIT + 1)},
+            {'limit': '²'},
+        )
+        for params in invalid:
+            with self.subTest(params=params), self.assertRaises(FilterError):
+                filter_results(TestResult.objects.all(), params)
+
+
+class CatalogCacheTests(TestCase):
+    """El catálogo se sirve de la caché local por versión y un 304 solo lee la versión compartida."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_not_modified_reads_only_the_version(self):
+        etag = self.client.get(reverse('view_tests'))['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('view_tests'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        etag = self.client.get(reverse('view_test', args=(self.sprint.id,)))['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('view_test', args=(self.sprint.id,)), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_the_catalog(self):
+        etag = self.client.get(reverse('view_tests'))['ETag']
+        Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+
+        response = self.client.get(reverse('view_tests'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([test['name'] for test in response.data['tests']], ['Sprint', 'Jump'])
+        self.assertEqual(self.client.get(reverse('view_test', args=(9999,))).status_code, 404)
+
+
+class BulkIngestionTests(TestCase):
+    """La carga masiva acepta planillas CSV largas y anchas y rechaza las inválidas sin escribir nada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.ana = CustomUser.objects.create(username='ana', role='athlete', discipline='athletics', coach=coach)
+        # Un username formado solo por dígitos sigue siendo un username
+        cls.numeric = CustomUser.objects.create(
+            username=str(cls.ana.id), role='athlete', discipline='athletics', coach=coach
+        )
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.jump = Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+        cls.session = EvaluationSession.objects.create(
+            date=date(2024, 5, 1), location='Pista', discipline='athletics', evaluator=cls.admin
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post_csv(self, text):
+        url = reverse('bulk_test_results') + f'?session={self.session.id}'
+        return self.client.generic('POST', url, text.encode(), content_type='text/csv')
+
+    def stored(self):
+        return sorted(
+            TestResult.objects.filter(session=self.session)
+            .values_list('athlete__username', 'test__name', 'numeric_value')
+        )
+
+    def test_long_and_wide_csv_rows(self):
+        self.assertEqual(parse_csv('athlete,test,numeric_value\nana,Sprint,"11,5"\n'), [
+            {'athlete': 'ana', 'athlete_id': None, 'test': 'Sprint', 'numeric_value': '11,5', 'notes': ''},
+        ])
+        self.assertEqual(parse_csv(f'athlete_id,Sprint,{self.jump.id},notes\n7,11.5,,lluvia\n'), [
+            {'athlete': None, 'athlete_id': '7', 'test': 'Sprint', 'numeric_value': '11.5', 'notes': 'lluvia'},
+        ])
+        with self.assertRaises(SheetError):
+            parse_csv('name,Sprint\nana,11\n')
+        with self.assertRaises(SheetError):
+            parse_csv('athlete\nana\n')
+
+    def test_wide_csv_is_inserted(self):
+        response = self.post_csv(f'athlete,Sprint,{self.jump.id}\nana,"11,5",210\n{self.numeric.username},12,\n')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(self.stored(), [
+            (self.numeric.username, 'Sprint', Decimal('12.00')),
+            ('ana', 'Jump', Decimal('210.00')),
+            ('ana', 'Sprint', Decimal('11.50')),
+        ])
+
+    def test_athletes_by_id_and_by_username(self):
+        results, errors = validate_rows(self.session, [
+            {'athlete_id': self.ana.id, 'test': 'sprint', 'numeric_value': 11},
+            {'athlete': self.numeric.username, 'test': self.jump.id, 'numeric_value': 200},
+            {'athlete_id': 'ana', 'test': 'Sprint', 'numeric_value': 11},
+            {'athlete': 'nadie', 'test': 'Salto', 'numeric_value': 'x'},
+        ])
+
+        self.assertEqual(
+            [(result.athlete_id, result.test_id) for result in results],
+            [(self.ana.id, self.sprint.id), (self.numeric.id, self.jump.id)],
+        )
+        self.assertEqual(errors, [
+            {'row': 3, 'errors': ['Atleta no encontrado: ana']},
+            {'row': 4, 'errors': ['Atleta no encontrado: nadie', 'Test no encontrado: Salto',
+                                  'Valor numérico inválido: x']},
+        ])
+
+    def test_invalid_rows_write_nothing(self):
+        response = self.post_csv('athlete,test,numeric_value\nana,Sprint,11\nana,Sprint,12\n')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [{'row': 2, 'errors': ['Resultado duplicado en la planilla']}])
+        self.assertEqual(self.stored(), [])
+
+    def test_invalid_bodies_are_rejected(self):
+        url = reverse('bulk_test_results')
+        response = self.client.post(url, [{'athlete': 'ana'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'session': {'location': 'Pista'}, 'results': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.data['message'])
+        response = self.client.post(url, {'session': 9999, 'results': []}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_concurrent_insert_is_reported_as_conflict(self):
+        rows = [{'athlete': 'ana', 'test': 'Sprint', 'numeric_value': 11}]
+        original = ingestion.validate_rows
+
+        def validate_then_insert(session, rows):
+            validated = original(session, rows)
+            if not TestResult.objects.filter(session=session).exists():
+                # Otra carga inserta el mismo resultado entre la validación y la inserción
+                TestResult.objects.create(athlete=self.ana, test=self.sprint, session=session, numeric_value=12)
+            return validated
+
+        with mock.patch.object(ingestion, 'validate_rows', validate_then_insert):
+            results, errors = ingest_sheet(self.session, rows)
+
+        self.assertEqual(results, [])
+        self.assertEqual(errors, [{'row': 1, 'errors': ['Ya existe un resultado para este atleta y test en la sesión']}])
+        self.assertEqual(self.stored(), [('ana', 'Sprint', Decimal('12.00'))])
+
+
+class PersonalBestSignalTests(TestCase):
+    """Las señales de TestResult y Test mantienen la mejor marca de cada atleta igual que una reconstrucción."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.ana, cls.bea = [
+            CustomUser.objects.create(username=name, role='athlete', discipline='athletics', coach=coach)
+            for name in ('ana', 'bea')
+        ]
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.sessions = [
+            EvaluationSession.objects.create(
+                date=date(2024, month, 1), location='Pista', discipline='athletics', evaluator=cls.admin
+            )
+            for month in (1, 2, 3)
+        ]
+
+    def result(self, athlete, value, session=0):
+        return TestResult.objects.create(
+            athlete=athlete, test=self.sprint, session=self.sessions[session], numeric_value=value
+        )
+
+    def bests(self):
+        return dict(
+            ((athlete, test), (result, value))
+            for athlete, test, result, value
+            in PersonalBest.objects.values_list('athlete_id', 'test_id', 'result_id', 'numeric_value')
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.bests()
+        personal_bests.rebuild_personal_bests()
+        self.assertEqual(incremental, self.bests())
+
+    def test_new_results_keep_the_best(self):
+        first = self.result(self.ana, '12.40')
+        self.result(self.ana, '12.90', session=1)
+        self.assertEqual(self.bests(), {(self.ana.id, self.sprint.id): (first.id, Decimal('12.40'))})
+
+        better = self.result(self.ana, '11.80', session=2)
+        self.assertEqual(self.bests(), {(self.ana.id, self.sprint.id): (better.id, Decimal('11.80'))})
+        self.assertMatchesRebuild()
+
+    def test_bulk_created_results(self):
+        results = TestResult.objects.bulk_create([
+            TestResult(athlete=self.ana, test=self.sprint, session=self.sessions[0], numeric_value='12.10'),
+            TestResult(athlete=self.ana, test=self.sprint, session=self.sessions[1], numeric_value='11.90'),
+            TestResult(athlete=self.bea, test=self.sprint, session=self.sessions[0], numeric_value='13.00'),
+        ])
+        test_results_bulk_created.send(sender=TestResult, results=results)
+
+        self.assertEqual(self.bests()[(self.ana.id, self.sprint.id)], (results[1].id, Decimal('11.90')))
+        self.assertMatchesRebuild()
+
+    def test_updates_and_deletes_recompute_the_best(self):
+        best = self.result(self.ana, '11.50')
+        other = self.result(self.ana, '12.00', session=1)
+
+        best.numeric_value = '12.50'
+        best.save()
+        self.assertEqual(self.bests()[(self.ana.id, self.sprint.id)], (other.id, Decimal('12.00')))
+
+        other.athlete = self.bea
+        other.save()
+        self.assertEqual(self.bests(), {
+            (self.ana.id, self.sprint.id): (best.id, Decimal('12.50')),
+            (self.bea.id, self.sprint.id): (other.id, Decimal('12.00')),
+        })
+
+        best.delete()
+        self.assertNotIn((self.ana.id, self.sprint.id), self.bests())
+        self.assertMatchesRebuild()
+
+    def test_direction_change_and_cascades(self):
+        self.result(self.ana, '11.50')
+        slow = self.result(self.ana, '12.50', session=1)
+        self.result(self.bea, '13.00', session=1)
+
+        self.sprint.higher_is_better = True
+        self.sprint.save()
+        self.assertEqual(self.bests()[(self.ana.id, self.sprint.id)], (slow.id, Decimal('12.50')))
+
+        self.sessions[1].delete()
+        self.assertEqual(list(self.bests()), [(self.ana.id, self.sprint.id)])
+        self.assertMatchesRebuild()
+
+
+class ExportTests(TestCase):
+    """La exportación filtra por sesión y test y codifica las filas en CSV o NDJSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.athlete = CustomUser.objects.create(
+            username='ana', name='Ana Núñez', role='athlete', discipline='athletics', coach=cls.coach,
+            date_of_birth=date(2005, 6, 1),
+        )
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.jump = Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+        cls.track = EvaluationSession.objects.create(
+            date=date(2024, 3, 1), location='Pista', discipline='athletics', evaluator=cls.admin
+        )
+        cls.pool = EvaluationSession.objects.create(
+            date=date(2024, 4, 1), location='Piscina', discipline='swimming', evaluator=cls.admin
+        )
+        cls.sprint_result = TestResult.objects.create(
+            athlete=cls.athlete, test=cls.sprint, session=cls.track, numeric_value='11.50', notes='viento, a favor'
+        )
+        cls.jump_result = TestResult.objects.create(
+            athlete=cls.athlete, test=cls.jump, session=cls.pool, numeric_value=210
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_test_results'), params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def ids(self, **filters):
+        return [row[0] for row in export_queryset(**filters)]
+
+    def test_filters(self):
+        self.assertEqual(self.ids(), [self.sprint_result.id, self.jump_result.id])
+        self.assertEqual(self.ids(discipline='swimming'), [self.jump_result.id])
+        self.assertEqual(self.ids(category='speed'), [self.sprint_result.id])
+        self.assertEqual(self.ids(date_from=date(2024, 3, 2)), [self.jump_result.id])
+        self.assertEqual(self.ids(date_to=date(2024, 3, 1)), [self.sprint_result.id])
+
+    def test_csv(self):
+        response, content = self.export(category='speed')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], HEADER)
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(HEADER, rows[1]))
+        self.assertEqual(row['numeric_value'], '11.50')
+        self.assertEqual(row['notes'], 'viento, a favor')
+        self.assertEqual(row['session_date'], '2024-03-01')
+        self.assertEqual(row['athlete_name'], 'Ana Núñez')
+
+    def test_ndjson(self):
+        response, content = self.export(export_format='ndjson', discipline='swimming')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['result_id'], self.jump_result.id)
+        self.assertEqual(rows[0]['numeric_value'], '210.00')
+        self.assertEqual(rows[0]['athlete_date_of_birth'], '2005-06-01')
+        self.assertEqual(rows[0]['athlete_coach_id'], self.coach.id)
+
+    def test_invalid_parameters_and_permissions(self):
+        for params in (
+            {'export_format': 'xml'}, {'discipline': 'chess'}, {'category': 'luck'},
+            {'date_from': '2024-02-30'}, {'date_to': '2024-3-1'},
+        ):
+            response = self.client.get(reverse('export_test_results'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+        self.client.force_authenticate(self.coach)
+        self.assertEqual(self.client.get(reverse('export_test_results')).status_code, 403)
+
+
+class TrendTests(TestCase):
+    """La tendencia agrupa los resultados por periodo, calcula la media móvil y reduce la serie con LTTB."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        cls.athlete = CustomUser.objects.create(
+            username='athlete', role='athlete', discipline='athletics', coach=coach
+        )
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        for value, recorded in (
+            (12, datetime(2023, 12, 20, tzinfo=timezone.utc)),
+            (11, datetime(2024, 1, 3, tzinfo=timezone.utc)),
+            (13, datetime(2024, 1, 25, tzinfo=timezone.utc)),
+            (10, datetime(2024, 3, 5, tzinfo=timezone.utc)),
+        ):
+            session = EvaluationSession.objects.create(
+                date=recorded.date(), location='Pista', discipline='athletics', evaluator=cls.admin
+            )
+            result = TestResult.objects.create(
+                athlete=cls.athlete, test=cls.sprint, session=session, numeric_value=value
+            )
+            TestResult.objects.filter(id=result.id).update(date_recorded=recorded)
+
+    def series(self, bucket, **settings):
+        with self.settings(**settings):
+            return [
+                (point['start'], point['count'], point['min'], point['max'], point['mean'])
+                for point in trends.bucketed_series(self.athlete.id, self.sprint.id, bucket)
+            ]
+
+    def test_buckets(self):
+        self.assertEqual(self.series('month'), [
+            (date(2023, 12, 1), 1, 12.0, 12.0, 12.0),
+            (date(2024, 1, 1), 2, 11.0, 13.0, 12.0),
+            (date(2024, 3, 1), 1, 10.0, 10.0, 10.0),
+        ])
+        self.assertEqual([point[0] for point in self.series('week')], [
+            date(2023, 12, 18), date(2024, 1, 1), date(2024, 1, 22), date(2024, 3, 4),
+        ])
+        self.assertEqual(self.series('season'), [
+            (date(2023, 1, 1), 1, 12.0, 12.0, 12.0),
+            (date(2024, 1, 1), 3, 10.0, 13.0, 34 / 3),
+        ])
+        self.assertEqual(self.series('season', SEASON_START_MONTH=9), [
+            (date(2023, 9, 1), 4, 10.0, 13.0, 11.5),
+        ])
+        self.assertEqual([point[1:] for point in self.series('none')], [
+            (1, 12.0, 12.0, 12.0), (1, 11.0, 11.0, 11.0), (1, 13.0, 13.0, 13.0), (1, 10.0, 10.0, 10.0),
+        ])
+
+    def test_rolling_mean_and_lttb(self):
+        np.testing.assert_allclose(trends.rolling_mean([2, 4, 6, 8], 2), [2, 3, 5, 7])
+
+        y = [0, 1, 0, 9, 0, 1, 0, 1, 0, 1]
+        indices = trends.lttb_indices(list(range(10)), y, 4)
+        self.assertEqual(len(indices), 4)
+        self.assertEqual((indices[0], indices[-1]), (0, 9))
+        self.assertIn(3, indices)
+        self.assertEqual(list(trends.lttb_indices(range(3), [1, 2, 3], 5)), [0, 1, 2])
+
+    def test_view(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = reverse('athlete_trend', args=(self.athlete.id, self.sprint.id))
+
+        response = client.get(url, {'bucket': 'none', 'rolling': 2, 'max_points': 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['total_points'], response.data['downsampled']), (4, True))
+        self.assertEqual([point['mean'] for point in response.data['points']], [12.0, 13.0, 10.0])
+        self.assertEqual([point['rolling_mean'] for point in response.data['points']], [12.0, 12.0, 11.5])
+        for params in ({'bucket': 'year'}, {'rolling': '0'}, {'rolling': '²'}, {'max_points': '2'}):
+            self.assertEqual(client.get(url, params).status_code, 400, params)
+        self.assertEqual(client.get(reverse('athlete_trend', args=(self.athlete.id, 9999))).status_code, 404)
+
+
+class SessionSummaryTests(TestCase):
+    """El resumen de una sesión calcula las estadísticas por test y se invalida cuando cambian sus datos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', discipline='athletics')
+        cls.coach = CustomUser.objects.create(username='coach', role='coach', discipline='athletics')
+        other_coach = CustomUser.objects.create(username='other_coach', role='coach', discipline='athletics')
+        cls.athletes = [
+            CustomUser.objects.create(
+                username=f'athlete{i}', name=f'Athlete {i}', role='athlete', discipline='athletics',
+                coach=cls.coach if i < 3 else other_coach,
+            )
+            for i in range(4)
+        ]
+        cls.sprint = Test.objects.create(
+            name='Sprint', category='speed', unit='seconds', description='', higher_is_better=False
+        )
+        cls.jump = Test.objects.create(name='Jump', category='strength', unit='centimeters', description='')
+        cls.session = EvaluationSession.objects.create(
+            date=date(2024, 5, 1), location='Pista', discipline='athletics', evaluator=cls.admin
+        )
+        for athlete, sprint in zip(cls.athletes, (12, 11, 14, 10)):
+            TestResult.objects.create(athlete=athlete, test=cls.sprint, session=cls.session, numeric_value=sprint)
+        TestResult.objects.create(athlete=cls.athletes[0], test=cls.jump, session=cls.session, numeric_value=200)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def summary(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('session_summary', args=(self.session.id,)), params)
+
+    def test_statistics_and_top_performers(self):
+        sprint, jump = session_summary(self.session.id)
+
+        values = np.array([12, 11, 14, 10])
+        self.assertEqual((sprint['test'], sprint['count']), (self.sprint.id, 4))
+        self.assertEqual((sprint['min'], sprint['max'], sprint['median']), (10.0, 14.0, 11.5))
+        self.assertEqual((sprint['mean'], sprint['std']), (round(values.mean(), 2), round(values.std(), 2)))
+        self.assertEqual(
+            [(p['username'], p['numeric_value']) for p in sprint['top_performers']],
+            [('athlete3', 10.0), ('athlete1', 11.0), ('athlete0', 12.0), ('athlete2', 14.0)],
+        )
+        self.assertEqual((jump['count'], jump['std'], jump['median']), (1, 0.0, 200.0))
+
+    def test_coaches_see_only_their_athletes(self):
+        response = self.summary(self.coach, top=1)
+
+        self.assertEqual(response.status_code, 200)
+        sprint = response.data['tests'][0]
+        self.assertEqual((sprint['count'], sprint['min']), (3, 11.0))
+        self.assertEqual([p['username'] for p in sprint['top_performers']], ['athlete1'])
+
+        self.assertEqual(len(self.summary(self.admin).data['tests'][0]['top_performers']), 3)
+        self.assertEqual(self.summary(self.athletes[0]).status_code, 403)
+        self.assertEqual(self.summary(self.admin, top=11).status_code, 400)
+
+    def test_changes_invalidate_the_summary(self):
+        session_summary(self.session.id)
+        TestResult.objects.filter(athlete=self.athletes[1], test=self.sprint).get().delete()
+        self.assertEqual(session_summary(self.session.id)[0]['count'], 3)
+
+        athlete = self.athletes[3]
+        athlete.name = 'Renamed'
+        athlete.save()
+        self.assertEqual(session_summary(self.session.id)[0]['top_performers'][0]['name'], 'Renamed')
+
+        self.jump.name = 'Long jump'
+        self.jump.save()
+        self.assertEqual(session_summary(self.session.id)[1]['test_name'], 'Long jump')
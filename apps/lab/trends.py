@@ -0,0 +1,159 @@
+"""
+Series temporales de resultados por atleta y test.
+
+Los resultados se agrupan en la base de datos por semana o mes (TruncWeek /
+TruncMonth con Min, Max, Avg y Count); las temporadas se obtienen fusionando los
+meses en Python. Sobre la serie agrupada se calcula opcionalmente una media móvil
+y, si tiene más puntos que los pedidos, se reduce con LTTB (Largest-Triangle-
+Three-Buckets), que conserva la forma visual de la curva con un número acotado
+de puntos.
+"""
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import TestResult
+
+BUCKETS = ('week', 'month', 'season', 'none')
+DEFAULT_BUCKET = 'month'
+DEFAULT_MAX_POINTS = 200
+MAX_POINTS_LIMIT = 5000
+MIN_POINTS = 3
+
+# Mes en que empieza la temporada (1 = la temporada coincide con el año calendario)
+DEFAULT_SEASON_START_MONTH = 1
+
+
+def _as_date(value):
+    return value.date() if hasattr(value, 'date') else value
+
+
+def season_start(day, start_month=None):
+    """Primer día de la temporada a la que pertenece `day`."""
+    start_month = start_month or getattr(settings, 'SEASON_START_MONTH', DEFAULT_SEASON_START_MONTH)
+    year = day.year if day.month >= start_month else day.year - 1
+    return date(year, start_month, 1)
+
+
+def bucketed_series(athlete_id, test_id, bucket=DEFAULT_BUCKET):
+    """
+    Devuelve la serie de (athlete, test) como lista de diccionarios ordenados por
+    fecha con start, count, min, max y mean. Con bucket='none' cada resultado es un
+    punto.
+    """
+    results = TestResult.objects.filter(athlete_id=athlete_id, test_id=test_id)
+
+    if bucket == 'none':
+        rows = results.order_by('date_recorded', 'id').values_list('date_recorded', 'numeric_value')
+        return [
+            {'start': _as_date(recorded), 'count': 1,
+             'min': float(value), 'max': float(value), 'mean': float(value)}
+            for recorded, value in rows
+        ]
+
+    trunc = TruncWeek if bucket == 'week' else TruncMonth
+    rows = (
+        results.annotate(bucket=trunc('date_recorded'))
+        .values('bucket')
+        .annotate(
+            count=Count('id'),
+            min=Min('numeric_value'),
+            max=Max('numeric_value'),
+            mean=Avg('numeric_value'),
+        )
+        .order_by('bucket')
+    )
+    series = [
+        {'start': _as_date(row['bucket']), 'count': row['count'],
+         'min': float(row['min']), 'max': float(row['max']), 'mean': float(row['mean'])}
+        for row in rows
+    ]
+    return _merge_seasons(series) if bucket == 'season' else series
+
+
+def _merge_seasons(months):
+    seasons = []
+    for month in months:
+        start = season_start(month['start'])
+        if seasons and seasons[-1]['start'] == start:
+            current = seasons[-1]
+            total = current['count'] + month['count']
+            current['mean'] = (current['mean'] * current['count'] + month['mean'] * month['count']) / total
+            current['count'] = total
+            current['min'] = min(current['min'], month['min'])
+            current['max'] = max(current['max'], month['max'])
+        else:
+            seasons.append(dict(month, start=start))
+    return seasons
+
+
+def rolling_mean(values, window):
+    """Media móvil hacia atrás; los primeros puntos usan una ventana parcial."""
+    values = np.asarray(values, dtype=float)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, 0)
+    return (sums[end] - sums[begin]) / (end - begin)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Índices de los puntos que conserva LTTB para reducir (x, y) a `threshold`
+    puntos. Siempre se conservan el primero y el último.
+    """
+    n = len(x)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Promedio del siguiente grupo, usado como tercer vértice del triángulo
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.asarray(selected)
+
+
+def trend(athlete_id, test_id, bucket=DEFAULT_BUCKET, rolling=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    Serie agrupada de (athlete, test) con media móvil opcional (`rolling`, en número
+    de grupos) reducida a lo sumo a `max_points` puntos. Retorna (points, total),
+    donde total es el número de puntos antes de reducir.
+    """
+    series = bucketed_series(athlete_id, test_id, bucket)
+    total = len(series)
+    if not series:
+        return [], 0
+
+    means = [point['mean'] for point in series]
+    if rolling:
+        for point, value in zip(series, rolling_mean(means, rolling)):
+            point['rolling_mean'] = float(value)
+
+    if total > max_points:
+        x = [point['start'].toordinal() for point in series]
+        series = [series[i] for i in lttb_indices(x, means, max_points)]
+
+    for point in series:
+        for key in ('min', 'max', 'mean', 'rolling_mean'):
+            if key in point:
+                point[key] = round(point[key], 2)
+    return series, total
@@ -7,4 +7,8 @@ urlpatterns = [
     path('delete/<int:test_id>/', views.deleteTest, name='delete_test'),
     path('update/<int:test_id>/', views.updateTest, name='update_test'),
     path('view/<int:test_id>/', views.viewTest, name='view_test'),
+    path('results/bulk/', views.bulkTestResults, name='bulk_test_results'),
+    path('results/export/', views.exportTestResults, name='export_test_results'),
+    path('sessions/<int:session_id>/summary/', views.sessionSummary, name='session_summary'),
+    path('purges/<int:job_id>/', views.purgeStatus, name='purge_status'),
 ]
\ No newline at end of file
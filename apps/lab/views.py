@@ -3,10 +3,20 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from .models import Test
+from apps.custom_auth.models import CustomUser
+from apps.custom_auth.permissions import athlete_scope
+from .models import EvaluationSession, PurgeJob, Test, TestResult
 from .serializers import TestSerializer
+from .ingestion import SessionNotFound, SheetError, ingest_sheet, parse_csv, resolve_session
+from .export import export_queryset, stream_csv, stream_ndjson
+from .catalog import catalog_etag, etag_matches, get_catalog, get_test
+from .summaries import MAX_TOP, session_summary
+from .result_filters import FilterError, date_param
+from .purge import soft_delete_test
 
 # Función auxiliar para verificar permisos de administrador
 def is_admin_or_superuser(user):
@@ -60,9 +70,10 @@ def viewTests(request):
     """
     Vista para obtener todos los tests.
     
-    Esta función recupera y devuelve una lista de todos los tests en la base de datos.
-    Garantiza que solo superusuarios o usuarios con privilegios de administrador puedan
-    acceder a la lista de tests.
+    Esta función recupera y devuelve una lista de todos los tests. El catálogo se sirve
+    desde una caché versionada con un ETag fuerte; si la cabecera If-None-Match coincide
+    se responde 304 sin cuerpo. Garantiza que solo superusuarios o usuarios con
+    privilegios de administrador puedan acceder a la lista de tests.
     
     Parámetros:
         request (HttpRequest): El objeto de solicitud HTTP que contiene metadatos sobre la solicitud.
@@ -70,14 +81,16 @@ def viewTests(request):
     Retorna:
         Response:
             - Si el usuario está autorizado: Una respuesta JSON que contiene una lista de todos
-              los tests con un código de estado 200.
+              los tests con un código de estado 200, o 304 si el ETag del cliente está vigente.
             - Si el usuario carece de los permisos necesarios: Una respuesta JSON con un mensaje
               de error y un código de estado 403.
     """
     if is_admin_or_superuser(request.user):
-        tests = Test.objects.all()
-        serializer = TestSerializer(tests, many=True)
-        return Response({"tests": serializer.data}, status=status.HTTP_200_OK)
+        # El catálogo serializado se lee de la caché versionada; un 304 solo lee el ETag
+        etag = catalog_etag()
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response({"tests": get_catalog()}, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     return Response({
         "status": "error", 
@@ -107,13 +120,18 @@ def deleteTest(request, test_id):
             
     Permisos:
         - El usuario debe ser superusuario o tener privilegios de administrador para eliminar un test.
+    
+    El test deja de ser visible de inmediato y sus resultados se eliminan en segundo
+    plano (ver apps.lab.purge); el progreso se consulta en `purge_status_url`.
     """
     if is_admin_or_superuser(request.user):
         test = get_object_or_404(Test, id=test_id)
-        test.delete()
+        job = soft_delete_test(test)
         return Response({
             "status": "success", 
-            "message": "Test eliminado correctamente"
+            "message": "Test eliminado correctamente",
+            "purge_job": job.id,
+            "purge_status_url": reverse('purge_status', args=[job.id])
         }, status=status.HTTP_200_OK)
     else:
         return Response({
@@ -170,7 +188,8 @@ def viewTest(request, test_id):
     """
     Vista para ver un test específico.
     
-    Esta función recupera y devuelve los detalles de un test identificado por su `test_id`.
+    Esta función recupera y devuelve los detalles de un test identificado por su `test_id`
+    desde la caché del catálogo, con un ETag fuerte y soporte de 304 Not Modified.
     Garantiza que solo superusuarios o usuarios con privilegios de administrador puedan
     acceder a los detalles del test.
     
@@ -188,18 +207,276 @@ def viewTest(request, test_id):
                 Una respuesta JSON con un mensaje de error y un código de estado 403.
     """
     if is_admin_or_superuser(request.user):
-        try:
-            test = get_object_or_404(Test, id=test_id)
-            serializer = TestSerializer(test)
-            return Response({"test": serializer.data}, status=status.HTTP_200_OK)
-        except Test.DoesNotExist:
+        entry = get_test(test_id)
+        if entry is None:
             return Response({
                 "status": "error", 
                 "message": "Test no encontrado"
             }, status=status.HTTP_404_NOT_FOUND)
 
+        test, etag = entry
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response({"test": test}, status=status.HTTP_200_OK, headers={'ETag': etag})
+
     return Response({
         "status": "error", 
         "message": "No tiene permiso para ver test"
     }, status=status.HTTP_403_FORBIDDEN)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulkTestResults(request):
+    """
+    Vista para cargar masivamente los resultados de una sesión de evaluación.
+    
+    Acepta la planilla completa de una sesión en JSON o CSV, la valida en una sola
+    pasada contra mapas precargados de tests y atletas, y la inserta por lotes en
+    una única transacción. Si alguna fila es inválida no se guarda ningún resultado.
+    
+    Parámetros:
+        request (HttpRequest): El objeto de solicitud HTTP. En JSON el cuerpo contiene
+            `session` (id o datos de una nueva sesión) y `results`. En CSV el cuerpo
+            (o el archivo `file` en multipart) contiene la planilla y la sesión se
+            indica con el parámetro `session`.
+            
+    Retorna:
+        Response:
+            - En caso de éxito: Un objeto JSON con el id de la sesión y el número de
+              resultados creados, con estado HTTP 201.
+            - En caso de fallo: Un objeto JSON con un mensaje de error y estado HTTP apropiado:
+                - 403 si el usuario carece de permisos.
+                - 400 si la planilla o alguna de sus filas es inválida.
+                - 404 si la sesión indicada no existe.
+    """
+    if not is_admin_or_superuser(request.user):
+        return Response({
+            "status": "error", 
+            "message": "No tiene permiso para cargar resultados"
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        if request.content_type.startswith('text/csv'):
+            rows = parse_csv(request.body.decode('utf-8-sig'))
+            session_value = request.query_params.get('session')
+        elif 'file' in request.FILES:
+            rows = parse_csv(request.FILES['file'].read().decode('utf-8-sig'))
+            session_value = request.data.get('session') or request.query_params.get('session')
+        elif not isinstance(request.data, dict):
+            raise SheetError('El cuerpo debe ser un objeto JSON con "session" y "results"')
+        else:
+            rows = request.data.get('results')
+            session_value = request.data.get('session')
+            if not isinstance(rows, list):
+                raise SheetError('Se requiere la lista "results"')
+        session = resolve_session(session_value, request.user.id)
+    except UnicodeDecodeError:
+        return Response({
+            "status": "error", 
+            "message": "La planilla debe estar codificada en UTF-8"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except SessionNotFound as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except SheetError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not rows:
+        return Response({
+            "status": "error", 
+            "message": "La planilla no contiene resultados"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    results, errors = ingest_sheet(session, rows)
+    if errors:
+        return Response({
+            "status": "error", 
+            "message": "La planilla contiene filas inválidas",
+            "errors": errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "status": "success", 
+        "message": "Resultados cargados correctamente",
+        "session": session.id,
+        "created": len(results)
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportTestResults(request):
+    """
+    Vista para exportar todos los resultados de tests en streaming.
+    
+    Devuelve los resultados unidos con su test, su sesión y los datos del atleta,
+    codificados fila por fila como CSV o NDJSON sin cargar el conjunto completo en
+    memoria.
+    
+    Parámetros:
+        request (HttpRequest): El objeto de solicitud HTTP. Acepta los parámetros
+            opcionales `export_format` (csv o ndjson, por defecto csv), `discipline`,
+            `date_from` y `date_to` (fecha de la sesión, AAAA-MM-DD) y `category`.
+            
+    Retorna:
+        StreamingHttpResponse: El archivo exportado, con estado HTTP 200.
+        Response: Un objeto JSON con un mensaje de error y estado HTTP apropiado:
+            - 403 si el usuario carece de permisos.
+            - 400 si algún filtro es inválido.
+    """
+    if not is_admin_or_superuser(request.user):
+        return Response({
+            "status": "error", 
+            "message": "No tiene permiso para exportar resultados"
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    params = request.query_params
+    export_format = params.get('export_format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return Response({
+            "status": "error", 
+            "message": "Formato no válido, use csv o ndjson"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    discipline = params.get('discipline')
+    if discipline and discipline not in dict(CustomUser.DISCIPLINE_CHOICES):
+        return Response({
+            "status": "error", 
+            "message": "Disciplina no válida"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    category = params.get('category')
+    if category and category not in dict(Test.CATEGORIES):
+        return Response({
+            "status": "error", 
+            "message": "Categoría no válida"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        dates = {name: date_param(params, name) for name in ('date_from', 'date_to')}
+    except FilterError as e:
+        return Response({
+            "status": "error", 
+            "message": str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = export_queryset(discipline=discipline, category=category, **dates)
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="test_results.{export_format}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sessionSummary(request, session_id):
+    """
+    Vista del resumen estadístico de una sesión de evaluación.
+    
+    Por cada test evaluado en la sesión devuelve el número de resultados, la media,
+    la desviación estándar, el mínimo, el máximo, la mediana y los mejores atletas
+    según la dirección del test. Para un entrenador se calcula solo con los
+    resultados de sus atletas. El resumen se calcula con dos consultas y se
+    guarda en caché hasta que cambie algún resultado de la sesión.
+    
+    Parámetros:
+        request (HttpRequest): El objeto de solicitud HTTP. Acepta el parámetro
+            opcional `top` (entre 1 y 10, por defecto 3) con el número de mejores
+            atletas por test.
+        session_id (int): El ID de la sesión de evaluación.
+        
+    Retorna:
+        Response:
+            - En caso de éxito: Un objeto JSON con los datos de la sesión y el resumen
+              por test, con estado HTTP 200.
+            - En caso de fallo: Un objeto JSON con un mensaje de error y estado HTTP apropiado:
+                - 403 si el usuario carece de permisos o ninguno de sus atletas
+                  participó en la sesión.
+                - 400 si `top` es inválido.
+                - 404 si la sesión no existe.
+    """
+    if not (is_admin_or_superuser(request.user) or request.user.is_coach()):
+        return Response({
+            "status": "error", 
+            "message": "No tiene permiso para ver el resumen de la sesión"
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        top = int(request.query_params.get('top', 3))
+    except ValueError:
+        top = 0
+    if not 1 <= top <= MAX_TOP:
+        return Response({
+            "status": "error", 
+            "message": f"top debe ser un entero entre 1 y {MAX_TOP}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    session = get_object_or_404(EvaluationSession, id=session_id)
+    # Los entrenadores solo ven los resultados de sus atletas
+    athlete_ids = athlete_scope(request).athlete_ids
+    if athlete_ids is not None and not TestResult.objects.filter(
+        session_id=session.id, athlete_id__in=athlete_ids
+    ).exists():
+        return Response({
+            "status": "error", 
+            "message": "No tiene permiso para ver el resumen de la sesión"
+        }, status=status.HTTP_403_FORBIDDEN)
+    tests = [
+        {**entry, 'top_performers': entry['top_performers'][:top]}
+        for entry in session_summary(session.id, athlete_ids)
+    ]
+    return Response({
+        "status": "success", 
+        "session": {
+            "id": session.id,
+            "date": session.date,
+            "location": session.location,
+            "discipline": session.discipline,
+        },
+        "tests": tests
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def purgeStatus(request, job_id):
+    """
+    Vista del progreso de la eliminación en segundo plano de un usuario o un test.
+    
+    Parámetros:
+        request (HttpRequest): El objeto de solicitud HTTP.
+        job_id (int): El ID del PurgeJob devuelto por deleteUser o deleteTest.
+        
+    Retorna:
+        Response:
+            - En caso de éxito: Un objeto JSON con el estado, los resultados eliminados
+              y el porcentaje de avance, con estado HTTP 200.
+            - En caso de fallo: Un objeto JSON con un mensaje de error y estado HTTP apropiado:
+                - 403 si el usuario carece de permisos.
+                - 404 si el trabajo no existe.
+    """
+    if not is_admin_or_superuser(request.user):
+        return Response({
+            "status": "error", 
+            "message": "No tiene permiso para ver el estado de la eliminación"
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    job = get_object_or_404(PurgeJob, id=job_id)
+    return Response({
+        "status": "success", 
+        "purge": {
+            "id": job.id,
+            "target": job.target,
+            "object_id": job.object_id,
+            "status": job.status,
+            "total": job.total,
+            "deleted": job.deleted,
+            "progress": job.progress,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,63 @@
+"""
+Compresión de las respuestas JSON.
+
+CompressionMiddleware comprime las respuestas JSON de al menos COMPRESSION_MIN_BYTES:
+con Brotli si el cliente lo acepta y el paquete opcional `brotli` está instalado,
+y si no con gzip (a través de GZipMiddleware de Django, que agrega bytes
+aleatorios contra BREACH). Las respuestas más cortas, las de otros tipos de
+contenido, las 304 (sin cuerpo) y las transmitidas en streaming se envían sin
+cambios. Como en GZipMiddleware, un ETag fuerte pasa a ser débil al comprimir;
+apps.lab.catalog.etag_matches ignora el prefijo W/ al comparar.
+"""
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+
+# Calidad de Brotli para contenido dinámico: la máxima (11) es demasiado lenta
+BROTLI_QUALITY = 5
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+def _is_json(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type == 'application/json' or content_type.endswith('+json')
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_bytes = getattr(settings, 'COMPRESSION_MIN_BYTES', DEFAULT_COMPRESSION_MIN_BYTES)
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or len(response.content) < self.min_bytes
+            or not _is_json(response)
+            or response.has_header('Content-Encoding')
+        ):
+            return response
+        if brotli is None or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
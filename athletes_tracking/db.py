@@ -0,0 +1,125 @@
+"""
+Configuración de conexiones SQLite y enrutamiento a una réplica de lectura.
+
+sqlite_database() construye la entrada de DATABASES con los PRAGMA de
+SQLITE_PRAGMAS, que Django ejecuta (init_command) cada vez que abre una conexión:
+WAL permite lecturas concurrentes con una escritura, busy_timeout hace que una
+escritura espere al bloqueo en lugar de fallar con "database is locked",
+synchronous=NORMAL es seguro con WAL y evita un fsync por transacción, y
+mmap_size / cache_size amplían la caché de páginas. Las transacciones se abren
+con BEGIN IMMEDIATE para tomar el bloqueo de escritura al inicio y no fallar al
+promover una lectura a escritura.
+
+ReadReplicaRouter envía a la réplica solo las lecturas de los modelos de
+REPLICA_MODELS (resultados y datos derivados del laboratorio) hechas dentro de
+una vista marcada con @read_from_replica (dashboard y reportes), fuera de una
+transacción. Todo lo demás se lee del primario: la autenticación, los usuarios,
+la lista negra de tokens, PurgeJob, las escrituras y sus lecturas posteriores, y
+las vistas que llenan cachés compartidas (rankings, resúmenes de sesión, catálogo),
+que de otro modo guardarían datos atrasados bajo una versión nueva. Con una
+réplica atrasada, esas vistas de reporte muestran datos con el mismo retraso.
+
+La exportación en streaming lee después de que la vista termina, así que indica
+la base con .using(replica_alias()) en lugar de depender del decorador.
+
+Para probarlo en local con dos archivos SQLite:
+
+    python manage.py migrate
+    sqlite3 db.sqlite3 ".backup replica.sqlite3"
+    DATABASE_REPLICA=replica.sqlite3 python manage.py runserver
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# app_label.model_name de los modelos que pueden leerse de la réplica
+REPLICA_MODELS = {
+    'lab.testresult', 'lab.evaluationsession', 'lab.test', 'lab.personalbest',
+    'lab.cohortstatistic', 'lab.fitnessscore',
+}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,          # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,      # negativo = KiB
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_database(name, pragmas=None, **settings):
+    """Entrada de DATABASES para un archivo SQLite con los PRAGMA indicados."""
+    pragmas = {**SQLITE_PRAGMAS, **(pragmas or {})}
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {key}={value}' for key, value in pragmas.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        **settings,
+    }
+
+
+def replica_alias():
+    """Alias de la réplica si está configurada, o del primario."""
+    from django.conf import settings
+
+    return REPLICA if REPLICA in settings.DATABASES else PRIMARY
+
+
+def read_from_replica(view):
+    """
+    Decorador de vistas de solo lectura (síncronas o asíncronas) que permite leer
+    REPLICA_MODELS de la réplica mientras se ejecutan.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Lecturas de reportes a la réplica; el resto de las lecturas, las escrituras y las migraciones al primario."""
+
+    def db_for_read(self, model, **hints):
+        from django.db import connections
+
+        if not _replica_reads.get() or model._meta.label_lower not in REPLICA_MODELS:
+            return PRIMARY
+        # Dentro de una transacción se lee del primario para ver las escrituras propias
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambas bases contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica se copia del primario, no se migra por separado
+        return db == PRIMARY
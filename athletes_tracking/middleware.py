@@ -0,0 +1,174 @@
+"""
+Instrumentación de latencia y consultas SQL por solicitud.
+
+RequestMetricsMiddleware mide el tiempo total de cada solicitud, el número de
+consultas SQL y su tiempo acumulado (con connection.execute_wrapper), el tiempo
+de serialización (ver measure_serialization), el de renderizado de la respuesta
+y su tamaño. Emite una línea de log estructurada
+(JSON) por solicitud en el logger 'athletes_tracking.requests', agrega la
+cabecera Server-Timing y registra con el nombre de la vista toda consulta que
+supere SLOW_QUERY_THRESHOLD_MS, sin necesidad de DEBUG=True.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('athletes_tracking.requests')
+
+DEFAULT_SLOW_QUERY_THRESHOLD_MS = 100
+
+# Métricas de la solicitud en curso, para el código que no recibe el request
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Acumulador de métricas de una solicitud; se guarda en request.metrics."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.render_ms = 0.0
+        self.serializing = False
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Suma el tiempo del bloque a la serialización de la solicitud en curso. No cuenta
+    las consultas que se hagan dentro (ya están en db_ms) ni los bloques anidados,
+    que forman parte del exterior. También sirve como decorador.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start, db_start = time.perf_counter(), metrics.db_ms
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        elapsed = (time.perf_counter() - start) * 1000 - (metrics.db_ms - db_start)
+        metrics.serialize_ms += max(elapsed, 0.0)
+
+
+class QueryTimer:
+    """execute_wrapper que cuenta y cronometra las consultas de una solicitud."""
+
+    def __init__(self, request, metrics, threshold_ms):
+        self.request = request
+        self.metrics = metrics
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.metrics.queries += 1
+            self.metrics.db_ms += elapsed
+            if elapsed >= self.threshold_ms:
+                logger.warning(json.dumps({
+                    'event': 'slow_query',
+                    'view': _view_name(self.request),
+                    'path': self.request.path,
+                    'duration_ms': round(elapsed, 2),
+                    'sql': sql,
+                }))
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+class RequestMetricsMiddleware:
+    # Compatible con vistas asíncronas: bajo ASGI no obliga a ejecutar la cadena en un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold_ms = getattr(
+            settings, 'SLOW_QUERY_THRESHOLD_MS', DEFAULT_SLOW_QUERY_THRESHOLD_MS
+        )
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, timer = self.start(request)
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with self.instrument(timer):
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, timer = self.start(request)
+        # sync_to_async copia el contexto: las vistas síncronas también ven las métricas
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        # Las conexiones son por hilo: el ORM asíncrono consulta desde el hilo de
+        # sync_to_async de la solicitud, así que los wrappers se instalan allí
+        stack = await sync_to_async(self.instrument)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def start(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        return metrics, QueryTimer(request, metrics, self.threshold_ms)
+
+    def instrument(self, timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def finish(self, request, response, metrics, start):
+        total_ms = (time.perf_counter() - start) * 1000
+
+        # Tiempo en Python fuera de la base de datos, la serialización y el renderizado
+        app_ms = max(total_ms - metrics.db_ms - metrics.serialize_ms - metrics.render_ms, 0.0)
+        size = None if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_ms:.2f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialize_ms:.2f}',
+            f'render;dur={metrics.render_ms:.2f}',
+            f'app;dur={app_ms:.2f}',
+            f'total;dur={total_ms:.2f}',
+        ])
+        logger.info(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'view': _view_name(request),
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_queries': metrics.queries,
+            'db_ms': round(metrics.db_ms, 2),
+            'serialize_ms': round(metrics.serialize_ms, 2),
+            'render_ms': round(metrics.render_ms, 2),
+            'app_ms': round(app_ms, 2),
+            'response_bytes': size,
+        }))
+        return response
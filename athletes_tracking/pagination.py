@@ -0,0 +1,146 @@
+"""
+Paginación por cursor (keyset) para las vistas de función.
+
+A diferencia de PageNumberPagination no ejecuta COUNT(*) ni OFFSET: cada página
+filtra por la clave de ordenamiento de la última fila devuelta, de modo que el
+costo por página es constante sin importar el tamaño de la tabla. El ordenamiento
+debe terminar en una columna única (normalmente 'id') para que sea estable.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    """Codifica los valores de la clave de ordenamiento como un token opaco."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decodifica un token generado por encode_cursor; lanza ValidationError si es inválido."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Cursor inválido'})
+    if not isinstance(values, list) or len(values) != size:
+        raise ValidationError({'cursor': 'Cursor inválido'})
+    if any(not isinstance(v, (str, int)) or isinstance(v, bool) for v in values):
+        raise ValidationError({'cursor': 'Cursor inválido'})
+    return values
+
+
+def _typed_values(model, fields, values):
+    """
+    Convierte los valores del cursor al tipo de cada columna de ordenamiento y
+    verifica su rango, para que un cursor manipulado responda 400 en lugar de
+    fallar al construir o ejecutar la consulta.
+    """
+    typed = []
+    for name, value in zip(fields, values):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Anotaciones u otras expresiones: se usa el valor tal cual
+            typed.append(value)
+            continue
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (DjangoValidationError, TypeError, ValueError):
+            raise ValidationError({'cursor': 'Cursor inválido'})
+        typed.append(value)
+    return typed
+
+
+def _after(fields, values):
+    """
+    Construye la condición (f1, f2, ...) > (v1, v2, ...) como una combinación
+    de Q, que el índice sobre esas columnas puede resolver.
+    """
+    condition = Q()
+    for i in range(len(fields) - 1, -1, -1):
+        step = Q(**{f'{fields[i]}__gt': values[i]})
+        if i < len(fields) - 1:
+            step |= Q(**{fields[i]: values[i]}) & condition
+        condition = step
+    return condition
+
+
+def _query_params(request):
+    # Request de DRF o HttpRequest de Django (vistas asíncronas)
+    return getattr(request, 'query_params', request.GET)
+
+
+class KeysetPagination:
+    """
+    Pagina un queryset por las columnas de `ordering`.
+
+    Uso en una vista de función:
+        paginator = KeysetPagination(ordering=('role', 'id'))
+        page = paginator.paginate_queryset(queryset, request)
+        ... serializar page ...
+        paginator.next_cursor  # None en la última página
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=('id',), page_size=None):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size or settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+        self.next_cursor = None
+
+    def get_page_size(self, request):
+        value = _query_params(request).get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            raise ValidationError({'page_size': 'Debe ser un número entero'})
+        if size < 1:
+            raise ValidationError({'page_size': 'Debe ser mayor que cero'})
+        return min(size, MAX_PAGE_SIZE)
+
+    def page_queryset(self, queryset, request):
+        """Queryset de la página pedida, con una fila extra para detectar la siguiente."""
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        token = _query_params(request).get(self.cursor_query_param)
+        if token:
+            values = decode_cursor(token, len(self.ordering))
+            values = _typed_values(queryset.model, self.ordering, values)
+            queryset = queryset.filter(_after(self.ordering, values))
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        return queryset[:page_size + 1], page_size
+
+    def paginate_queryset(self, queryset, request):
+        """Devuelve la lista de objetos de la página pedida y calcula next_cursor."""
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.finish_page(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """Versión asíncrona de paginate_queryset para las vistas ASGI."""
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.finish_page([row async for row in queryset], page_size)
+
+    def finish_page(self, rows, page_size):
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # Las filas pueden ser instancias o diccionarios de values()
+            self.next_cursor = encode_cursor(
+                last[field] if isinstance(last, dict) else getattr(last, field)
+                for field in self.ordering
+            )
+        return rows
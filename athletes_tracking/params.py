@@ -0,0 +1,22 @@
+"""
+Validación de los valores de texto que llegan en parámetros de consulta, CSV y
+JSON.
+"""
+from django.utils.dateparse import parse_date
+
+
+def is_integer(value):
+    """Indica si `value` es un entero no negativo en dígitos ASCII."""
+    # isdigit() también acepta dígitos Unicode ('²') que int() rechaza
+    return value.isascii() and value.isdigit()
+
+
+def parse_day(value):
+    """Convierte una fecha AAAA-MM-DD en date; devuelve None si no es válida."""
+    if len(value) != 10:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        # Formato correcto pero fecha inexistente (p. ej. 2024-02-30)
+        return None
@@ -0,0 +1,20 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer que acumula su tiempo de renderizado en las métricas de la
+    solicitud (ver athletes_tracking.middleware.RequestMetricsMiddleware).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            request = (renderer_context or {}).get('request')
+            metrics = getattr(getattr(request, '_request', None), 'metrics', None)
+            if metrics is not None:
+                metrics.render_ms += (time.perf_counter() - start) * 1000
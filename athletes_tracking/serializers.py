@@ -0,0 +1,12 @@
+from .middleware import measure_serialization
+
+
+class TimedSerializerMixin:
+    """
+    Mixin para serializadores de DRF que acumula el tiempo de to_representation en
+    las métricas de la solicitud (ver athletes_tracking.middleware).
+    """
+
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from athletes_tracking.db import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'athletes_tracking.middleware.RequestMetricsMiddleware',
+    'athletes_tracking.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -87,14 +92,48 @@ WSGI_APPLICATION = 'athletes_tracking.wsgi.application'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
 }
 
+# Réplica de lectura opcional (ver athletes_tracking.db.ReadReplicaRouter)
+DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA')
+if DATABASE_REPLICA:
+    DATABASES['replica'] = sqlite_database(DATABASE_REPLICA, TEST={'MIRROR': 'default'})
+    DATABASE_ROUTERS = ['athletes_tracking.db.ReadReplicaRouter']
+
 AUTH_USER_MODEL = 'custom_auth.CustomUser'
 
+# Caché
+# Las cachés versionadas (catálogo de tests, rankings, resúmenes de sesión, estado
+# de usuarios, atletas por entrenador) guardan su versión en la caché: debe ser
+# compartida por todos los procesos, o un worker seguiría sirviendo datos que otro
+# ya invalidó. Con REDIS_URL se usa Redis (requiere el paquete redis); si no, una
+# tabla de la base de datos, que migrate crea (ver apps.lab.apps).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# Copias locales de cada proceso indexadas por la versión compartida (catálogo de
+# tests, estado de usuarios, atletas por entrenador): evitan leer la caché
+# compartida en cada solicitud
+CACHES['local'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'athletes-tracking-local',
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -140,11 +179,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # 'apps.custom_auth.authentication.ClaimsJWTAuthentication' evita la consulta
+        # del usuario en cada solicitud usando los claims del token
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'athletes_tracking.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
@@ -155,4 +200,36 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(days=30),
     'SLIDING_TOKEN_REFRESH_LIFETIME_LATE_USER': timedelta(days=1),
     'SLIDING_TOKEN_LIFETIME_LATE_USER': timedelta(days=30),
-}
\ No newline at end of file
+}
+
+
+# Request metrics
+# Consultas más lentas que este umbral (ms) se registran con su SQL y la vista
+SLOW_QUERY_THRESHOLD_MS = 100
+
+# Compresión
+# Las respuestas JSON de al menos este tamaño (bytes) se comprimen con Brotli (si
+# el paquete brotli está instalado y el cliente lo acepta) o con gzip
+COMPRESSION_MIN_BYTES = 1024
+
+# Dashboard
+# Sirve adminDashboard, coachDashboard, athleteDashboard y testResults con sus
+# versiones asíncronas (apps.dashboard.async_views); recomendado solo bajo ASGI
+ASYNC_DASHBOARD_VIEWS = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'athletes_tracking.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -16,7 +16,8 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenObtainPairView
+from apps.custom_auth.views import CustomTokenRefreshView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -24,5 +25,5 @@ urlpatterns = [
     path("lab/", include("apps.lab.urls")),
     path("custom_auth/", include("apps.custom_auth.urls")),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),  
 ]
@@ -0,0 +1,95 @@
+"""
+Caché local por proceso validada contra una versión compartida.
+
+Para datos pequeños que se leen en cada solicitud (estado de autorización de un
+usuario, atletas de un entrenador): el valor se guarda en la caché local del
+proceso (CACHES['local']) junto con la versión del objeto, que vive en la caché
+compartida. Durante `timeout` segundos el valor local se usa sin consultar nada;
+después se compara su versión con la compartida y solo se vuelve a cargar si
+cambió. invalidate() incrementa la versión al confirmarse la transacción actual,
+de modo que ningún proceso guarda con la versión nueva una fila anterior al
+commit. Los cambios se aplican de inmediato en el proceso que los hizo y, en los
+demás, como máximo después de `timeout` segundos.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+# Vigencia de las entradas locales: pasado el timeout, una entrada cuya versión no
+# cambió se sigue usando sin volver a cargar el valor
+LOCAL_CACHE_TIMEOUT = 60 * 60
+
+local_cache = caches['local']
+
+
+def _initial_version():
+    # Si la caché compartida pierde la versión (reinicio, flush), la nueva no debe
+    # coincidir con la de una entrada local anterior
+    return time.time_ns()
+
+
+class VersionedLocalCache:
+    """
+    Valores por id con `prefix` en sus claves. `timeout_setting` es el nombre del
+    setting con los segundos sin comprobar la versión (`default_timeout` si no está).
+    """
+
+    def __init__(self, prefix, timeout_setting, default_timeout):
+        self.prefix = prefix
+        self.timeout_setting = timeout_setting
+        self.default_timeout = default_timeout
+
+    def value_key(self, object_id):
+        return f'{self.prefix}:{object_id}'
+
+    def version_key(self, object_id):
+        return f'{self.prefix}:version:{object_id}'
+
+    def _fresh(self, entry, now):
+        timeout = getattr(settings, self.timeout_setting, self.default_timeout)
+        return entry is not None and now - entry['checked_at'] < timeout
+
+    def _store(self, object_id, value, version, now):
+        if value is None:
+            local_cache.delete(self.value_key(object_id))
+        else:
+            entry = {'value': value, 'version': version, 'checked_at': now}
+            local_cache.set(self.value_key(object_id), entry, LOCAL_CACHE_TIMEOUT)
+        return value
+
+    def get(self, object_id, load):
+        """Devuelve el valor de `object_id`; `load()` lo lee de la base de datos (None si no existe)."""
+        now = time.monotonic()
+        entry = local_cache.get(self.value_key(object_id))
+        if self._fresh(entry, now):
+            return entry['value']
+        # La versión se lee antes que el valor: un cambio posterior la incrementa y
+        # la siguiente comprobación descarta lo cargado
+        version = cache.get_or_set(self.version_key(object_id), _initial_version, None)
+        if entry is not None and entry['version'] == version:
+            return self._store(object_id, entry['value'], version, now)
+        return self._store(object_id, load(), version, now)
+
+    async def aget(self, object_id, aload):
+        """Versión asíncrona de get; `aload` es una corrutina."""
+        now = time.monotonic()
+        entry = local_cache.get(self.value_key(object_id))
+        if self._fresh(entry, now):
+            return entry['value']
+        version = await cache.aget_or_set(self.version_key(object_id), _initial_version, None)
+        if entry is not None and entry['version'] == version:
+            return self._store(object_id, entry['value'], version, now)
+        return self._store(object_id, await aload(), version, now)
+
+    def _bump(self, object_id):
+        local_cache.delete(self.value_key(object_id))
+        try:
+            cache.incr(self.version_key(object_id))
+        except ValueError:
+            cache.set(self.version_key(object_id), _initial_version(), None)
+
+    def invalidate(self, object_id):
+        """Invalida el valor en todos los procesos al confirmarse la transacción actual."""
+        transaction.on_commit(lambda: self._bump(object_id))